@@ -1,236 +1,301 @@
 import os
 import time
-import smtplib
-import ssl
-from email.message import EmailMessage
+import logging
 from imap_tools.query import AND
+from imap_tools.consts import MailMessageFlags
 from imap_tools.mailbox import MailBox
-from dotenv import load_dotenv
+from openai_client import load_env  # first, so .env applies to settings read at import
 
 from utils import (
+    generate_thread_id,
     get_session_folder,
     is_document,
-    load_processed,
-    save_processed,
-    MAX_ATTACHMENT_SIZE
+    MAX_ATTACHMENT_SIZE,
+    PROCESSED_FILE
 )
 from orchestrator import orchestrate
+from dispatcher import ClaimDispatcher, DISPATCH_WORKERS
+from uid_ledger import UIDLedger
+from mail_outbox import get_outbox
+import tracing
 
-load_dotenv()
+load_env()
+
+logger = logging.getLogger(__name__)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
 
 IMAP_HOST     = os.getenv('IMAP_HOST')
 IMAP_PORT     = int(os.getenv('IMAP_PORT', 993))
 IMAP_USER     = os.getenv('IMAP_USERNAME')
 IMAP_PASSWORD = os.getenv('IMAP_PASSWORD')
-SMTP_HOST     = os.getenv('SMTP_HOST')
-SMTP_PORT     = int(os.getenv('SMTP_PORT', 587))
+
+# Long-lived connection settings
+IMAP_USE_IDLE       = os.getenv('IMAP_USE_IDLE', 'true').lower() == 'true'
+IMAP_IDLE_TIMEOUT   = int(os.getenv('IMAP_IDLE_TIMEOUT', 5 * 60))  # re-issue IDLE well inside the 29 min server limit
+POLL_MIN_INTERVAL   = float(os.getenv('IMAP_POLL_MIN_INTERVAL', 0.5))
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 60
 
 SESSIONS_DIR = "sessions"
 os.makedirs(SESSIONS_DIR, exist_ok=True)
+MAILBOX_FOLDER = "INBOX"
 
 
-def send_email(to: str, subject: str, html: str, max_retries=3):
+class InboxCursor:
     """
-    Send HTML email using SMTP with SSL/TLS handling and retry logic.
-    
-    Args:
-        to (str): Recipient email address
-        subject (str): Email subject
-        html (str): HTML content
-        max_retries (int): Maximum number of retry attempts
-    
+    Processed-UID view for one mailbox connection.
+
+    UIDs are checked against the append-only ledger for the connection's
+    UIDVALIDITY, plus the set of UIDs already queued or being orchestrated.
+    """
+
+    def __init__(self, ledger: UIDLedger, mailbox: str, uidvalidity: str, in_flight: set):
+        self.ledger = ledger
+        self.mailbox = mailbox
+        self.uidvalidity = str(uidvalidity)
+        self.in_flight = in_flight
+        self.ledger.set_uidvalidity(mailbox, self.uidvalidity)
+
+    def __contains__(self, uid: str) -> bool:
+        key = (self.mailbox, self.uidvalidity, uid)
+        return key in self.in_flight or self.ledger.contains(*key)
+
+    def is_done(self, uid: str) -> bool:
+        """Orchestrated and recorded in the ledger (not merely queued)."""
+        return self.ledger.contains(self.mailbox, self.uidvalidity, uid)
+
+    def claim(self, uid: str) -> tuple:
+        key = (self.mailbox, self.uidvalidity, uid)
+        self.in_flight.add(key)
+        return key
+
+    def release(self, key: tuple):
+        """Give up a claim without recording the UID, so the message is fetched again."""
+        self.in_flight.discard(key)
+
+    def done(self, key: tuple):
+        self.ledger.add(*key)
+        self.in_flight.discard(key)
+
+
+def send_email(to: str, subject: str, html: str):
+    """
+    Send HTML email right away over the pooled SMTP connection.
+
+    Agents should prefer mail_outbox.enqueue_email, which returns immediately and
+    retries in the background; this stays for callers that need the result.
+
     Returns:
         dict: Success information including method used, or None if failed
     """
-    msg = EmailMessage()
-    msg["From"] = IMAP_USER
-    msg["To"] = to
-    msg["Subject"] = subject if subject.startswith("Re:") else f"Re: {subject}"
-    msg.set_content("Please view in an HTML-capable email client.")
-    msg.add_alternative(html, subtype="html")
-
-    # Different connection methods to try
-    connection_methods = [
-        {
-            "name": "STARTTLS",
-            "port": SMTP_PORT,
-            "use_ssl": False,
-            "use_starttls": True
-        },
-        {
-            "name": "SSL",
-            "port": 465,  # Common SSL port
-            "use_ssl": True,
-            "use_starttls": False
-        },
-        {
-            "name": "STARTTLS_ALT_PORT",
-            "port": 587,  # Alternative STARTTLS port
-            "use_ssl": False,
-            "use_starttls": True
-        },
-        {
-            "name": "NO_ENCRYPTION",
-            "port": 25,  # Plain text port (last resort)
-            "use_ssl": False,
-            "use_starttls": False
-        }
-    ]
-
-    for method in connection_methods:
-        for attempt in range(max_retries):
-            try:
-                print(f"[send_email] Attempting {method['name']} connection (attempt {attempt + 1}/{max_retries})")
-                
-                if method["use_ssl"]:
-                    # SSL connection
-                    context = ssl.create_default_context()
-                    with smtplib.SMTP_SSL(SMTP_HOST, method["port"], context=context) as server:
-                        server.login(IMAP_USER, IMAP_PASSWORD)
-                        server.send_message(msg)
-                        
-                        success_info = {
-                            "method": method["name"],
-                            "port": method["port"],
-                            "ssl": True,
-                            "starttls": False,
-                            "attempt": attempt + 1,
-                            "recipient": to
-                        }
-                        print(f"[send_email] SUCCESS: Email sent to {to} using {method['name']} (SSL)")
-                        return success_info
-                
-                else:
-                    # SMTP connection with optional STARTTLS
-                    with smtplib.SMTP(SMTP_HOST, method["port"]) as server:
-                        server.ehlo()  # Identify ourselves
-                        
-                        if method["use_starttls"]:
-                            # Check if STARTTLS is available
-                            if server.has_extn('STARTTLS'):
-                                context = ssl.create_default_context()
-                                server.starttls(context=context)
-                                server.ehlo()  # Re-identify after STARTTLS
-                            else:
-                                print(f"[send_email] STARTTLS not supported on port {method['port']}")
-                                continue
-                        
-                        server.login(IMAP_USER, IMAP_PASSWORD)
-                        server.send_message(msg)
-                        
-                        success_info = {
-                            "method": method["name"],
-                            "port": method["port"],
-                            "ssl": False,
-                            "starttls": method["use_starttls"],
-                            "attempt": attempt + 1,
-                            "recipient": to
-                        }
-                        print(f"[send_email] SUCCESS: Email sent to {to} using {method['name']}")
-                        return success_info
-
-            except smtplib.SMTPAuthenticationError as e:
-                print(f"[send_email] Authentication failed for {method['name']}: {e}")
-                # Don't retry authentication errors
-                break
-                
-            except smtplib.SMTPRecipientsRefused as e:
-                print(f"[send_email] Recipient refused for {method['name']}: {e}")
-                # Don't retry recipient errors
-                break
-                
-            except smtplib.SMTPServerDisconnected as e:
-                print(f"[send_email] Server disconnected for {method['name']} (attempt {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)  # Exponential backoff
-                    
-            except smtplib.SMTPConnectError as e:
-                print(f"[send_email] Connection failed for {method['name']} (attempt {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)  # Exponential backoff
-                    
-            except smtplib.SMTPException as e:
-                print(f"[send_email] SMTP error for {method['name']} (attempt {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)  # Exponential backoff
-                    
-            except ssl.SSLError as e:
-                print(f"[send_email] SSL error for {method['name']} (attempt {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)  # Exponential backoff
-                    
-            except Exception as e:
-                print(f"[send_email] Unexpected error for {method['name']} (attempt {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)  # Exponential backoff
-
-        print(f"[send_email] All attempts failed for {method['name']}, trying next method...")
-
-    # If all methods failed
-    print(f"[send_email] FAILED: Could not send email to {to} after trying all methods")
-    return None
-
-
-def poll_inbox(interval=10):
-    """Main loop to poll inbox for new messages and route to orchestrator."""
-    print("[poll_inbox] Starting inbox polling loop...")
-    processed = load_processed()
-    print(f"[poll_inbox] Loaded {len(processed)} processed message UIDs.")
+    result = get_outbox().send_now(to, subject, html)
+    if result:
+        logger.info(f"Email sent to {to} using {result['method']}")
+    else:
+        logger.error(f"Could not send email to {to}")
+    return result
+
+
+def process_claim_message(job: dict):
+    """Worker entry point: run orchestration for one fetched message and record its UID."""
+    uid = job["uid"]
+    cursor = job["cursor"]
+    root = job["trace"]
+    logger.debug(f"Handing UID {uid} off to orchestration layer")
+    try:
+        with tracing.use(root):
+            orchestrate(
+                email=job["sender"],
+                user_message=job["body"],
+                attachments=job["attachments"]
+            )
+    except Exception as e:
+        logger.exception(f"Orchestration of UID {uid} failed: {e}")
+        root.end(error=e)
+
+    # Mark message UID as processed
+    cursor.done(job["uid_key"])
+    root.end()
+    logger.info(f"Processed UID {uid} in {root.duration:.2f}s")
+
+
+def handle_message(msg, processed: InboxCursor, dispatcher: ClaimDispatcher, root: tracing.Span) -> bool:
+    """
+    Save a fetched message's attachments and queue it for orchestration under
+    `root`, the message's trace. Returns False if the message was already processed.
+    """
+    uid = str(msg.uid)
+    if uid in processed:
+        logger.debug(f"UID {uid} already processed. Skipping.")
+        return False
+
+    sender = msg.from_ or ""
+    subject = msg.subject or "No Subject"
+    body = msg.text or msg.html or ""
+    logger.info(f"Message UID {uid} from: {sender}, subject: {subject}")
+    root.set("sender", sender)
+
+    # Ensure session folder exists
+    session_folder = get_session_folder(sender)
+    os.makedirs(os.path.join(session_folder, "attachments"), exist_ok=True)
 
+    # Save attachments
+    attachments = []
+    with tracing.span("attachments.save") as save_span:
+        for att in msg.attachments:
+            if not is_document(att) or att.size > MAX_ATTACHMENT_SIZE:
+                logger.info(f"Skipping attachment {att.filename} (not document or too large)")
+                continue
+            safe_name = att.filename.replace("/", "_")
+            path = os.path.join(session_folder, "attachments", safe_name)
+            with open(path, "wb") as f:
+                f.write(att.payload)
+            logger.debug(f"Saved attachment: {safe_name}")
+            attachments.append(safe_name)
+        save_span.set("attachments", len(attachments))
+
+    # Claimed in memory before queueing so a re-fetch cannot queue it twice (the worker may
+    # finish before submit returns); persisted once orchestrated, released if not queued
+    uid_key = processed.claim(uid)
+    try:
+        queued = dispatcher.submit(generate_thread_id(sender), {
+            "uid": uid,
+            "uid_key": uid_key,
+            "cursor": processed,
+            "sender": sender,
+            "body": body,
+            "attachments": attachments,
+            "trace": root
+        })
+    except Exception:
+        processed.release(uid_key)
+        raise
+    if not queued:
+        processed.release(uid_key)
+        logger.warning(f"Dispatcher did not accept UID {uid}; it will be fetched again")
+        return False
+    logger.debug(f"Queued UID {uid} for orchestration.")
+    return True
+
+
+def fetch_unseen(mb, processed: InboxCursor, dispatcher: ClaimDispatcher) -> int:
+    """
+    Fetch and queue every new unseen message on an open mailbox. Returns the number fetched.
+
+    Messages are fetched without setting the Seen flag. It is set on a later pass,
+    from this thread (which owns the connection), once a message is orchestrated
+    and in the ledger, so messages still queued when the process dies are fetched
+    again after a restart.
+    """
+    unseen = mb.uids(AND(seen=False))
+    done = [uid for uid in unseen if processed.is_done(uid)]
+    if done:
+        mb.flag(done, MailMessageFlags.SEEN, True)
+        logger.debug(f"Flagged {len(done)} orchestrated message(s) as seen")
+    new = [uid for uid in unseen if uid not in processed]
+    if not new:
+        return 0
+    count = 0
+    started = time.time_ns()
+    for msg in mb.fetch(AND(uid=new), mark_seen=False):
+        # One trace per inbound email, ended by the worker once the message is orchestrated
+        fetched = time.time_ns()
+        root = tracing.start_span("email", new_trace=True, start_ns=started, uid=str(msg.uid))
+        tracing.record_span("imap.fetch", started, fetched, parent=root)
+        with tracing.use(root):
+            queued = handle_message(msg, processed, dispatcher, root)
+        if not queued:
+            root.end()
+        count += 1
+        started = time.time_ns()
+    if count:
+        logger.info(f"Dispatcher metrics: {dispatcher.metrics()}")
+    return count
+
+
+def supports_idle(mb) -> bool:
+    """Check whether the server advertised the IDLE capability (RFC 2177)."""
+    try:
+        return "IDLE" in mb.client.capabilities
+    except Exception:
+        return False
+
+
+def _idle_loop(mb, processed: InboxCursor, dispatcher: ClaimDispatcher):
+    """Block in IMAP IDLE and fetch as soon as the server pushes a mailbox change."""
+    while True:
+        responses = mb.idle.wait(timeout=IMAP_IDLE_TIMEOUT)
+        if responses:
+            logger.debug(f"IDLE woke with {len(responses)} server response(s). Fetching...")
+            fetch_unseen(mb, processed, dispatcher)
+        # Timed out without changes: loop re-issues IDLE, which also keeps the connection alive
+
+
+def _adaptive_poll_loop(mb, processed: InboxCursor, dispatcher: ClaimDispatcher, max_interval: float):
+    """Poll over the open connection, backing off while the inbox is quiet."""
+    delay = POLL_MIN_INTERVAL
     while True:
-        print("[poll_inbox] Connecting to mailbox...")
-        with MailBox(IMAP_HOST).login(IMAP_USER, IMAP_PASSWORD, initial_folder="INBOX") as mb:
-            print("[poll_inbox] Connected. Fetching unseen messages...")
-
-            for msg in mb.fetch(AND(seen=False), mark_seen=True):
-                uid = str(msg.uid)
-                print(f"[poll_inbox] Processing message UID: {uid}")
-                if uid in processed:
-                    print(f"[poll_inbox] UID {uid} already processed. Skipping.")
-                    continue
-
-                sender = msg.from_ or ""
-                subject = msg.subject or "No Subject"
-                body = msg.text or msg.html or ""
-                print(f"[poll_inbox] Message from: {sender}, subject: {subject}")
-
-                # Ensure session folder exists
-                session_folder = get_session_folder(sender)
-                os.makedirs(os.path.join(session_folder, "attachments"), exist_ok=True)
-
-                # Save attachments
-                print("[poll_inbox] Saving attachments...")
-                attachments = []
-                for att in msg.attachments:
-                    if not is_document(att) or att.size > MAX_ATTACHMENT_SIZE:
-                        print(f"[poll_inbox] Skipping attachment {att.filename} (not document or too large)")
-                        continue
-                    safe_name = att.filename.replace("/", "_")
-                    path = os.path.join(session_folder, "attachments", safe_name)
-                    with open(path, "wb") as f:
-                        f.write(att.payload)
-                    print(f"[poll_inbox] Saved attachment: {safe_name}")
-                    attachments.append(safe_name)
-
-                # Hand off to orchestration layer
-                print("[poll_inbox] Handing off to orchestration layer...")
-                try:
-                    orchestrate(
-                        email=sender,
-                        user_message=body,
-                        attachments=attachments
-                    )
-                except Exception as e:
-                    print(f"[poll_inbox] ERROR during orchestration: {e}")
-
-                # Mark message UID as processed
-                save_processed(uid)
-                print(f"[poll_inbox] Marked UID {uid} as processed.")
-
-        print(f"[poll_inbox] Sleeping for {interval} seconds before next poll...")
-        time.sleep(interval)
+        if fetch_unseen(mb, processed, dispatcher):
+            delay = POLL_MIN_INTERVAL
+        else:
+            delay = min(delay * 2, max_interval)
+        time.sleep(delay)
+
+
+def poll_inbox(interval=10, use_idle=IMAP_USE_IDLE, workers=DISPATCH_WORKERS):
+    """
+    Main loop to watch the inbox for new messages and route them to the orchestrator.
+
+    Keeps one authenticated connection open. When the server supports IDLE the loop
+    waits for push notifications; otherwise it polls the same connection with an
+    adaptive delay between POLL_MIN_INTERVAL and `interval` seconds. Dropped
+    connections are re-established with exponential backoff.
+
+    Fetched messages are handed to a ClaimDispatcher so a slow claim does not block
+    the mailbox; messages from the same sender are still orchestrated in order.
+
+    Args:
+        interval (float): Upper bound in seconds for the adaptive polling delay
+        use_idle (bool): Use IMAP IDLE when the server supports it
+        workers (int): Number of concurrent orchestration workers
+    """
+    logger.info("Starting inbox watch loop...")
+    ledger = UIDLedger(legacy_path=PROCESSED_FILE)
+    in_flight = set()
+    logger.info(f"Loaded {len(ledger)} processed message UIDs.")
+    dispatcher = ClaimDispatcher(process_claim_message, workers=workers).start()
+    outbox = get_outbox().start()
+
+    reconnect_delay = RECONNECT_MIN_DELAY
+    while True:
+        try:
+            logger.info("Connecting to mailbox...")
+            with MailBox(IMAP_HOST, IMAP_PORT).login(IMAP_USER, IMAP_PASSWORD, initial_folder=MAILBOX_FOLDER) as mb:
+                uidvalidity = mb.folder.status(MAILBOX_FOLDER, ["UIDVALIDITY"])["UIDVALIDITY"]
+                processed = InboxCursor(ledger, MAILBOX_FOLDER, uidvalidity, in_flight)
+                logger.info(f"Connected (UIDVALIDITY {uidvalidity}). Fetching unseen messages...")
+                reconnect_delay = RECONNECT_MIN_DELAY
+                # Catch up on anything that arrived while disconnected
+                fetch_unseen(mb, processed, dispatcher)
+
+                if use_idle and supports_idle(mb):
+                    logger.info("Server supports IDLE. Waiting for push notifications...")
+                    _idle_loop(mb, processed, dispatcher)
+                else:
+                    logger.info("IDLE unavailable. Falling back to adaptive polling...")
+                    _adaptive_poll_loop(mb, processed, dispatcher, interval)
+        except KeyboardInterrupt:
+            logger.info("Shutting down, waiting for in-flight claims...")
+            dispatcher.stop(wait=True)
+            outbox.stop(wait=True)
+            raise
+        except Exception as e:
+            logger.warning(f"Connection lost: {e}. Reconnecting in {reconnect_delay}s...")
+            time.sleep(reconnect_delay)
+            reconnect_delay = min(reconnect_delay * 2, RECONNECT_MAX_DELAY)
 
 
 if __name__ == "__main__":
-    print("[main] Starting poll_inbox()")
+    logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+    logger.info("Starting poll_inbox()")
     poll_inbox()
\ No newline at end of file
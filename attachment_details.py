@@ -1,23 +1,38 @@
 import os
 import json
-import base64
-import hashlib
 import time
-from typing import List, Dict
-from openai import OpenAI
-from dotenv import load_dotenv
-from pdf2image import convert_from_path
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Set, Tuple
 # from PIL import Image
 from document_processor import process_and_update_claim_session
+from page_renderer import vision_pages, pdf_page_count
+from vision_inputs import prepare_vision_images
+from content_cache import ContentCache, file_digest
+
+from utils import get_session_folder, save_json, load_json, json_exists
+from openai_client import get_client, load_env
+import tracing
 
-from utils import generate_thread_id
+load_env()
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger(__name__)
 
 SESSIONS_DIR = "sessions"
 SUPPORTED_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tif', '.tiff'}
 PDF_EXT = '.pdf'
+ATTACHMENT_DATA_FILE = "attachment_data.json"
+ATTACHMENT_DETAILS_MODEL = "gpt-4.1"
+DESCRIPTION_CACHE_MAX_BYTES = int(os.getenv("DESCRIPTION_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+OCR_TEXT_LIMIT = 1000  # characters of OCR text sent per attachment
+
+# Attachment-detail requests are split into batches bounded by image and attachment count
+ATTACHMENT_BATCH_MAX_IMAGES = int(os.getenv("ATTACHMENT_BATCH_MAX_IMAGES", 8))
+ATTACHMENT_BATCH_MAX_ITEMS = int(os.getenv("ATTACHMENT_BATCH_MAX_ITEMS", 10))
+ATTACHMENT_BATCH_CONCURRENCY = int(os.getenv("ATTACHMENT_BATCH_CONCURRENCY", 4))
+ATTACHMENT_BATCH_ATTEMPTS = 3
 
 # JSON schema for attachment details
 ATTACHMENT_DETAILS_SCHEMA = {
@@ -50,83 +65,129 @@ along with its OCR outputs ('output_a', 'output_b', or 'text'), and produce for
 Return exactly one JSON object conforming to the schema provided. Do not ask questions or perform any classification.
 """
 
+# Changing the model, prompt or schema changes the version, so stale descriptions are not reused
+PROMPT_VERSION = hashlib.sha256(
+    json.dumps([ATTACHMENT_DETAILS_MODEL, SYSTEM_INSTRUCTION, ATTACHMENT_DETAILS_SCHEMA], sort_keys=True).encode("utf-8")
+).hexdigest()[:12]
+
+# Attachment descriptions shared across turns and sessions, keyed by attachment content
+description_cache = ContentCache("attachment_details", DESCRIPTION_CACHE_MAX_BYTES)
+
 
-def encode_image(filepath: str) -> str:
-    print(f"[encode_image] Encoding image: {filepath}")
+def read_attachment(filepath: str) -> bytes:
+    logger.debug(f"Reading image: {filepath}")
     with open(filepath, "rb") as f:
-        encoded = base64.b64encode(f.read()).decode("utf-8")
-    print(f"[encode_image] Finished encoding image: {filepath}")
-    return encoded
+        return f.read()
 
-def get_image_inputs(folder: str, attachments: List[str]) -> List[Dict]:
-    print(f"[get_image_inputs] Preparing image inputs from folder: {folder}")
-    inputs = []
+@dataclass
+class AttachmentPart:
+    """One attachment, or a page range of a long PDF, as planned into a batch."""
+    name: str
+    path: str
+    text: str = ""
+    kind: str = ""  # "image", "pdf", or "" when only text (or nothing) is sent
+    first_page: int = 0
+    last_page: int = 0
+    total_pages: int = 0
+
+    @property
+    def image_count(self) -> int:
+        if self.kind == "image":
+            return 1
+        if self.kind == "pdf":
+            return self.last_page - self.first_page + 1
+        return 0
+
+    @property
+    def label(self) -> str:
+        if self.kind == "pdf" and (self.first_page > 1 or self.last_page < self.total_pages):
+            return f"{self.name} (pages {self.first_page}-{self.last_page} of {self.total_pages})"
+        return self.name
+
+    def load_images(self) -> List[tuple]:
+        if self.kind == "image":
+            return [(self.name, read_attachment(self.path))]
+        if self.kind == "pdf":
+            jpegs = vision_pages(self.path, first=self.first_page, last=self.last_page)
+            return [(f"{self.name} page {self.first_page + i}", jpeg) for i, jpeg in enumerate(jpegs)]
+        return []
+
+def plan_attachment_parts(folder: str, attachments: List[str], parsed_docs: Dict,
+                          max_images: int = ATTACHMENT_BATCH_MAX_IMAGES) -> List[AttachmentPart]:
+    """
+    Describe what is sent for each attachment; PDFs longer than `max_images` pages
+    are split. Attachments with neither an image to send nor OCR text are left out,
+    so the model is never asked to describe content it cannot see.
+    """
+    parts = []
     for fname in attachments:
         path = os.path.join(folder, "attachments", fname)
-        print(f"[get_image_inputs] Checking file: {path}")
-        if not os.path.exists(path):
-            print(f"[get_image_inputs] File does not exist: {path}")
-            continue
+        doc = parsed_docs.get(fname, {})
+        text = (doc.get("output_a") or doc.get("output_b") or doc.get("text") or "").strip()[:OCR_TEXT_LIMIT]
+        if not text:
+            logger.debug(f"No OCR text for: {fname}")
         ext = os.path.splitext(fname)[1].lower()
-        if ext in SUPPORTED_IMAGE_EXTENSIONS:
-            print(f"[get_image_inputs] File is supported image: {fname}")
-            b64 = encode_image(path)
-            inputs.append({
-                "type": "input_image",
-                "image_url": f"data:image/{ext[1:]};base64,{b64}"
-            })
+        if not os.path.exists(path):
+            logger.warning(f"File does not exist: {path}")
+            part = AttachmentPart(fname, path, text)
+        elif ext in SUPPORTED_IMAGE_EXTENSIONS:
+            if doc.get("text_heavy"):
+                logger.debug(f"Skipping document photo, sent as OCR text: {fname}")
+                part = AttachmentPart(fname, path, text)
+            else:
+                part = AttachmentPart(fname, path, text, kind="image")
         elif ext == PDF_EXT:
-            print(f"[get_image_inputs] File is PDF: {fname}, converting to images")
-            pages = convert_from_path(path, dpi=200)
-            for i, page in enumerate(pages):
-                tmp = f"{path}_page_{i}.jpg"
-                page.save(tmp, "JPEG")
-                print(f"[get_image_inputs] Saved PDF page as image: {tmp}")
-                b64 = encode_image(tmp)
-                inputs.append({
-                    "type": "input_image",
-                    "image_url": f"data:image/jpeg;base64,{b64}"
-                })
-                os.remove(tmp)
-                print(f"[get_image_inputs] Removed temporary image: {tmp}")
-    print(f"[get_image_inputs] Prepared {len(inputs)} image inputs")
-    return inputs
-
-def generate_attachment_details(
-    sender_email: str,
-    attachments: List[str]
-) -> Dict:
-    print(f"[generate_attachment_details] Starting for sender: {sender_email} with attachments: {attachments}")
-    session_folder = os.path.join(SESSIONS_DIR, f"thread_{generate_thread_id(sender_email)}")
-    os.makedirs(os.path.join(session_folder, "attachments"), exist_ok=True)
-    print(f"[generate_attachment_details] Session folder: {session_folder}")
+            total = pdf_page_count(path)
+            for first in range(1, total + 1, max_images):
+                # OCR text travels with the first chunk only
+                parts.append(AttachmentPart(fname, path, text if first == 1 else "", kind="pdf", first_page=first,
+                                            last_page=min(first + max_images - 1, total), total_pages=total))
+            continue
+        else:
+            part = AttachmentPart(fname, path, text)
+        if part.kind or part.text:
+            parts.append(part)
+        else:
+            logger.info(f"Nothing to describe for {fname}; leaving it out of the request")
+    return parts
 
-    # 1) Run OCR and get parsed_docs
-    print("[generate_attachment_details] Running OCR and processing documents...")
-    parsed_docs = process_and_update_claim_session(sender_email)
-    print(f"[generate_attachment_details] OCR and document processing complete. Parsed docs: {list(parsed_docs.keys())}")
+def plan_batches(parts: List[AttachmentPart], max_images: int = ATTACHMENT_BATCH_MAX_IMAGES,
+                 max_items: int = ATTACHMENT_BATCH_MAX_ITEMS) -> List[List[AttachmentPart]]:
+    """Group parts, in order, into batches of at most `max_images` images and `max_items` parts."""
+    batches: List[List[AttachmentPart]] = []
+    current: List[AttachmentPart] = []
+    images = 0
+    for part in parts:
+        if current and (images + part.image_count > max_images or len(current) >= max_items):
+            batches.append(current)
+            current, images = [], 0
+        current.append(part)
+        images += part.image_count
+    if current:
+        batches.append(current)
+    return batches
 
-    # 2) Build user content blocks
+def build_batch_content(batch: List[AttachmentPart]) -> List[Dict]:
+    part_images = [part.load_images() for part in batch]
+    # Resized, metadata-stripped and kept within the per-request payload budget
+    prepared = {item.name: item for item in prepare_vision_images([image for images in part_images for image in images])}
     user_blocks = []
-    for fname in attachments:
-        doc = parsed_docs.get(fname, {})
-        text = doc.get("output_a") or doc.get("output_b") or doc.get("text") or ""
-        if text.strip():
-            print(f"[generate_attachment_details] Adding OCR text for: {fname}")
-            user_blocks.append({
-                "type": "input_text",
-                "text": f"{fname} OCR:\n{text.strip()[:1000]}"
-            })
-        else:
-            print(f"[generate_attachment_details] No OCR text for: {fname}")
-    # include images as base64
-    print("[generate_attachment_details] Adding image inputs...")
-    user_blocks.extend(get_image_inputs(session_folder, attachments))
-
-    # 3) Call Responses API
-    print("[generate_attachment_details] Calling OpenAI Responses API...")
-    response = client.responses.create(
-        model="gpt-4.1",
+    for part, images in zip(batch, part_images):
+        text = f"Attachment: {part.label}"
+        if part.text:
+            logger.debug(f"Adding OCR text for: {part.name}")
+            text += f"\n{part.name} OCR:\n{part.text}"
+        user_blocks.append({"type": "input_text", "text": text})
+        user_blocks.extend(prepared[name].input_block() for name, _ in images if name in prepared)
+    return user_blocks
+
+@tracing.traced("attachment_details.batch")
+def describe_batch(batch: List[AttachmentPart]) -> List[Dict]:
+    """One Responses API call for a batch; returns its attachment_details entries."""
+    user_blocks = build_batch_content(batch)
+    logger.debug(f"Calling OpenAI Responses API for: {[part.label for part in batch]}")
+    response = get_client().responses.create(
+        model=ATTACHMENT_DETAILS_MODEL,
         input=[
             {"role": "system", "content": SYSTEM_INSTRUCTION},
             {"role": "user", "content": user_blocks}
@@ -140,16 +201,96 @@ def generate_attachment_details(
             }
         }
     )
-    print("[generate_attachment_details] Received response from OpenAI API.")
     result = json.loads(response.output_text)
-    print(f"[generate_attachment_details] Parsed response: {json.dumps(result, indent=2)}")
+    logger.debug(f"Parsed response: {result}")
+    return result.get("attachment_details", [])
+
+def describe_batch_with_retries(batch: List[AttachmentPart]) -> Optional[List[Dict]]:
+    for attempt in range(1, ATTACHMENT_BATCH_ATTEMPTS + 1):
+        try:
+            return describe_batch(batch)
+        except Exception as e:
+            logger.warning(f"Attempt {attempt} failed for {[part.label for part in batch]}: {e}")
+            if attempt < ATTACHMENT_BATCH_ATTEMPTS:
+                time.sleep(2 ** attempt)
+    return None
+
+def describe_attachments(session_folder: str, attachments: List[str],
+                         parsed_docs: Dict) -> Tuple[List[Dict], Set[str]]:
+    """
+    Describe `attachments` in size-bounded batches run concurrently. A batch that
+    still fails after retries leaves its attachments undescribed without failing
+    the rest. Descriptions of a PDF split across batches are joined in page order.
+
+    Returns the descriptions and the names of attachments with a failed batch,
+    whose descriptions (if any) cover only part of the file.
+    """
+    batches = plan_batches(plan_attachment_parts(session_folder, attachments, parsed_docs))
+    logger.info(f"{len(attachments)} attachments planned into {len(batches)} batches")
+    with ThreadPoolExecutor(max_workers=max(1, min(ATTACHMENT_BATCH_CONCURRENCY, len(batches)))) as pool:
+        futures = [pool.submit(tracing.wrap(describe_batch_with_retries), batch) for batch in batches]
+        results = [future.result() for future in futures]
+
+    merged: Dict[str, List[str]] = {}
+    incomplete: Set[str] = set()
+    for batch, entries in zip(batches, results):
+        if entries is None:
+            logger.error(f"Giving up on batch: {[part.label for part in batch]}")
+            incomplete.update(part.name for part in batch)
+            continue
+        labels = {part.label: part.name for part in batch}
+        for entry in entries:
+            merged.setdefault(labels.get(entry["name"], entry["name"]), []).append(entry["details"])
+    return [{"name": name, "details": "\n".join(details)} for name, details in merged.items()], incomplete
+
+@tracing.traced("attachment_details")
+def generate_attachment_details(
+    sender_email: str,
+    attachments: List[str]
+) -> Dict:
+    logger.debug(f"Starting for sender: {sender_email} with attachments: {attachments}")
+    session_folder = get_session_folder(sender_email)
+    logger.debug(f"Session folder: {session_folder}")
+
+    # 1) Run OCR and get parsed_docs
+    logger.debug("Running OCR and processing documents...")
+    parsed_docs = process_and_update_claim_session(sender_email)
+    logger.info(f"OCR and document processing complete. Parsed docs: {list(parsed_docs.keys())}")
+
+    # 2) Reuse descriptions of attachments we have already seen
+    out_path = os.path.join(session_folder, ATTACHMENT_DATA_FILE)
+    merged = {d["name"]: d for d in (load_json(out_path) if json_exists(out_path) else {}).get("attachment_details", [])}
+    keys = {}
+    pending = []
+    for fname in attachments:
+        path = os.path.join(session_folder, "attachments", fname)
+        if not os.path.exists(path):
+            pending.append(fname)
+            continue
+        keys[fname] = description_cache.key(file_digest(path), prompt=PROMPT_VERSION)
+        details = description_cache.get(keys[fname])
+        if details is not None:
+            logger.debug(f"Reusing cached description for: {fname}")
+            merged[fname] = {"name": fname, "details": details}
+        else:
+            pending.append(fname)
+
+    if pending:
+        described, incomplete = describe_attachments(session_folder, pending, parsed_docs)
+        for entry in described:
+            merged[entry["name"]] = entry
+            # Partial descriptions are kept for this claim but described afresh next time
+            if entry["name"] in keys and entry["name"] not in incomplete:
+                description_cache.put(keys[entry["name"]], entry["details"])
+    else:
+        logger.info("All attachments already described; skipping API call.")
+    logger.debug(f"Description cache: {description_cache.metrics()}")
 
-    # 4) Save to attachment_data.json
-    out_path = os.path.join(session_folder, "attachment_data.json")
-    print(f"[generate_attachment_details] Saving results to: {out_path}")
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
-    print("[generate_attachment_details] Results saved successfully.")
+    # 3) Merge into attachment_data.json
+    result = {"attachment_details": list(merged.values())}
+    logger.debug(f"Saving results to: {out_path}")
+    save_json(out_path, result)
+    logger.debug("Results saved successfully.")
 
     return result
 
@@ -157,7 +298,7 @@ def generate_attachment_details(
 if __name__ == "__main__":
     sender = "user@example.com"
     attachments = ["photo.jpg", "invoice.pdf"]
-    os.makedirs(os.path.join(SESSIONS_DIR, f"thread_{generate_thread_id(sender)}", "attachments"), exist_ok=True)
+    get_session_folder(sender)
     print("[main] Running generate_attachment_details...")
     details = generate_attachment_details(sender, attachments)
     print("[main] Attachment details generated:")
@@ -0,0 +1,149 @@
+"""
+Re-scoring historical tool-call payloads: each decision engine called once per
+payload against decision_batch.evaluate_batch, for every engine in the pipeline.
+
+    python benchmarks/bench_decision_batch.py
+    python benchmarks/bench_decision_batch.py --claims 200000 --no-reasons
+    python benchmarks/bench_decision_batch.py --engine fire --engine theft
+
+Payloads are generated from each engine's rule table: every field a rule reads is
+present about half the time with a value of the kind its predicate tests. Batch
+results are checked against the per-dict results before timings are reported.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import decision_batch
+import decision_rules
+from decision_rules import Compare, FieldTest, ForEach, OneOf, Predicate
+
+ENGINE_MODULES = [
+    "accidental_and_glass", "ancilliary", "fire", "general_administrative", "general_exceptions",
+    "personal_belongings", "personal_convenience", "personal_injury", "theft", "third_party_injury",
+    "third_party_legal", "third_party_liability", "third_party_property", "Vehicle_security", "Vehicle_usage",
+]
+
+DATES = ["2025-03-14", "2025-11-02", "14/03/2025", ""]
+TIMES = ["14:30", "09:05", "2pm", "14:30:00"]
+TEXT = ["", "engine_bay", "rear seats", "CR 104233", "garden wall", "money belt", "laptop"]
+
+
+def load_engines(names):
+    engines = []
+    for module_name in ENGINE_MODULES:
+        module = importlib.import_module(module_name)
+        for value in vars(module).values():
+            if isinstance(value, decision_rules.DecisionEngine) and (not names or module_name in names):
+                engines.append(value)
+    return engines
+
+
+def value_makers(rules):
+    """A value generator for every field the rules read or quote."""
+    makers = {}
+    item_predicates = set()
+    for node in decision_rules.walk(rules):
+        if isinstance(node, ForEach):
+            item_rules = value_makers(node.rules)
+            makers[node.field] = lambda rng, item_rules=item_rules: [
+                {name: make(rng) for name, make in item_rules.items() if rng.random() < 0.8}
+                for _ in range(rng.randrange(4))
+            ]
+            item_predicates.update(id(child) for child in decision_rules.walk(node.rules))
+    typed = set(makers)  # fields whose predicate dictates the kind of value
+    for node in decision_rules.walk(rules):
+        if id(node) in item_predicates or not isinstance(node, FieldTest):
+            continue
+        if isinstance(node, OneOf):
+            makers[node.field] = lambda rng, values=node.values: rng.choice(values + ("other",))
+        elif isinstance(node, Compare):
+            makers[node.field] = lambda rng, bound=node.bound: rng.choice(
+                [-1, 0, rng.randrange(1, 2 * bound + 2), bound, bound + 1])
+        elif node.check is decision_rules._is_date:
+            makers[node.field] = lambda rng: rng.choice(DATES)
+        elif node.check in (decision_rules._is_time, decision_rules._is_hh_mm):
+            makers[node.field] = lambda rng: rng.choice(TIMES)
+        else:
+            makers[node.field] = lambda rng: rng.choice(TEXT)
+        typed.add(node.field)
+    for node in decision_rules.walk(rules):
+        if id(node) in item_predicates:
+            continue
+        if isinstance(node, decision_rules.Flag):  # quoted in a reason: text
+            for name in node.fields:
+                if name not in typed:
+                    makers[name] = lambda rng: rng.choice(TEXT)
+                    typed.add(name)
+        elif isinstance(node, Predicate):  # flags and presence checks
+            for name in node.fields():
+                makers.setdefault(name, lambda rng: rng.random() < 0.6)
+    return makers
+
+
+def random_claims(engine, count: int, rng: random.Random):
+    makers = value_makers(engine.rules)
+    return [{name: make(rng) for name, make in makers.items() if rng.random() < 0.5} for _ in range(count)]
+
+
+def per_dict(engine, claims, reasons: bool):
+    decisions, texts = [], []
+    for claim in claims:
+        try:
+            if reasons:
+                result = engine(claim)
+                decisions.append(result["decision"])
+                texts.append(result["reason"])
+            else:
+                decisions.append(engine.evaluate(claim).decision)
+        except Exception:
+            decisions.append(None)
+            texts.append(None)
+    return decisions, texts
+
+
+def best_of(repeat: int, fn):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch decision-engine evaluation")
+    parser.add_argument('--claims', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--engine', action='append', help="engine module name (repeatable); default all")
+    parser.add_argument('--no-reasons', action='store_true', help="decisions only, reasons never rendered")
+    args = parser.parse_args()
+
+    if decision_batch.np is None:
+        print("NumPy is not installed: evaluate_batch runs the per-dict evaluators, so there is nothing to compare")
+        return
+
+    reasons = not args.no_reasons
+    rng = random.Random(args.seed)
+    print(f"{args.claims} claims per engine, best of {args.repeat}{'' if reasons else ', decisions only'}")
+    print(f"{'engine':<52} {'per-dict ms':>12} {'batch ms':>10} {'speedup':>8}")
+    for engine in load_engines(args.engine):
+        claims = random_claims(engine, args.claims, rng)
+        scalar_seconds, (decisions, expected_reasons) = best_of(args.repeat, lambda: per_dict(engine, claims, reasons))
+        batch_seconds, result = best_of(
+            args.repeat, lambda: decision_batch.evaluate_batch(engine, claims, reasons=reasons))
+        assert result.decisions == decisions, f"{engine.__name__}: decisions differ"
+        assert not reasons or result.reasons == expected_reasons, f"{engine.__name__}: reasons differ"
+        print(f"{engine.__name__:<52} {scalar_seconds * 1000:>12.1f} {batch_seconds * 1000:>10.1f} "
+              f"{scalar_seconds / batch_seconds:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
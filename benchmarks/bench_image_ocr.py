@@ -0,0 +1,68 @@
+"""
+Per-image cost of preparing a photo for OCR: the old image -> PDF -> poppler
+round trip against the in-memory path in document_processor.
+
+    python benchmarks/bench_image_ocr.py photo.jpg scan.tiff --repeat 5
+    python benchmarks/bench_image_ocr.py photo.jpg --ocr    # include one tesseract pass
+
+Run from the repository root. Requires Pillow, pdf2image/poppler and, with --ocr,
+tesseract.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytesseract
+from PIL import Image
+from pdf2image import convert_from_path
+
+from document_processor import load_image_frames
+
+
+def legacy_round_trip(image_path: str):
+    """What process_image used to do before OCR: save as a temp PDF and rasterize it back."""
+    img = Image.open(image_path)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        temp_pdf = tmp.name
+    try:
+        img.save(temp_pdf, format='PDF')
+        return [convert_from_path(temp_pdf)[0]]
+    finally:
+        os.remove(temp_pdf)
+
+
+def time_path(load, image_path: str, repeat: int, ocr: bool):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frames = load(image_path)
+        if ocr:
+            for frame in frames:
+                pytesseract.image_to_string(frame, config='--oem 3 --psm 3')
+        timings.append(time.perf_counter() - start)
+    sizes = [frame.size for frame in frames]
+    return statistics.median(timings), sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark image preparation for OCR")
+    parser.add_argument('images', nargs='+')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--ocr', action='store_true', help="include a tesseract pass in the timing")
+    args = parser.parse_args()
+
+    print(f"{'image':<30} {'legacy ms':>10} {'direct ms':>10} {'speedup':>8}  frames")
+    for path in args.images:
+        legacy, legacy_sizes = time_path(legacy_round_trip, path, args.repeat, args.ocr)
+        direct, direct_sizes = time_path(load_image_frames, path, args.repeat, args.ocr)
+        print(f"{os.path.basename(path)[:30]:<30} {legacy * 1000:>10.1f} {direct * 1000:>10.1f} "
+              f"{legacy / direct:>7.1f}x  {legacy_sizes} -> {direct_sizes}")
+
+
+if __name__ == '__main__':
+    main()
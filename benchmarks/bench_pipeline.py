@@ -0,0 +1,386 @@
+"""
+End-to-end throughput of the claim pipeline against local stand-ins for IMAP,
+SMTP and OpenAI (see benchmarks/fake_services.py).
+
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --claims 50 --workers 8 --latency run=3 --latency responses=1.5
+    python benchmarks/bench_pipeline.py --claims 10 --attachment photo.jpg --attachment invoice.pdf
+
+Each synthetic claimant emails the fake inbox; advanced_imap_listener.poll_inbox
+picks the message up over IDLE and orchestrates it (clarifying question, triage,
+specialist assistant runs and their decision tool calls, follow-up), and the
+outbox delivers the reply to the SMTP sink. A claimant sends its next message
+once its previous one is orchestrated and answered, for `--turns` messages.
+
+Reports claims/minute, p50/p95 latency per stage and disk I/O per claim: files
+opened under the working directory (SQLite's own file access is not seen) and,
+on Linux, bytes the process wrote to storage. Runs in a temporary working
+directory unless --workdir is given; pipeline output goes to --log.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+from collections import defaultdict, deque
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_services import FakeMailServer, SMTPSink, OpenAIStub, SinkMessage
+
+MESSAGES = [
+    "Hi, I was involved in a collision yesterday evening and my windscreen is cracked. How do I claim?",
+    "It happened at 18:30 on the A40 near Oxford. Nobody was hurt and I have photos of the damage.",
+    "The other driver's insurer is known, the police reference is AB123, and the car is in a garage now.",
+    "Thanks. The repair estimate is attached to my earlier email; let me know if you need anything else.",
+]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+class StageTimes:
+    """Latency samples per pipeline stage."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self.lock:
+            self.samples[stage].append(seconds)
+
+    def timed(self, stage: str, fn: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            started = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                with self.lock:
+                    self.errors[stage] += 1
+                raise
+            finally:
+                self.add(stage, time.monotonic() - started)
+        return wrapper
+
+
+class DiskIO:
+    """Counts files opened under `root` (via the "open" audit event) and storage bytes from /proc."""
+
+    def __init__(self, root: str):
+        self.root = os.path.realpath(root) + os.sep
+        self.reads = 0
+        self.writes = 0
+        self.active = False
+        self.lock = threading.Lock()
+        sys.addaudithook(self._hook)
+
+    def _hook(self, event: str, args):
+        if event != "open" or not self.active:
+            return
+        path, mode, flags = args
+        if not isinstance(path, str) or not os.path.abspath(path).startswith(self.root):
+            return
+        if mode is not None:
+            write = any(c in mode for c in "wax+")
+        else:
+            write = bool(flags & (os.O_WRONLY | os.O_RDWR))
+        with self.lock:
+            if write:
+                self.writes += 1
+            else:
+                self.reads += 1
+
+    @staticmethod
+    def proc_io() -> Optional[Dict[str, int]]:
+        try:
+            with open("/proc/self/io") as f:
+                return {key: int(value) for key, value in (line.split(": ") for line in f)}
+        except OSError:
+            return None
+
+    def footprint(self) -> int:
+        return sum(os.path.getsize(os.path.join(folder, name))
+                   for folder, _, names in os.walk(self.root) for name in names
+                   if os.path.isfile(os.path.join(folder, name)))
+
+
+class Claimant:
+    def __init__(self, email: str, turns: int, attachments):
+        self.email = email
+        self.turns = turns
+        self.attachments = attachments
+        self.sent = 0
+        self.done = 0
+        self.emails = 0
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+
+class Corpus:
+    """Drives the claimants: sends each next message once the previous one was orchestrated and answered."""
+
+    def __init__(self, mail_server: FakeMailServer, times: StageTimes, claims: int, turns: int, attachments):
+        self.mail_server = mail_server
+        self.times = times
+        self.claimants = {f"claimant{i}@example.com": Claimant(f"claimant{i}@example.com", turns, attachments)
+                          for i in range(claims)}
+        self.lock = threading.Lock()
+        self.progress = time.monotonic()
+        self.fetched_at: Dict[str, float] = {}
+        self.enqueued: Dict[str, deque] = defaultdict(deque)
+
+    def send_next(self, claimant: Claimant):
+        claimant.sent += 1
+        if claimant.started is None:
+            claimant.started = time.monotonic()
+        self.mail_server.deliver(
+            claimant.email, f"Claim {claimant.email}",
+            MESSAGES[(claimant.sent - 1) % len(MESSAGES)],
+            claimant.attachments if claimant.sent == 1 else None
+        )
+
+    def maybe_reply(self, claimant: Claimant):
+        with self.lock:
+            self.progress = time.monotonic()
+            if claimant.sent < claimant.turns and claimant.done == claimant.sent and claimant.emails >= claimant.done:
+                self.send_next(claimant)
+
+    # Hooks -------------------------------------------------------------------
+
+    def on_fetch(self, uid: str, since_delivery: float):
+        self.fetched_at[uid] = time.monotonic()
+        self.times.add("inbox", since_delivery)
+
+    def on_turn_done(self, email: str):
+        claimant = self.claimants.get(email)
+        if claimant is None:
+            return
+        claimant.done += 1
+        if claimant.done == claimant.turns:
+            claimant.finished = time.monotonic()
+            self.times.add("claim", claimant.finished - claimant.started)
+        self.maybe_reply(claimant)
+
+    def on_enqueue(self, to: str):
+        with self.lock:
+            self.enqueued[to].append(time.monotonic())
+
+    def on_email(self, message: SinkMessage):
+        for to in message.recipients:
+            with self.lock:
+                if self.enqueued[to]:
+                    self.times.add("email", message.received_at - self.enqueued[to].popleft())
+            claimant = self.claimants.get(to)
+            if claimant is not None:
+                claimant.emails += 1
+                self.maybe_reply(claimant)
+
+    def finished(self) -> int:
+        return sum(1 for c in self.claimants.values() if c.finished is not None)
+
+
+def parse_latency(values: List[str]) -> Dict[str, float]:
+    latency = {}
+    for value in values:
+        kind, _, seconds = value.partition("=")
+        latency[kind] = float(seconds)
+    return latency
+
+
+def install(args, corpus: Corpus, times: StageTimes, sink: SMTPSink, stub: OpenAIStub, mail_server: FakeMailServer):
+    """Import the pipeline with its services pointed at the stand-ins and wrap its stages with timers."""
+    os.environ.update({
+        "OPENAI_BASE_URL": stub.base_url,
+        "OPENAI_API_KEY": "bench",
+        "IMAP_HOST": "fake-imap",
+        "IMAP_USERNAME": "claims@example.com",
+        "IMAP_PASSWORD": "bench",
+        "SMTP_HOST": sink.host,
+        "SMTP_PORT": str(sink.port),
+        "RUN_USE_STREAMING": "true" if args.stream else "false",
+        "CLAIM_STORE": args.store,
+    })
+    import advanced_imap_listener as listener
+    import orchestrator
+    import triage_agent
+    import mail_outbox
+
+    listener.MailBox = mail_server.mailbox
+    # The sink speaks plain SMTP on its own port
+    mail_outbox.CONNECTION_METHODS[:] = [{"name": "BENCH_SINK", "port": sink.port,
+                                          "use_ssl": False, "use_starttls": False}]
+    for name in orchestrator.ASSISTANT_IDS:
+        orchestrator.ASSISTANT_IDS[name] = f"asst_{name}"
+    triage_agent.TRIAGE_ASSISTANT_ID = stub.triage_assistant_id
+
+    orchestrator.run_clarifying_question = times.timed("clarify", orchestrator.run_clarifying_question)
+    orchestrator.run_triage = times.timed("triage", orchestrator.run_triage)
+    orchestrator.run_follow_up_agent = times.timed("follow_up", orchestrator.run_follow_up_agent)
+    orchestrator.Orchestrator.run_assistant_agent = times.timed(
+        "specialist", orchestrator.Orchestrator.run_assistant_agent)
+    if args.attachment:
+        import attachment_details
+        attachment_details.generate_attachment_details = times.timed(
+            "attachments", attachment_details.generate_attachment_details)
+    listener.orchestrate = times.timed("orchestrate", listener.orchestrate)
+
+    enqueue = mail_outbox.MailOutbox.enqueue
+
+    def timed_enqueue(self, to, subject, html):
+        corpus.on_enqueue(to)
+        return enqueue(self, to, subject, html)
+    mail_outbox.MailOutbox.enqueue = timed_enqueue
+
+    process = listener.process_claim_message
+
+    def timed_process(job):
+        fetched = corpus.fetched_at.pop(job["uid"], None)
+        if fetched is not None:
+            times.add("queue", time.monotonic() - fetched)
+        try:
+            process(job)
+        finally:
+            corpus.on_turn_done(job["sender"])
+    listener.process_claim_message = timed_process
+    return listener
+
+
+def report(args, corpus: Corpus, times: StageTimes, stub: OpenAIStub, sink: SMTPSink, disk: DiskIO,
+           elapsed: float, storage: Optional[Dict[str, int]]) -> Dict:
+    finished = corpus.finished()
+    turns = sum(c.done for c in corpus.claimants.values())
+    per_claim = max(finished, 1)
+    result = {
+        "claims": args.claims, "finished": finished, "turns": turns, "emails": len(sink.messages),
+        "seconds": elapsed,
+        "claims_per_minute": finished / elapsed * 60 if elapsed else 0.0,
+        "messages_per_minute": turns / elapsed * 60 if elapsed else 0.0,
+        "stages": {stage: {"count": len(samples), "p50": percentile(samples, 50), "p95": percentile(samples, 95),
+                           "max": max(samples), "errors": times.errors.get(stage, 0)}
+                   for stage, samples in sorted(times.samples.items())},
+        "disk_per_claim": {
+            "file_opens_read": disk.reads / per_claim,
+            "file_opens_write": disk.writes / per_claim,
+            "bytes_written": storage["write_bytes"] / per_claim if storage else None,
+            "footprint_bytes": disk.footprint() / per_claim,
+        },
+        "openai_requests_per_claim": {endpoint: count / per_claim for endpoint, count in sorted(stub.requests.items())},
+    }
+
+    print(f"{finished}/{args.claims} claims finished ({turns} messages, {len(sink.messages)} emails) "
+          f"in {elapsed:.1f}s with {args.workers} workers")
+    print(f"throughput: {result['claims_per_minute']:.1f} claims/min, {result['messages_per_minute']:.1f} messages/min")
+    print(f"\n{'stage':<12} {'count':>6} {'p50 s':>8} {'p95 s':>8} {'max s':>8} {'errors':>7}")
+    for stage, stats in result["stages"].items():
+        print(f"{stage:<12} {stats['count']:>6} {stats['p50']:>8.3f} {stats['p95']:>8.3f} "
+              f"{stats['max']:>8.3f} {stats['errors']:>7}")
+    io = result["disk_per_claim"]
+    written = "n/a" if io["bytes_written"] is None else f"{io['bytes_written'] / 1024:.1f} KiB"
+    print(f"\ndisk per claim: {io['file_opens_read']:.1f} reads / {io['file_opens_write']:.1f} writes opened, "
+          f"{written} written to storage, {io['footprint_bytes'] / 1024:.1f} KiB on disk")
+    print("openai requests per claim: " + ", ".join(
+        f"{endpoint} {count:.1f}" for endpoint, count in result["openai_requests_per_claim"].items()))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against local fake services")
+    parser.add_argument('--claims', type=int, default=20, help="synthetic claimants")
+    parser.add_argument('--turns', type=int, default=3, help="messages each claimant sends")
+    parser.add_argument('--workers', type=int, default=4, help="dispatcher workers")
+    parser.add_argument('--rate', type=float, default=0, help="new claims per second (0: all at once)")
+    parser.add_argument('--latency', action='append', default=[], metavar="KIND=SECONDS",
+                        help="stub latency for responses, run or api (repeatable)")
+    parser.add_argument('--jitter', type=float, default=0.2)
+    parser.add_argument('--incidents', default="accidental_and_glass_damage,third_party_property",
+                        help="incident types triage reports; one specialist run each")
+    parser.add_argument('--decide-after', type=int, default=1,
+                        help="specialist runs per thread that ask questions before calling the decision tool")
+    parser.add_argument('--tool-args', help="JSON file mapping assistant name (or 'default') to decision arguments")
+    parser.add_argument('--attachment', action='append', default=[], help="file attached to each first message")
+    parser.add_argument('--poll', dest='stream', action='store_false', help="poll runs instead of streaming")
+    parser.add_argument('--store', default="files", choices=["files", "sqlite"])
+    parser.add_argument('--stall-timeout', type=float, default=60, help="give up after this long without progress")
+    parser.add_argument('--workdir', help="working directory (default: a new temporary one)")
+    parser.add_argument('--log', default=os.devnull, help="where pipeline output goes")
+    parser.add_argument('--json', help="also write the results here")
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="bench_pipeline_"))
+    os.makedirs(workdir, exist_ok=True)
+    log_path = os.path.abspath(args.log)
+    json_path = os.path.abspath(args.json) if args.json else None
+    os.chdir(workdir)
+
+    tool_args = {"default": {"incident_date": "2025-01-01", "incident_time": "18:30"}}
+    if args.tool_args:
+        with open(args.tool_args) as f:
+            tool_args.update({name if name == "default" else f"asst_{name}": value
+                              for name, value in json.load(f).items()})
+    attachments = []
+    for path in args.attachment:
+        with open(path, "rb") as f:
+            attachments.append((os.path.basename(path), f.read()))
+
+    times = StageTimes()
+    mail_server = FakeMailServer()
+    corpus = Corpus(mail_server, times, args.claims, args.turns, attachments)
+    mail_server.on_fetch = corpus.on_fetch
+    sink = SMTPSink(on_message=corpus.on_email).start()
+    stub = OpenAIStub(latency=parse_latency(args.latency), jitter=args.jitter, decide_after=args.decide_after,
+                      incident_types={name: "Synthetic" for name in args.incidents.split(",") if name},
+                      tool_args=tool_args).start()
+
+    log = open(log_path, "w")
+    logging.basicConfig(stream=log, level=logging.INFO, format='%(asctime)s - %(threadName)s - %(message)s')
+    stdout = sys.stdout
+    sys.stdout = log
+    try:
+        listener = install(args, corpus, times, sink, stub, mail_server)
+        disk = DiskIO(workdir)
+        storage_before = DiskIO.proc_io()
+        disk.active = True
+        threading.Thread(target=listener.poll_inbox, kwargs={"workers": args.workers},
+                         name="poll-inbox", daemon=True).start()
+
+        started = time.monotonic()
+        for i, claimant in enumerate(corpus.claimants.values()):
+            if args.rate and i:
+                time.sleep(1 / args.rate)
+            with corpus.lock:
+                corpus.send_next(claimant)
+        while corpus.finished() < args.claims and time.monotonic() - corpus.progress < args.stall_timeout:
+            time.sleep(0.05)
+        elapsed = time.monotonic() - started
+        disk.active = False
+        storage_after = DiskIO.proc_io()
+    finally:
+        sys.stdout = stdout
+
+    storage = None
+    if storage_before and storage_after:
+        storage = {key: storage_after[key] - storage_before[key] for key in storage_after}
+    result = report(args, corpus, times, stub, sink, disk, elapsed, storage)
+    if corpus.finished() < args.claims:
+        print(f"\n{args.claims - corpus.finished()} claims stalled; see {log_path}")
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(result, f, indent=2)
+    if not args.workdir:
+        print(f"working directory: {workdir}")
+    os._exit(0)  # poll_inbox and the senders run until the process ends
+
+
+if __name__ == '__main__':
+    main()
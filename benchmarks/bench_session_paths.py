@@ -0,0 +1,99 @@
+"""
+Filesystem syscalls and time spent resolving session folders during one turn:
+the old per-call hash + makedirs against the memoised utils.get_session_folder.
+
+    python benchmarks/bench_session_paths.py
+    python benchmarks/bench_session_paths.py --calls-per-turn 30 --turns 200 --senders 50
+
+A turn makes `--calls-per-turn` lookups for one sender, roughly what the
+orchestrator's helpers do per message. Syscalls are counted by wrapping the os
+functions makedirs goes through (stat, mkdir). Runs in a temporary directory.
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import utils
+
+
+def legacy_session_folder(email: str) -> str:
+    """What get_session_folder did on every call before it was memoised."""
+    tid = hashlib.md5(email.lower().encode()).hexdigest()[:12]
+    print(f"[generate_thread_id] Generated thread ID: {tid} for email: {email}", file=sys.stderr)
+    folder = os.path.join(utils.SESSIONS_DIR, f"thread_{tid}")
+    os.makedirs(os.path.join(folder, "attachments"), exist_ok=True)
+    print(f"[get_session_folder] Using session folder: {folder}", file=sys.stderr)
+    return folder
+
+
+class SyscallCounter:
+    """Counts os.stat / os.mkdir calls made while active."""
+
+    NAMES = ("stat", "mkdir")
+
+    def __init__(self):
+        self.count = 0
+        self.originals = {}
+
+    def __enter__(self):
+        for name in self.NAMES:
+            original = self.originals[name] = getattr(os, name)
+
+            def counted(*args, _original=original, **kwargs):
+                self.count += 1
+                return _original(*args, **kwargs)
+            setattr(os, name, counted)
+        return self
+
+    def __exit__(self, *exc):
+        for name, original in self.originals.items():
+            setattr(os, name, original)
+
+
+def run(resolve, senders, turns: int, calls_per_turn: int):
+    with SyscallCounter() as counter:
+        start = time.perf_counter()
+        for turn in range(turns):
+            email = senders[turn % len(senders)]
+            for _ in range(calls_per_turn):
+                resolve(email)
+        elapsed = time.perf_counter() - start
+    return elapsed / turns, counter.count / turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark session folder resolution")
+    parser.add_argument('--calls-per-turn', type=int, default=20)
+    parser.add_argument('--turns', type=int, default=500)
+    parser.add_argument('--senders', type=int, default=25)
+    args = parser.parse_args()
+
+    senders = [f"claimant{i}@example.com" for i in range(args.senders)]
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        stderr = sys.stderr
+        sys.stderr = open(os.devnull, "w")  # the legacy path's prints, kept out of the results
+        try:
+            results = {
+                "per-call makedirs": run(legacy_session_folder, senders, args.turns, args.calls_per_turn),
+                "memoised": run(utils.get_session_folder, senders, args.turns, args.calls_per_turn),
+            }
+        finally:
+            sys.stderr.close()
+            sys.stderr = stderr
+
+    print(f"{args.calls_per_turn} lookups per turn, {args.turns} turns over {args.senders} senders")
+    print(f"{'resolver':<20} {'us/turn':>10} {'syscalls/turn':>14}")
+    for name, (seconds, syscalls) in results.items():
+        print(f"{name:<20} {seconds * 1e6:>10.1f} {syscalls:>14.2f}")
+    print(f"session cache: {utils.get_session_folder.cache_info()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Cold-start cost of importing the service modules, measured in fresh interpreters.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py orchestrator advanced_imap_listener --repeat 10
+
+For each module it reports the median import time and which heavy third-party
+packages (openai, OCR and imaging libraries) that import pulled in. Modules
+imported lazily on first use should not appear until a message needs them.
+Run from the repository root with the service dependencies installed.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["openai", "httpx", "pytesseract", "pdf2image", "PIL", "numpy"]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, repeat: int):
+    timings = []
+    loaded = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        loaded = result["loaded"]
+    return statistics.median(timings), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark module import (startup) time")
+    parser.add_argument('modules', nargs='*', default=["orchestrator", "advanced_imap_listener", "document_processor"])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'module':<28} {'median ms':>10}  heavy packages loaded")
+    for module in args.modules:
+        seconds, loaded = measure(module, args.repeat)
+        print(f"{module:<28} {seconds * 1000:>10.1f}  {', '.join(loaded) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,503 @@
+"""
+Local stand-ins for the services the pipeline talks to, for benchmarks.
+
+- FakeMailServer: an in-process inbox exposing the slice of imap_tools' MailBox
+  the listener uses (login, folder.status, fetch, IDLE). Patch it over
+  advanced_imap_listener.MailBox.
+- SMTPSink: a threaded SMTP server on localhost that accepts AUTH PLAIN and
+  records every message it receives.
+- OpenAIStub: an OpenAI-compatible HTTP server for the endpoints the agents
+  call (Responses, Assistants threads/messages/runs, streamed or polled), with
+  configurable latency and scripted tool calls. Point OPENAI_BASE_URL at it.
+"""
+import json
+import time
+import uuid
+import random
+import threading
+import socketserver
+from dataclasses import dataclass, field
+from email import message_from_bytes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+
+# -- IMAP ---------------------------------------------------------------------
+
+@dataclass
+class FakeAttachment:
+    filename: str
+    payload: bytes
+
+    @property
+    def size(self) -> int:
+        return len(self.payload)
+
+
+@dataclass
+class FakeMessage:
+    uid: str
+    from_: str
+    subject: str
+    text: str
+    html: str = ""
+    attachments: List[FakeAttachment] = field(default_factory=list)
+    delivered_at: float = 0.0
+
+
+class FakeMailServer:
+    """
+    Shared inbox state. `deliver` appends a message and wakes any IDLE waiter;
+    `on_fetch(uid, seconds_since_delivery)` is called as the listener fetches.
+    """
+
+    def __init__(self, uidvalidity: int = 1, on_fetch: Optional[Callable[[str, float], None]] = None):
+        self.uidvalidity = uidvalidity
+        self.on_fetch = on_fetch
+        self.messages: List[FakeMessage] = []
+        self.seen = set()
+        self.cond = threading.Condition()
+        self.next_uid = 1
+
+    def deliver(self, sender: str, subject: str, text: str,
+                attachments: Optional[List[Tuple[str, bytes]]] = None) -> str:
+        with self.cond:
+            uid = str(self.next_uid)
+            self.next_uid += 1
+            self.messages.append(FakeMessage(
+                uid=uid, from_=sender, subject=subject, text=text,
+                attachments=[FakeAttachment(name, data) for name, data in attachments or []],
+                delivered_at=time.monotonic()
+            ))
+            self.cond.notify_all()
+        return uid
+
+    def search(self, criteria) -> List[FakeMessage]:
+        """Messages matching an imap_tools query: "(UNSEEN)", "(UID 3,5)" or both."""
+        terms = str(criteria or "ALL").strip("()").split(" ")
+        uids = set(terms[terms.index("UID") + 1].split(",")) if "UID" in terms else None
+        with self.cond:
+            return [msg for msg in self.messages
+                    if (uids is None or msg.uid in uids) and ("UNSEEN" not in terms or msg.uid not in self.seen)]
+
+    def mark(self, uids, seen: bool = True):
+        with self.cond:
+            if seen:
+                self.seen.update(uids)
+            else:
+                self.seen.difference_update(uids)
+
+    def mailbox(self, host=None, port=None) -> "FakeMailBox":
+        """Drop-in for the MailBox(host, port) constructor."""
+        return FakeMailBox(self)
+
+
+class FakeMailBox:
+    def __init__(self, server: FakeMailServer):
+        self.server = server
+        self.folder = self
+        self.client = self
+        self.idle = self
+        self.capabilities = ("IMAP4REV1", "IDLE")
+        self._waited_for = len(server.messages)
+
+    def login(self, username, password, initial_folder="INBOX"):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def status(self, folder=None, options=None) -> Dict:
+        return {"UIDVALIDITY": self.server.uidvalidity, "MESSAGES": len(self.server.messages)}
+
+    def uids(self, criteria=None) -> List[str]:
+        return [msg.uid for msg in self.server.search(criteria)]
+
+    def flag(self, uid_list, flag_set, value: bool):
+        self.server.mark([uid_list] if isinstance(uid_list, str) else list(uid_list), value)
+
+    def fetch(self, criteria=None, mark_seen=True):
+        found = self.server.search(criteria)
+        if mark_seen:
+            self.server.mark([msg.uid for msg in found])
+        for msg in found:
+            if self.server.on_fetch:
+                self.server.on_fetch(msg.uid, time.monotonic() - msg.delivered_at)
+            yield msg
+
+    def wait(self, timeout: float = None) -> list:
+        """IDLE: block until a message arrives, returning one EXISTS response per new message."""
+        with self.server.cond:
+            self.server.cond.wait_for(lambda: len(self.server.messages) > self._waited_for, timeout=timeout)
+            new = len(self.server.messages) - self._waited_for
+            self._waited_for = len(self.server.messages)
+        return [b"* %d EXISTS" % len(self.server.messages)] * new
+
+
+# -- SMTP ---------------------------------------------------------------------
+
+@dataclass
+class SinkMessage:
+    received_at: float
+    sender: str
+    recipients: List[str]
+    subject: str
+    size: int
+
+
+def _address(command: str) -> str:
+    """The <address> of a MAIL FROM / RCPT TO command, ignoring ESMTP parameters."""
+    value = command.split(":", 1)[1].strip()
+    return value[1:value.index(">")] if value.startswith("<") else value.split(" ", 1)[0]
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        sink: "SMTPSink" = self.server.sink
+        self.reply("220 sink ESMTP")
+        sender, recipients = "", []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.wfile.write(b"250-sink\r\n250-AUTH PLAIN\r\n250-8BITMIME\r\n250 SIZE 52428800\r\n")
+            elif verb == "AUTH":
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                sender, recipients = _address(command), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(_address(command))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = bytearray()
+                for data_line in iter(self.rfile.readline, b""):
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    data += data_line[1:] if data_line.startswith(b"..") else data_line
+                self.reply("250 OK queued")
+                sink.record(sender, recipients, bytes(data))
+            elif verb in ("NOOP", "RSET"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """Accepts any login and records messages; `on_message(SinkMessage)` is called per delivery."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 on_message: Optional[Callable[[SinkMessage], None]] = None):
+        self.server = _ThreadingTCPServer((host, port), _SMTPHandler)
+        self.server.sink = self
+        self.host, self.port = self.server.server_address
+        self.on_message = on_message
+        self.messages: List[SinkMessage] = []
+        self.lock = threading.Lock()
+
+    def record(self, sender: str, recipients: List[str], data: bytes):
+        parsed = message_from_bytes(data)
+        message = SinkMessage(time.monotonic(), sender, recipients, parsed.get("Subject", ""), len(data))
+        with self.lock:
+            self.messages.append(message)
+        if self.on_message:
+            self.on_message(message)
+
+    def start(self) -> "SMTPSink":
+        threading.Thread(target=self.server.serve_forever, name="smtp-sink", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# -- OpenAI -------------------------------------------------------------------
+
+DEFAULT_LATENCY = {"responses": 1.0, "run": 2.0, "api": 0.05}
+
+
+class OpenAIStub:
+    """
+    Minimal OpenAI-compatible API.
+
+    Responses calls answer the schema they ask for (clarifying question,
+    follow-up email, attachment details). Runs of `triage_assistant_id` return
+    `incident_types`; any other assistant asks a question on its first
+    `decide_after` runs of a thread, then calls a decision tool with
+    `tool_args.get(assistant_id, default)` and completes once outputs arrive.
+
+    `latency` maps "responses", "run" (time a run spends in progress) and "api"
+    (everything else) to seconds; each sleep is scaled by 1 +/- `jitter`.
+    """
+
+    def __init__(self, latency: Optional[Dict[str, float]] = None, jitter: float = 0.2,
+                 triage_assistant_id: str = "asst_triage", incident_types: Optional[Dict[str, str]] = None,
+                 decide_after: int = 1, tool_args: Optional[Dict[str, Dict]] = None,
+                 host: str = "127.0.0.1", port: int = 0, seed: int = 0):
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.jitter = jitter
+        self.triage_assistant_id = triage_assistant_id
+        self.incident_types = incident_types or {"accidental_and_glass_damage": "Collision damage to the vehicle"}
+        self.decide_after = decide_after
+        self.tool_args = tool_args or {}
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.threads: Dict[str, Dict] = {}
+        self.runs: Dict[str, Dict] = {}
+        self.requests: Dict[str, int] = {}
+
+        stub = self
+
+        class Handler(_APIHandler):
+            api = stub
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.host, self.port = self.server.server_address
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self) -> "OpenAIStub":
+        threading.Thread(target=self.server.serve_forever, name="openai-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def sleep(self, kind: str):
+        seconds = self.latency.get(kind, 0.0)
+        if seconds > 0:
+            with self.lock:
+                scale = 1 + self.random.uniform(-self.jitter, self.jitter)
+            time.sleep(seconds * scale)
+
+    def count(self, endpoint: str):
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    # -- Responses --------------------------------------------------------------
+
+    def respond(self, body: Dict) -> Dict:
+        schema = ((body.get("text") or {}).get("format") or {}).get("name")
+        if schema == "CLARIFY_INCIDENT":
+            result = {"clarifying_question": "When and where did the incident happen, and was anyone hurt?"}
+        elif schema == "FOLLOW_UP_QUESTIONS":
+            result = {"email_html": "<b>To help us proceed with your claim, please respond to the following "
+                                    "questions:</b><br><br>1. What was the date of the incident?<br>"}
+        elif schema == "ATTACHMENT_DETAILS":
+            labels = [block["text"].split("\n", 1)[0][len("Attachment: "):]
+                      for message in body.get("input", []) if isinstance(message.get("content"), list)
+                      for block in message["content"]
+                      if block.get("type") == "input_text" and block.get("text", "").startswith("Attachment: ")]
+            result = {"attachment_details": [{"name": label, "details": f"Synthetic description of {label}."}
+                                             for label in labels]}
+        else:
+            result = {}
+        return {
+            "id": f"resp_{uuid.uuid4().hex}", "object": "response", "created_at": int(time.time()),
+            "model": body.get("model", "gpt-4.1"), "status": "completed",
+            "parallel_tool_calls": False, "tool_choice": "auto", "tools": [],
+            "output": [{
+                "type": "message", "id": f"msg_{uuid.uuid4().hex}", "status": "completed", "role": "assistant",
+                "content": [{"type": "output_text", "text": json.dumps(result), "annotations": []}]
+            }],
+        }
+
+    # -- Assistants -------------------------------------------------------------
+
+    def create_thread(self, body: Dict) -> Dict:
+        thread_id = f"thread_{uuid.uuid4().hex}"
+        with self.lock:
+            self.threads[thread_id] = {"messages": [], "runs": 0}
+        for message in body.get("messages") or []:
+            self.add_message(thread_id, message.get("role", "user"), message.get("content"))
+        return {"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}}
+
+    def add_message(self, thread_id: str, role: str, content) -> Dict:
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        message = {
+            "id": f"msg_{uuid.uuid4().hex}", "object": "thread.message", "created_at": int(time.time()),
+            "thread_id": thread_id, "role": role, "assistant_id": None, "run_id": None,
+            "attachments": [], "metadata": {},
+            "content": [{"type": "text", "text": {"value": content, "annotations": []}}],
+        }
+        with self.lock:
+            self.threads.setdefault(thread_id, {"messages": [], "runs": 0})["messages"].append(message)
+        return message
+
+    def list_messages(self, thread_id: str, order: str, limit: int) -> Dict:
+        with self.lock:
+            messages = list(self.threads.get(thread_id, {}).get("messages", []))
+        if order == "desc":
+            messages.reverse()
+        messages = messages[:limit]
+        return {"object": "list", "data": messages, "has_more": False,
+                "first_id": messages[0]["id"] if messages else None,
+                "last_id": messages[-1]["id"] if messages else None}
+
+    def create_run(self, thread_id: str, assistant_id: str) -> Dict:
+        with self.lock:
+            thread = self.threads.setdefault(thread_id, {"messages": [], "runs": 0})
+            thread["runs"] += 1
+            number = thread["runs"]
+        run = {
+            "id": f"run_{uuid.uuid4().hex}", "object": "thread.run", "created_at": int(time.time()),
+            "thread_id": thread_id, "assistant_id": assistant_id, "status": "queued",
+            "required_action": None, "model": "gpt-4.1", "instructions": "", "tools": [], "metadata": {},
+            "decides": assistant_id != self.triage_assistant_id and number > self.decide_after,
+        }
+        with self.lock:
+            self.runs[run["id"]] = run
+        return run
+
+    def advance(self, run: Dict, tool_outputs: Optional[List] = None) -> Dict:
+        """Move a run to its next resting state, adding the assistant's reply where it completes."""
+        if run["assistant_id"] == self.triage_assistant_id:
+            self.add_message(run["thread_id"], "assistant", json.dumps({"parameters": {
+                "incident_type": self.incident_types,
+                "incident_description": "Synthetic incident for benchmarking."
+            }}))
+            run.update(status="completed", required_action=None)
+        elif run["decides"] and tool_outputs is None:
+            args = self.tool_args.get(run["assistant_id"], self.tool_args.get("default", {}))
+            run.update(status="requires_action", required_action={
+                "type": "submit_tool_outputs",
+                "submit_tool_outputs": {"tool_calls": [{
+                    "id": f"call_{uuid.uuid4().hex}", "type": "function",
+                    "function": {"name": "make_decision", "arguments": json.dumps(args)}
+                }]}
+            })
+        else:
+            reply = ("Decision recorded." if run["decides"]
+                     else "Could you confirm the date, time and location of the incident?")
+            self.add_message(run["thread_id"], "assistant", reply)
+            run.update(status="completed", required_action=None)
+        return self.public(run)
+
+    @staticmethod
+    def public(run: Dict) -> Dict:
+        return {key: value for key, value in run.items() if key not in ("decides", "ready_at", "outputs")}
+
+
+class _APIHandler(BaseHTTPRequestHandler):
+    api: OpenAIStub
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _json(self, payload: Dict, status: int = 200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def _stream_run(self, run: Dict, tool_outputs: Optional[List] = None):
+        """Server-sent events for a run: created / in_progress now, the resting state after the run latency."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        api = self.api
+        for status in (("queued", "in_progress") if tool_outputs is None else ("in_progress",)):
+            event = "thread.run.created" if status == "queued" else "thread.run.in_progress"
+            self._chunk(f"event: {event}\ndata: {json.dumps({**api.public(run), 'status': status})}\n\n".encode())
+        self.wfile.flush()
+        api.sleep("run")
+        final = api.advance(run, tool_outputs)
+        event = "thread.run.requires_action" if final["status"] == "requires_action" else "thread.run.completed"
+        self._chunk(f"event: {event}\ndata: {json.dumps(final)}\n\n".encode())
+        self._chunk(b"event: done\ndata: [DONE]\n\n")
+        self._chunk(b"")
+
+    def _poll_run(self, run: Dict, tool_outputs: Optional[List] = None):
+        run.update(status="in_progress", required_action=None,
+                   ready_at=time.monotonic() + self.api.latency.get("run", 0.0), outputs=tool_outputs)
+        self._json(self.api.public(run))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")[1:]  # drop "v1"
+        api = self.api
+        if len(parts) == 3 and parts[0] == "threads" and parts[2] == "messages":
+            api.count("messages.list")
+            api.sleep("api")
+            query = parse_qs(url.query)
+            return self._json(api.list_messages(parts[1], query.get("order", ["desc"])[0],
+                                                int(query.get("limit", ["20"])[0])))
+        if len(parts) == 4 and parts[0] == "threads" and parts[2] == "runs":
+            api.count("runs.retrieve")
+            run = api.runs.get(parts[3])
+            if run is None:
+                return self._json({"error": {"message": "No such run"}}, 404)
+            if run["status"] == "in_progress" and time.monotonic() >= run["ready_at"]:
+                api.advance(run, run.get("outputs"))
+            return self._json(api.public(run))
+        self._json({"error": {"message": f"Unsupported path {url.path}"}}, 404)
+
+    def do_POST(self):
+        parts = urlparse(self.path).path.strip("/").split("/")[1:]
+        body = self._body()
+        api = self.api
+        if parts == ["responses"]:
+            api.count("responses.create")
+            api.sleep("responses")
+            return self._json(api.respond(body))
+        if parts == ["threads"]:
+            api.count("threads.create")
+            api.sleep("api")
+            return self._json(api.create_thread(body))
+        if len(parts) == 3 and parts[0] == "threads" and parts[2] == "messages":
+            api.count("messages.create")
+            api.sleep("api")
+            return self._json(api.add_message(parts[1], body.get("role", "user"), body.get("content")))
+        if len(parts) == 3 and parts[0] == "threads" and parts[2] == "runs":
+            api.count("runs.create")
+            run = api.create_run(parts[1], body.get("assistant_id"))
+            return self._stream_run(run) if body.get("stream") else self._poll_run(run)
+        if len(parts) == 5 and parts[0] == "threads" and parts[2] == "runs":
+            run = api.runs.get(parts[3])
+            if run is None:
+                return self._json({"error": {"message": "No such run"}}, 404)
+            if parts[4] == "submit_tool_outputs":
+                api.count("runs.submit_tool_outputs")
+                outputs = body.get("tool_outputs", [])
+                return self._stream_run(run, outputs) if body.get("stream") else self._poll_run(run, outputs)
+            if parts[4] == "cancel":
+                api.count("runs.cancel")
+                run.update(status="cancelled", required_action=None)
+                return self._json(api.public(run))
+        self._json({"error": {"message": f"Unsupported path {self.path}"}}, 404)
@@ -0,0 +1,506 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set
+
+from utils import (
+    generate_thread_id, get_session_folder, get_history_log, load_json, save_json, json_exists,
+    session_turn, SESSIONS_DIR
+)
+
+logger = logging.getLogger(__name__)
+
+CLAIM_STORE = os.getenv("CLAIM_STORE", "files")  # "files" or "sqlite"
+CLAIM_DB_PATH = os.getenv("CLAIM_DB_PATH", "claims.db")
+
+CLAIM_FILE = "claim.json"
+CONTEXT_FILE = "context.json"
+FOLLOW_UP_LOG = "follow_up"
+DECISIONS_LOG = "decisions"
+AGENT_MESSAGES_LOG = "{agent}_messages"
+AGENT_DATA_LOG = "{agent}_data"
+
+
+def default_context() -> Dict:
+    return {
+        "conversation_history": [],
+        "attachment_details": {},
+        "last_updated": time.time()
+    }
+
+
+class ClaimStore(ABC):
+    """
+    Storage backend for claim state and per-claim histories.
+
+    Claims are addressed by the claimant's email. Implementations must be safe to
+    call from several threads working on the same claim.
+    """
+
+    @contextmanager
+    def turn(self, email: str):
+        """Scope for one orchestration turn; backends may batch writes inside it."""
+        yield
+
+    # Claim state
+    @abstractmethod
+    def claim_exists(self, email: str) -> bool:
+        ...
+
+    @abstractmethod
+    def load_claim(self, email: str) -> Dict:
+        """Current claim state, or {} if the claim does not exist."""
+
+    @abstractmethod
+    def save_claim(self, email: str, claim: Dict):
+        ...
+
+    @abstractmethod
+    def claims_in_stage(self, stage: str) -> List[str]:
+        """Thread ids of every claim currently in `stage`."""
+
+    # Conversation context
+    @abstractmethod
+    def load_context(self, email: str) -> Dict:
+        ...
+
+    @abstractmethod
+    def ensure_context(self, email: str):
+        ...
+
+    @abstractmethod
+    def append_context_messages(self, email: str, messages: List[Dict], attachment_details: Optional[Dict] = None):
+        ...
+
+    # Agent histories
+    @abstractmethod
+    def append_agent_message(self, email: str, agent_name: str, entry: Dict):
+        ...
+
+    @abstractmethod
+    def agent_messages_tail(self, email: str, agent_name: str, n: int) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def append_agent_data(self, email: str, agent_name: str, entry: Dict):
+        ...
+
+    @abstractmethod
+    def list_agent_data(self, email: str, agent_name: str) -> List[Dict]:
+        """Every {"timestamp", "data"} entry the agent returned, oldest first."""
+
+    # Decisions
+    @abstractmethod
+    def append_decision(self, email: str, entry: Dict):
+        ...
+
+    @abstractmethod
+    def list_decisions(self, email: str) -> List[Dict]:
+        ...
+
+    def agents_with_decisions(self, email: str) -> Set[str]:
+        return {d.get("agent") for d in self.list_decisions(email)}
+
+    # Follow-ups
+    @abstractmethod
+    def append_follow_up(self, email: str, entry: Dict):
+        ...
+
+    @abstractmethod
+    def list_follow_ups(self, email: str) -> List[Dict]:
+        ...
+
+    def has_follow_ups(self, email: str) -> bool:
+        return bool(self.list_follow_ups(email))
+
+    @abstractmethod
+    def clear_follow_ups(self, email: str):
+        ...
+
+
+class FileClaimStore(ClaimStore):
+    """The sessions/thread_<hash>/ tree: JSON documents plus append-only JSONL histories."""
+
+    @contextmanager
+    def turn(self, email: str):
+        with session_turn(email):
+            yield
+
+    def _path(self, email: str, name: str) -> str:
+        return os.path.join(get_session_folder(email), name)
+
+    def claim_exists(self, email: str) -> bool:
+        return json_exists(self._path(email, CLAIM_FILE))
+
+    def load_claim(self, email: str) -> Dict:
+        path = self._path(email, CLAIM_FILE)
+        return load_json(path) if json_exists(path) else {}
+
+    def save_claim(self, email: str, claim: Dict):
+        save_json(self._path(email, CLAIM_FILE), claim)
+
+    def claims_in_stage(self, stage: str) -> List[str]:
+        matches = []
+        if not os.path.isdir(SESSIONS_DIR):
+            return matches
+        for name in sorted(os.listdir(SESSIONS_DIR)):
+            path = os.path.join(SESSIONS_DIR, name, CLAIM_FILE)
+            if name.startswith("thread_") and os.path.exists(path) and load_json(path).get("stage") == stage:
+                matches.append(name[len("thread_"):])
+        return matches
+
+    def load_context(self, email: str) -> Dict:
+        path = self._path(email, CONTEXT_FILE)
+        return load_json(path) if json_exists(path) else default_context()
+
+    def ensure_context(self, email: str):
+        path = self._path(email, CONTEXT_FILE)
+        if not json_exists(path):
+            save_json(path, default_context())
+
+    def append_context_messages(self, email: str, messages: List[Dict], attachment_details: Optional[Dict] = None):
+        context = self.load_context(email)
+        context["conversation_history"].extend(messages)
+        if attachment_details:
+            context["attachment_details"] = attachment_details
+        context["last_updated"] = time.time()
+        save_json(self._path(email, CONTEXT_FILE), context)
+
+    def append_agent_message(self, email: str, agent_name: str, entry: Dict):
+        get_history_log(email, AGENT_MESSAGES_LOG.format(agent=agent_name)).append(entry)
+
+    def agent_messages_tail(self, email: str, agent_name: str, n: int) -> List[Dict]:
+        return get_history_log(email, AGENT_MESSAGES_LOG.format(agent=agent_name)).tail(n)
+
+    def append_agent_data(self, email: str, agent_name: str, entry: Dict):
+        get_history_log(email, AGENT_DATA_LOG.format(agent=agent_name)).append(entry)
+
+    def list_agent_data(self, email: str, agent_name: str) -> List[Dict]:
+        return get_history_log(email, AGENT_DATA_LOG.format(agent=agent_name)).read_all()
+
+    def append_decision(self, email: str, entry: Dict):
+        get_history_log(email, DECISIONS_LOG).append(entry)
+
+    def list_decisions(self, email: str) -> List[Dict]:
+        return get_history_log(email, DECISIONS_LOG).read_all()
+
+    def append_follow_up(self, email: str, entry: Dict):
+        get_history_log(email, FOLLOW_UP_LOG).append(entry)
+
+    def list_follow_ups(self, email: str) -> List[Dict]:
+        return get_history_log(email, FOLLOW_UP_LOG).read_all()
+
+    def has_follow_ups(self, email: str) -> bool:
+        return get_history_log(email, FOLLOW_UP_LOG).exists()
+
+    def clear_follow_ups(self, email: str):
+        get_history_log(email, FOLLOW_UP_LOG).clear()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS claims (
+    thread_id   TEXT PRIMARY KEY,
+    email       TEXT,
+    stage       TEXT NOT NULL,
+    data        TEXT NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_claims_stage ON claims(stage);
+CREATE INDEX IF NOT EXISTS idx_claims_email ON claims(email);
+
+CREATE TABLE IF NOT EXISTS contexts (
+    thread_id           TEXT PRIMARY KEY,
+    attachment_details  TEXT NOT NULL,
+    last_updated        REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS context_messages (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    thread_id   TEXT NOT NULL,
+    role        TEXT NOT NULL,
+    content     TEXT NOT NULL,
+    timestamp   REAL,
+    attachments TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_context_messages_thread ON context_messages(thread_id, id);
+
+CREATE TABLE IF NOT EXISTS agent_messages (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    thread_id   TEXT NOT NULL,
+    agent       TEXT NOT NULL,
+    role        TEXT NOT NULL,
+    content     TEXT NOT NULL,
+    timestamp   REAL
+);
+CREATE INDEX IF NOT EXISTS idx_agent_messages_thread_agent ON agent_messages(thread_id, agent, id);
+
+CREATE TABLE IF NOT EXISTS agent_data (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    thread_id   TEXT NOT NULL,
+    agent       TEXT NOT NULL,
+    data        TEXT NOT NULL,
+    timestamp   REAL
+);
+CREATE INDEX IF NOT EXISTS idx_agent_data_thread_agent ON agent_data(thread_id, agent, id);
+
+CREATE TABLE IF NOT EXISTS decisions (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    thread_id   TEXT NOT NULL,
+    agent       TEXT NOT NULL,
+    outcome     TEXT,
+    entry       TEXT NOT NULL,
+    timestamp   REAL
+);
+CREATE INDEX IF NOT EXISTS idx_decisions_thread_agent ON decisions(thread_id, agent);
+CREATE INDEX IF NOT EXISTS idx_decisions_agent_outcome ON decisions(agent, outcome);
+
+CREATE TABLE IF NOT EXISTS follow_ups (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    thread_id   TEXT NOT NULL,
+    agent       TEXT,
+    entry       TEXT NOT NULL,
+    timestamp   REAL
+);
+CREATE INDEX IF NOT EXISTS idx_follow_ups_thread ON follow_ups(thread_id, id);
+"""
+
+
+class SQLiteClaimStore(ClaimStore):
+    """
+    Embedded SQLite backend.
+
+    Runs in WAL mode so readers (operational queries, replay tools) never block the
+    orchestrator's writers. Each thread gets its own connection.
+    """
+
+    def __init__(self, db_path: str = CLAIM_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        conn = self._connect()
+        with conn:
+            return conn.execute(sql, params)
+
+    def _query(self, sql: str, params=()) -> List[sqlite3.Row]:
+        return self._connect().execute(sql, params).fetchall()
+
+    @contextmanager
+    def transaction(self):
+        """This thread's connection, committed when the block ends (rolled back if it raises)."""
+        conn = self._connect()
+        with conn:
+            yield conn
+
+    def has_claim(self, thread_id: str) -> bool:
+        return bool(self._query("SELECT 1 FROM claims WHERE thread_id = ?", (thread_id,)))
+
+    def delete_thread(self, thread_id: str):
+        """Remove a claim and every history recorded for it, in one transaction."""
+        with self.transaction() as conn:
+            for table in ("claims", "contexts", "context_messages", "agent_messages", "agent_data",
+                          "decisions", "follow_ups"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def touch_context(self, thread_id: str, last_updated: float):
+        self._execute("UPDATE contexts SET last_updated = ? WHERE thread_id = ?", (last_updated, thread_id))
+
+    def claim_exists(self, email: str) -> bool:
+        return self.has_claim(generate_thread_id(email))
+
+    def load_claim(self, email: str) -> Dict:
+        rows = self._query("SELECT data FROM claims WHERE thread_id = ?", (generate_thread_id(email),))
+        return json.loads(rows[0]["data"]) if rows else {}
+
+    def save_claim(self, email: str, claim: Dict):
+        self.save_claim_by_thread(generate_thread_id(email), claim, email=email)
+
+    def save_claim_by_thread(self, thread_id: str, claim: Dict, email: Optional[str] = None):
+        self._execute(
+            "INSERT INTO claims (thread_id, email, stage, data, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(thread_id) DO UPDATE SET email = COALESCE(excluded.email, claims.email), "
+            "stage = excluded.stage, data = excluded.data, updated_at = excluded.updated_at",
+            (thread_id, email, claim.get("stage", "NEW"), json.dumps(claim), time.time())
+        )
+
+    def claims_in_stage(self, stage: str) -> List[str]:
+        rows = self._query("SELECT thread_id FROM claims WHERE stage = ? ORDER BY thread_id", (stage,))
+        return [row["thread_id"] for row in rows]
+
+    def load_context(self, email: str) -> Dict:
+        thread_id = generate_thread_id(email)
+        rows = self._query("SELECT attachment_details, last_updated FROM contexts WHERE thread_id = ?", (thread_id,))
+        if not rows:
+            return default_context()
+        history = []
+        for row in self._query(
+            "SELECT role, content, timestamp, attachments FROM context_messages WHERE thread_id = ? ORDER BY id",
+            (thread_id,)
+        ):
+            message = {"role": row["role"], "content": row["content"], "timestamp": row["timestamp"]}
+            if row["attachments"] is not None:
+                message["attachments"] = json.loads(row["attachments"])
+            history.append(message)
+        return {
+            "conversation_history": history,
+            "attachment_details": json.loads(rows[0]["attachment_details"]),
+            "last_updated": rows[0]["last_updated"]
+        }
+
+    def ensure_context(self, email: str):
+        self._execute(
+            "INSERT OR IGNORE INTO contexts (thread_id, attachment_details, last_updated) VALUES (?, ?, ?)",
+            (generate_thread_id(email), "{}", time.time())
+        )
+
+    def append_context_messages(self, email: str, messages: List[Dict], attachment_details: Optional[Dict] = None):
+        self.append_context_messages_by_thread(generate_thread_id(email), messages, attachment_details)
+
+    def append_context_messages_by_thread(self, thread_id: str, messages: List[Dict],
+                                          attachment_details: Optional[Dict] = None):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO contexts (thread_id, attachment_details, last_updated) VALUES (?, ?, ?)",
+                (thread_id, "{}", time.time())
+            )
+            conn.executemany(
+                "INSERT INTO context_messages (thread_id, role, content, timestamp, attachments) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (thread_id, m["role"], m["content"], m.get("timestamp"),
+                     json.dumps(m["attachments"]) if "attachments" in m else None)
+                    for m in messages
+                ]
+            )
+            if attachment_details:
+                conn.execute("UPDATE contexts SET attachment_details = ? WHERE thread_id = ?",
+                             (json.dumps(attachment_details), thread_id))
+            conn.execute("UPDATE contexts SET last_updated = ? WHERE thread_id = ?", (time.time(), thread_id))
+
+    def append_agent_message(self, email: str, agent_name: str, entry: Dict):
+        self.append_agent_messages_by_thread(generate_thread_id(email), agent_name, [entry])
+
+    def append_agent_messages_by_thread(self, thread_id: str, agent_name: str, entries: List[Dict]):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO agent_messages (thread_id, agent, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [(thread_id, agent_name, e["role"], e["content"], e.get("timestamp")) for e in entries]
+            )
+
+    def agent_messages_tail(self, email: str, agent_name: str, n: int) -> List[Dict]:
+        rows = self._query(
+            "SELECT role, content, timestamp FROM agent_messages WHERE thread_id = ? AND agent = ? "
+            "ORDER BY id DESC LIMIT ?",
+            (generate_thread_id(email), agent_name, n)
+        )
+        return [dict(row) for row in reversed(rows)]
+
+    def append_agent_data(self, email: str, agent_name: str, entry: Dict):
+        self.append_agent_data_by_thread(generate_thread_id(email), agent_name, [entry])
+
+    def append_agent_data_by_thread(self, thread_id: str, agent_name: str, entries: List[Dict]):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO agent_data (thread_id, agent, data, timestamp) VALUES (?, ?, ?, ?)",
+                [(thread_id, agent_name, json.dumps(e.get("data")), e.get("timestamp")) for e in entries]
+            )
+
+    def list_agent_data(self, email: str, agent_name: str) -> List[Dict]:
+        return self.list_agent_data_by_thread(generate_thread_id(email), agent_name)
+
+    def list_agent_data_by_thread(self, thread_id: str, agent_name: str) -> List[Dict]:
+        rows = self._query(
+            "SELECT data, timestamp FROM agent_data WHERE thread_id = ? AND agent = ? ORDER BY id",
+            (thread_id, agent_name)
+        )
+        return [{"timestamp": row["timestamp"], "data": json.loads(row["data"])} for row in rows]
+
+    def append_decision(self, email: str, entry: Dict):
+        self.append_decisions_by_thread(generate_thread_id(email), [entry])
+
+    def append_decisions_by_thread(self, thread_id: str, entries: List[Dict]):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO decisions (thread_id, agent, outcome, entry, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (thread_id, e.get("agent"), (e.get("decision") or {}).get("decision"), json.dumps(e),
+                     e.get("timestamp"))
+                    for e in entries
+                ]
+            )
+
+    def list_decisions(self, email: str) -> List[Dict]:
+        return self.list_decisions_by_thread(generate_thread_id(email))
+
+    def list_decisions_by_thread(self, thread_id: str) -> List[Dict]:
+        rows = self._query("SELECT entry FROM decisions WHERE thread_id = ? ORDER BY id", (thread_id,))
+        return [json.loads(row["entry"]) for row in rows]
+
+    def threads_with_decisions(self) -> List[str]:
+        """Thread ids of every claim with at least one recorded decision."""
+        return [row["thread_id"] for row in self._query("SELECT DISTINCT thread_id FROM decisions ORDER BY thread_id")]
+
+    def agents_with_decisions(self, email: str) -> Set[str]:
+        rows = self._query("SELECT DISTINCT agent FROM decisions WHERE thread_id = ?", (generate_thread_id(email),))
+        return {row["agent"] for row in rows}
+
+    def append_follow_up(self, email: str, entry: Dict):
+        self.append_follow_ups_by_thread(generate_thread_id(email), [entry])
+
+    def append_follow_ups_by_thread(self, thread_id: str, entries: List[Dict]):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO follow_ups (thread_id, agent, entry, timestamp) VALUES (?, ?, ?, ?)",
+                [(thread_id, e.get("agent"), json.dumps(e), e.get("timestamp")) for e in entries]
+            )
+
+    def list_follow_ups(self, email: str) -> List[Dict]:
+        rows = self._query("SELECT entry FROM follow_ups WHERE thread_id = ? ORDER BY id", (generate_thread_id(email),))
+        return [json.loads(row["entry"]) for row in rows]
+
+    def has_follow_ups(self, email: str) -> bool:
+        return bool(self._query("SELECT 1 FROM follow_ups WHERE thread_id = ? LIMIT 1", (generate_thread_id(email),)))
+
+    def clear_follow_ups(self, email: str):
+        self._execute("DELETE FROM follow_ups WHERE thread_id = ?", (generate_thread_id(email),))
+
+
+_store: Optional[ClaimStore] = None
+_store_lock = threading.Lock()
+
+
+def get_claim_store() -> ClaimStore:
+    """Process-wide claim store selected by CLAIM_STORE ("files" or "sqlite")."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if CLAIM_STORE == "sqlite":
+                _store = SQLiteClaimStore(CLAIM_DB_PATH)
+            elif CLAIM_STORE == "files":
+                _store = FileClaimStore()
+            else:
+                raise ValueError(f"Unknown CLAIM_STORE backend: {CLAIM_STORE}")
+            logger.info(f"Using {type(_store).__name__} for claim state")
+        return _store
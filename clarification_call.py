@@ -1,14 +1,14 @@
 import os
 import json
 import hashlib
+import logging
 from typing import Dict
-from openai import OpenAI
-from dotenv import load_dotenv
 
-from utils import get_session_folder, load_json, get_claim_file, save_json
+from utils import get_session_folder, load_json, get_claim_file, save_json, json_exists
+from openai_client import get_client
+import tracing
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger(__name__)
 
 SESSIONS_DIR = "sessions"
 
@@ -83,14 +83,15 @@ You are expected to understand the following module structure so you can tailor
 def load_attachment_data(sender_email: str) -> list:
     folder = get_session_folder(sender_email)
     path = os.path.join(folder, "attachment_data.json")
-    print(f"[load_attachment_data] Looking for attachment data at: {path}")
-    if os.path.exists(path):
-        data = json.load(open(path, "r"))
-        print(f"[load_attachment_data] Loaded attachment data with {len(data.get('attachment_details', []))} entries")
+    logger.debug(f"Looking for attachment data at: {path}")
+    if json_exists(path):
+        data = load_json(path)
+        logger.debug(f"Loaded attachment data with {len(data.get('attachment_details', []))} entries")
         return data.get("attachment_details", [])
-    print("[load_attachment_data] No attachment data found.")
+    logger.debug("No attachment data found.")
     return []
 
+@tracing.traced("clarifying_question")
 def run_clarifying_question(
     sender_email: str,
     message_text: str
@@ -100,7 +101,7 @@ def run_clarifying_question(
     and previously saved attachment_data.json, then saves the result
     to prelim_data.json in the session folder.
     """
-    print(f"[run_clarifying_question] Starting clarifying question for: {sender_email}")
+    logger.debug(f"Starting clarifying question for: {sender_email}")
     # 1) load attachment details
     attachment_data = load_attachment_data(sender_email)  # Now a list
 
@@ -110,22 +111,22 @@ def run_clarifying_question(
         fname = attachment.get("name", "unknown")
         details = attachment.get("details", "")
         if details:
-            print(f"[run_clarifying_question] Adding details for attachment: {fname}")
+            logger.debug(f"Adding details for attachment: {fname}")
             attachment_summary += f"\n\n[{fname}]\n{details.strip()[:1000]}"
 
     # 3) build user content blocks
-    print("[run_clarifying_question] Building user content blocks...")
+    logger.debug("Building user content blocks...")
     user_blocks = [{"type": "input_text", "text": message_text}]
     if attachment_summary:
-        print("[run_clarifying_question] Including attachment summary in user blocks.")
+        logger.debug("Including attachment summary in user blocks.")
         user_blocks.append({
             "type": "input_text",
             "text": "Attachment Details:\n" + attachment_summary.strip()
         })
 
     # 4) call the Responses API
-    print("[run_clarifying_question] Calling OpenAI Responses API...")
-    response = client.responses.create(
+    logger.debug("Calling OpenAI Responses API...")
+    response = get_client().responses.create(
         model="gpt-4.1",
         input=[
             {"role": "system", "content": CLARIFY_INSTRUCTION},
@@ -140,17 +141,17 @@ def run_clarifying_question(
             }
         }
     )
-    print("[run_clarifying_question] Received response from OpenAI API.")
+    logger.debug("Received response from OpenAI API.")
     result = json.loads(response.output_text)
-    print(f"[run_clarifying_question] Parsed response: {json.dumps(result, indent=2)}")
+    logger.debug(f"Parsed response: {result}")
     
-    from advanced_imap_listener import send_email
-        # Send clarifying question via email (HTML formatted)
+    from mail_outbox import enqueue_email
+        # Queue clarifying question via email (HTML formatted)
     subject = "Quick clarification needed to process your claim"
     html_body = (
         "<p>Thanks for reporting your incident. Based on the information so far, we need a quick clarification to route your claim appropriately.</p>"
         "<p><b>Please reply with the following:</b></p>"
         f"<p>{result['clarifying_question']}</p>"
     )
-    send_email(to=sender_email, subject=subject, html=html_body)
-    print("[orchestrate] Clarifying question sent via email.")
+    enqueue_email(to=sender_email, subject=subject, html=html_body)
+    logger.info("Clarifying question queued for email delivery.")
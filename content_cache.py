@@ -0,0 +1,157 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from session_store import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+CONTENT_CACHE_DIR = os.getenv("CONTENT_CACHE_DIR", os.path.join(".cache", "content"))
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentCache:
+    """
+    On-disk cache of JSON results (or raw bytes, e.g. rendered pages) keyed by
+    content hash plus the parameters that produced them, shared by every session.
+
+    Entries live under `<CONTENT_CACHE_DIR>/<name>/<key[:2]>/<key>.<ext>`. A hit
+    touches the entry's mtime, and once the directory grows past `max_bytes` the
+    least recently used entries are removed until it is back under 90% of the limit.
+    """
+
+    def __init__(self, name: str, max_bytes: int, root: str = CONTENT_CACHE_DIR):
+        self.name = name
+        self.folder = os.path.join(root, name)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._size: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(digest: str, **params) -> str:
+        material = json.dumps({"digest": digest, **params}, sort_keys=True, default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, ext: str = ".json") -> str:
+        return os.path.join(self.folder, key[:2], key + ext)
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.folder):
+            for name in filenames:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _current_size(self) -> int:
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        return self._size
+
+    def _touch(self, path: str):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def _count(self, hit: bool):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._count(False)
+            return None
+        self._touch(path)
+        self._count(True)
+        return value
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        path = self._path(key, ".bin")
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+        except FileNotFoundError:
+            self._count(False)
+            return None
+        self._touch(path)
+        self._count(True)
+        return value
+
+    def _store(self, path: str, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            write(path)
+            self._size = self._current_size() - previous + os.path.getsize(path)
+            self.stores += 1
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def put(self, key: str, value: Any):
+        self._store(self._path(key), lambda path: write_json_atomic(path, value))
+
+    def put_bytes(self, key: str, value: bytes):
+        def write(path: str):
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(value)
+            os.replace(tmp, path)
+        self._store(self._path(key, ".bin"), write)
+
+    def _evict(self):
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for path, entry_size, _ in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            size -= entry_size
+            self.evictions += 1
+        self._size = size
+        logger.info(f"Evicted {self.name} cache entries down to {size} bytes")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "cache": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "bytes": self._current_size(),
+                "max_bytes": self.max_bytes,
+            }
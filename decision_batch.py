@@ -0,0 +1,368 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from decision_rules import (
+    REQUIRED, DecisionEngine, Flag, Rule, ForEach,
+    Predicate, Truthy, Present, Is, FieldTest, AllOf, AnyOf, Not,
+)
+
+try:
+    import numpy as np
+except ImportError:  # batch calls fall back to the per-claim evaluators
+    np = None
+
+logger = logging.getLogger(__name__)
+
+DECISION_TYPES = ("approved", "rejected", "pending")
+
+
+class _Missing:
+    """Marks a field absent from a claim payload, as opposed to present with value None."""
+
+    def __repr__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+Evaluator = Callable[[Dict], Dict]
+
+
+@dataclass
+class BatchResult:
+    decisions: List[Optional[str]]
+    reasons: Optional[List[Optional[str]]]
+    errors: Dict[int, str] = field(default_factory=dict)  # row -> error raised by the evaluator
+
+    def __len__(self) -> int:
+        return len(self.decisions)
+
+    def records(self) -> List[Optional[Dict]]:
+        """Per-claim results shaped like the evaluators' return value (None where one raised)."""
+        reasons = self.reasons or [None] * len(self.decisions)
+        return [None if i in self.errors else {"decision": decision, "reason": reason}
+                for i, (decision, reason) in enumerate(zip(self.decisions, reasons))]
+
+
+class ClaimTable:
+    """
+    Claim payloads stored by column. Built from a list of dicts or from a mapping of
+    field name to values (use MISSING for fields a claim does not have). Column
+    predicates are computed once per field and cached as boolean arrays.
+    """
+
+    def __init__(self, size: int, records: Optional[Sequence[Dict]] = None,
+                 columns: Optional[Mapping[str, Sequence]] = None):
+        self.size = size
+        self._records = records
+        self._columns = dict(columns or {})
+        self._cache: Dict[tuple, Any] = {}
+        self.irregular = np.zeros(size, dtype=bool)  # rows the columnar path cannot judge
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict]) -> "ClaimTable":
+        return cls(len(records), records=records)
+
+    @classmethod
+    def from_columns(cls, columns: Mapping[str, Sequence]) -> "ClaimTable":
+        sizes = {len(values) for values in columns.values()}
+        if len(sizes) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(sizes)}")
+        return cls(sizes.pop() if sizes else 0, columns=columns)
+
+    def values(self, name: str) -> Sequence:
+        values = self._columns.get(name)
+        if values is None:
+            if self._records is not None:
+                values = [record.get(name, MISSING) for record in self._records]
+            else:
+                values = [MISSING] * self.size
+            self._columns[name] = values
+        return values
+
+    def record(self, row: int) -> Dict:
+        if self._records is not None:
+            return self._records[row]
+        return {name: values[row] for name, values in self._columns.items() if values[row] is not MISSING}
+
+    def _cached(self, key: tuple, build: Callable[[], Any]):
+        result = self._cache.get(key)
+        if result is None:
+            result = self._cache[key] = build()
+        return result
+
+    def _mask(self, values: Iterable) -> "np.ndarray":
+        return np.fromiter(values, dtype=bool, count=self.size)
+
+    # -- predicates ---------------------------------------------------------------
+
+    def present(self, name: str):
+        """`name in claim`"""
+        return self._cached(("present", name), lambda: self._mask(v is not MISSING for v in self.values(name)))
+
+    def truthy(self, name: str, default: Any = None):
+        """`claim.get(name, default)` is truthy"""
+        fallback = bool(default)
+        return self._cached(("truthy", name, fallback), lambda: self._mask(
+            fallback if v is MISSING else bool(v) for v in self.values(name)))
+
+    def is_(self, name: str, value: Any):
+        """`claim.get(name) is value`"""
+        return self._cached(("is", name, id(value)), lambda: self._mask(
+            (None if v is MISSING else v) is value for v in self.values(name)))
+
+    def apply(self, predicate: FieldTest) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        A single-field predicate's result per row and the rows where evaluating it
+        raises, computed once per distinct value.
+        """
+        def build():
+            seen: Dict[Any, bool] = {}
+            result, errors = np.zeros(self.size, dtype=bool), np.zeros(self.size, dtype=bool)
+            for row, value in enumerate(self.values(predicate.field)):
+                if value is MISSING:
+                    if predicate.default is REQUIRED:
+                        errors[row] = True
+                        continue
+                    value = predicate.default
+                key = (type(value), value)  # keeps True and 1 apart
+                try:
+                    outcome = seen.get(key)
+                except TypeError:  # unhashable
+                    key, outcome = None, None
+                if outcome is None:
+                    try:
+                        outcome = predicate.test(value)
+                    except Exception:
+                        errors[row] = True
+                        continue
+                    if key is not None:
+                        seen[key] = outcome
+                result[row] = outcome
+            return result, errors
+        return self._cached(("apply", predicate), build)
+
+    def evaluate(self, predicate: Predicate) -> Tuple["np.ndarray", "np.ndarray"]:
+        """A predicate's result per row and the rows where the per-claim evaluator would raise on it."""
+        if isinstance(predicate, Truthy):
+            return self.truthy(predicate.field, predicate.default), self._no_errors
+        if isinstance(predicate, Present):
+            return self.present(predicate.field), self._no_errors
+        if isinstance(predicate, Is):
+            return self.is_(predicate.field, predicate.value), self._no_errors
+        if isinstance(predicate, FieldTest):
+            return self.apply(predicate)
+        if isinstance(predicate, Not):
+            result, errors = self.evaluate(predicate.predicate)
+            return ~result, errors
+        if isinstance(predicate, (AllOf, AnyOf)):
+            conjunction = isinstance(predicate, AllOf)
+            result, errors = self.evaluate(predicate.predicates[0])
+            for child in predicate.predicates[1:]:
+                reached = result if conjunction else ~result  # rows that go on to evaluate `child`
+                child_result, child_errors = self.evaluate(child)
+                errors = errors | (reached & child_errors)
+                result = result & child_result if conjunction else result | child_result
+            return result, errors
+        raise TypeError(f"No columnar form for {type(predicate).__name__}")
+
+    @property
+    def _no_errors(self):
+        return self._cached(("no_errors",), lambda: np.zeros(self.size, dtype=bool))
+
+
+class Outcome:
+    """
+    Flags raised for every row of a table, kept in rule order so reasons read
+    exactly as the per-claim evaluator writes them.
+    """
+
+    def __init__(self, table: ClaimTable):
+        self.table = table
+        self.flags = {decision_type: np.zeros(table.size, dtype=bool) for decision_type in DECISION_TYPES}
+        self.rules: List[Tuple["np.ndarray", Flag]] = []
+
+    def flag(self, mask, flag: Flag):
+        """Raise `flag` where `mask` holds."""
+        mask = mask & ~self.table.irregular
+        self.flags[flag.outcome] |= mask
+        self.rules.append((mask, flag))
+
+    def decisions(self, fallback: Optional[str]):
+        """rejected > pending > approved; rows with no flag get `fallback` (None: "approved")."""
+        rejected, pending, approved = self.flags["rejected"], self.flags["pending"], self.flags["approved"]
+        if fallback is None:
+            return np.where(rejected, "rejected", np.where(pending, "pending", "approved"))
+        return np.where(rejected, "rejected", np.where(pending, "pending", np.where(approved, "approved", "pending")))
+
+    def reasons(self, fallback: Optional[str]) -> List[str]:
+        """
+        Reason strings, assembled once per distinct combination of rules hit and
+        shared between rows. Templates quoting field values are rendered once per
+        distinct combination of those values and spliced in per row; rows where
+        rendering raises are marked irregular.
+        """
+        if not self.rules:
+            return [fallback or ""] * self.table.size
+        none = ~(self.flags["rejected"] | self.flags["pending"] | self.flags["approved"])
+        matrix = np.column_stack([mask for mask, _ in self.rules] + [none])
+        hits = np.packbits(matrix, axis=1)
+        _, first, inverse = np.unique(hits.view(np.dtype((np.void, hits.shape[1]))).reshape(-1),
+                                      return_index=True, return_inverse=True)
+
+        templates = []
+        for pattern in matrix[first].tolist():
+            parts = [flag.text if flag.text is not None else index
+                     for index, (hit, (_, flag)) in enumerate(zip(pattern, self.rules)) if hit]
+            if pattern[-1] and fallback is not None:
+                parts.append(fallback)
+            templates.append(parts if any(isinstance(part, int) for part in parts) else " | ".join(parts))
+
+        quoted: Dict[int, Dict[int, str]] = {}  # rule index -> its text for each row it hit
+
+        def quote(index: int) -> Dict[int, str]:
+            mask, flag = self.rules[index]
+            columns = [self.table.values(name) for name in flag.fields]
+            texts, rendered = {}, {}
+            for row in np.flatnonzero(mask).tolist():
+                values = [column[row] for column in columns]
+                try:
+                    key = tuple((type(value), value) for value in values)  # keeps True and 1 apart
+                    text = rendered.get(key)
+                except TypeError:  # unhashable
+                    key, text = None, None
+                if text is None:
+                    try:
+                        text = flag.render({name: value for name, value in zip(flag.fields, values)
+                                            if value is not MISSING})
+                    except Exception:
+                        self.table.irregular[row] = True
+                        text = ""
+                    else:
+                        if key is not None:
+                            rendered[key] = text
+                texts[row] = text
+            return texts
+
+        reasons = [templates[pattern] for pattern in inverse.reshape(-1).tolist()]
+        for row, template in enumerate(reasons):
+            if isinstance(template, list):
+                parts = []
+                for part in template:
+                    if isinstance(part, int):
+                        if part not in quoted:
+                            quoted[part] = quote(part)
+                        part = quoted[part][row]
+                    parts.append(part)
+                reasons[row] = " | ".join(parts)
+        return reasons
+
+
+def _apply_rules(node, table: ClaimTable, outcome: Outcome, active):
+    """Raise the flags of `node` for the `active` rows, following each rule's branches column-wise."""
+    if node is None or not active.any():
+        return
+    if isinstance(node, Flag):
+        outcome.flag(active, node)
+    elif isinstance(node, Rule):
+        result, errors = table.evaluate(node.when)
+        table.irregular |= active & errors
+        _apply_rules(node.then, table, outcome, active & result)
+        _apply_rules(node.otherwise, table, outcome, active & ~result)
+    elif isinstance(node, ForEach):  # per-item rules are left to the per-claim evaluator
+        table.irregular |= active
+    else:
+        for child in node:
+            _apply_rules(child, table, outcome, active)
+
+
+class _RecordList:
+    """Row access over a plain list of payloads, for the per-claim path."""
+
+    def __init__(self, records: Sequence[Dict]):
+        self.records = records
+
+    def record(self, row: int) -> Dict:
+        return self.records[row]
+
+
+def resolve_engine(engine: Union[str, Evaluator]) -> Evaluator:
+    """An evaluator, given itself or its assistant name in decision_engines.DECISION_ENGINE."""
+    if callable(engine):
+        return engine
+    from decision_engines import DECISION_ENGINE
+    try:
+        return DECISION_ENGINE[engine]
+    except KeyError:
+        raise ValueError(f"No decision engine for {engine!r}") from None
+
+
+def _evaluate_rows(evaluator: Evaluator, table, rows: Iterable[int], result: BatchResult):
+    # a DecisionEngine asked for decisions only leaves reasons unrendered, as the batch path does
+    decide_only = result.reasons is None and isinstance(evaluator, DecisionEngine)
+    for row in rows:
+        try:
+            if decide_only:
+                decision = {"decision": evaluator.evaluate(table.record(row)).decision}
+            else:
+                decision = evaluator(table.record(row))
+        except Exception as e:
+            result.decisions[row] = None
+            if result.reasons is not None:
+                result.reasons[row] = None
+            result.errors[row] = f"{type(e).__name__}: {e}"
+            continue
+        result.decisions[row] = decision["decision"]
+        if result.reasons is not None:
+            result.reasons[row] = decision["reason"]
+
+
+def evaluate_batch(engine: Union[str, Evaluator],
+                   claims: Union[Sequence[Dict], Mapping[str, Sequence], ClaimTable],
+                   reasons: bool = True) -> BatchResult:
+    """
+    Score many claim payloads with one decision engine.
+
+    `claims` is a list of tool-call payloads, a columnar mapping of field name to
+    values (MISSING where a claim lacks the field) or a ClaimTable. Results match
+    calling the engine on each payload; a payload the engine raises on gets a None
+    decision and an entry in `errors`. With `reasons=False` only decisions are
+    produced and reason templates are never rendered, as with DecisionEngine.evaluate.
+
+    A DecisionEngine's rule table is evaluated a rule at a time across all rows
+    (requires NumPy). Other evaluators, and rows the columnar path cannot judge
+    (values a predicate raises on, ForEach item lists), go through the per-claim
+    evaluator.
+    """
+    evaluator = resolve_engine(engine)
+    columnar = np is not None and isinstance(evaluator, DecisionEngine)
+
+    if isinstance(claims, ClaimTable):
+        table = claims
+    elif isinstance(claims, Mapping):
+        if np is None:
+            raise RuntimeError("Columnar claims need NumPy; pass a list of payloads instead")
+        table = ClaimTable.from_columns(claims)
+    else:
+        if not columnar:
+            result = BatchResult([None] * len(claims), [None] * len(claims) if reasons else None)
+            _evaluate_rows(evaluator, _RecordList(claims), range(len(claims)), result)
+            return result
+        table = ClaimTable.from_records(claims)
+
+    result = BatchResult([None] * table.size, [None] * table.size if reasons else None)
+    if not columnar:
+        _evaluate_rows(evaluator, table, range(table.size), result)
+        return result
+
+    outcome = Outcome(table)
+    _apply_rules(evaluator.rules, table, outcome, np.ones(table.size, dtype=bool))
+    if reasons:
+        result.reasons = outcome.reasons(evaluator.fallback)
+    result.decisions = outcome.decisions(evaluator.fallback).tolist()
+    irregular = np.flatnonzero(table.irregular)
+    if len(irregular):
+        logger.debug(f"{len(irregular)} of {table.size} claims re-evaluated one by one")
+        _evaluate_rows(evaluator, table, irregular.tolist(), result)
+    return result
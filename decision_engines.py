@@ -0,0 +1,39 @@
+"""
+Decision engine for each specialist assistant, keyed by assistant name.
+
+Importing this module only loads the rule-based evaluators, so offline tools
+(decision_batch, replay_decisions) can use it without starting the orchestrator.
+"""
+from accidental_and_glass import evaluate_accidental_damage_glass_claim
+from ancilliary import evaluate_ancillary_property_claim
+from fire import evaluate_fire_incident_claim
+from general_exceptions import evaluate_general_exceptions_claim
+from general_administrative import evaluate_admin_and_underwriting_claim
+from personal_belongings import evaluate_personal_belongings_claim
+from personal_convenience import evaluate_mobility_and_continuation_services_claim
+from personal_injury import evaluate_injury_and_medical_assault_claim
+from theft import evaluate_theft_incident_claim
+from third_party_injury import evaluate_bodily_injury_fatality_claim
+from third_party_legal import evaluate_legal_costs_and_statutory_payments_claim
+from third_party_liability import evaluate_special_liability_situations_claim
+from third_party_property import evaluate_third_party_property_damage_claim
+from Vehicle_security import evaluate_security_and_condition_compliance_claim
+from Vehicle_usage import evaluate_territorial_and_usage_claim
+
+DECISION_ENGINE = {
+    "third_party_injury_assistant": evaluate_bodily_injury_fatality_claim,
+    "accidental_and_glass_assistant": evaluate_accidental_damage_glass_claim,
+    "ancillary_assistant": evaluate_ancillary_property_claim,
+    "fire_assistant": evaluate_fire_incident_claim,
+    "theft_assistant": evaluate_theft_incident_claim,
+    "third_party_property_assistant": evaluate_third_party_property_damage_claim,
+    "special_liability_assistant": evaluate_special_liability_situations_claim,
+    "legal_and_statutory_assistant": evaluate_legal_costs_and_statutory_payments_claim,
+    "personal_injury_assistant": evaluate_injury_and_medical_assault_claim,
+    "personal_convenience_assistant": evaluate_mobility_and_continuation_services_claim,
+    "personal_property_assistant": evaluate_personal_belongings_claim,
+    "territorial_and_usage_assistant": evaluate_territorial_and_usage_claim,
+    "general_exceptions_assistant": evaluate_general_exceptions_claim,
+    "vehicle_security_assistant": evaluate_security_and_condition_compliance_claim,
+    "administrative_assistant": evaluate_admin_and_underwriting_claim,  # FIXED: Corrected typo
+}
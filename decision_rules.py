@@ -0,0 +1,535 @@
+import string
+import datetime
+import operator
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+# Outcome bits; a claim's decision is the most severe outcome flagged (rejected > pending > approved)
+APPROVED, PENDING, REJECTED = 1, 2, 4
+OUTCOME_BITS = {"approved": APPROVED, "pending": PENDING, "rejected": REJECTED}
+
+
+class _Required:
+    def __repr__(self):
+        return "REQUIRED"
+
+
+REQUIRED = _Required()  # read the field as claim[field]: a missing field raises KeyError
+
+
+class _Namespace:
+    """Globals for a generated evaluator; bind() names an object so the source can refer to it."""
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+        self._names: Dict[int, str] = {}
+
+    def bind(self, value: Any) -> str:
+        if value is None or value is True or value is False:
+            return repr(value)
+        name = self._names.get(id(value))
+        if name is None:
+            name = self._names[id(value)] = f"_c{len(self._names)}"
+            self.values[name] = value
+        return name
+
+
+# -- predicates ------------------------------------------------------------------------
+
+class Predicate(ABC):
+    """A test on one claim payload. Combine with `&`, `|` and `~` (evaluated with short-circuiting)."""
+
+    @abstractmethod
+    def source(self, namespace: _Namespace) -> str:
+        """A Python expression over `claim` whose truth value is the predicate's."""
+
+    def fields(self) -> Tuple[str, ...]:
+        return ()
+
+    def __and__(self, other: "Predicate") -> "Predicate":
+        return AllOf((self, other))
+
+    def __or__(self, other: "Predicate") -> "Predicate":
+        return AnyOf((self, other))
+
+    def __invert__(self) -> "Predicate":
+        return Not(self)
+
+
+@dataclass(frozen=True, eq=False)
+class Truthy(Predicate):
+    """`claim.get(field, default)` is truthy"""
+    field: str
+    default: Any = None
+
+    def source(self, namespace):
+        if self.default is None:
+            return f"claim.get({self.field!r})"
+        return f"claim.get({self.field!r}, {namespace.bind(self.default)})"
+
+    def fields(self):
+        return (self.field,)
+
+
+@dataclass(frozen=True, eq=False)
+class Present(Predicate):
+    """`field in claim`"""
+    field: str
+
+    def source(self, namespace):
+        return f"({self.field!r} in claim)"
+
+    def fields(self):
+        return (self.field,)
+
+
+@dataclass(frozen=True, eq=False)
+class Is(Predicate):
+    """`claim.get(field) is value` (True, False or None)"""
+    field: str
+    value: Any
+
+    def source(self, namespace):
+        return f"(claim.get({self.field!r}) is {namespace.bind(self.value)})"
+
+    def fields(self):
+        return (self.field,)
+
+
+@dataclass(frozen=True, eq=False)
+class FieldTest(Predicate):
+    """
+    `check(value)` on one field, read as `claim[field]` or, given a default,
+    `claim.get(field, default)`. Errors raised by the check propagate.
+    """
+    field: str
+    check: Callable[[Any], Any]
+    default: Any = REQUIRED
+
+    def test(self, value) -> bool:
+        return bool(self.check(value))
+
+    def value_source(self, namespace) -> str:
+        if self.default is REQUIRED:
+            return f"claim[{self.field!r}]"
+        return f"claim.get({self.field!r}, {namespace.bind(self.default)})"
+
+    def source(self, namespace):
+        return f"{namespace.bind(self.check)}({self.value_source(namespace)})"
+
+    def fields(self):
+        return (self.field,)
+
+
+_OPERATORS = {operator.lt: "<", operator.le: "<=", operator.gt: ">", operator.ge: ">=",
+              operator.eq: "==", operator.ne: "!="}
+
+
+@dataclass(frozen=True, eq=False)
+class Compare(FieldTest):
+    """`check(value, bound)` with an operator function, e.g. operator.ge for `value >= bound`"""
+    check: Callable[[Any, Any], Any] = None
+    bound: Any = None
+
+    def test(self, value) -> bool:
+        return bool(self.check(value, self.bound))
+
+    def source(self, namespace):
+        value, bound = self.value_source(namespace), namespace.bind(self.bound)
+        symbol = _OPERATORS.get(self.check)
+        if symbol is None:
+            return f"{namespace.bind(self.check)}({value}, {bound})"
+        return f"({value} {symbol} {bound})"
+
+
+@dataclass(frozen=True, eq=False)
+class OneOf(FieldTest):
+    """`claim.get(field) in values`"""
+    check: Callable = None
+    values: Tuple = ()
+    default: Any = None
+
+    def test(self, value) -> bool:
+        return value in self.values
+
+    def source(self, namespace):
+        return f"({self.value_source(namespace)} in {namespace.bind(self.values)})"
+
+
+@dataclass(frozen=True, eq=False)
+class AllOf(Predicate):
+    predicates: Tuple[Predicate, ...]
+
+    def source(self, namespace):
+        return "(" + " and ".join(predicate.source(namespace) for predicate in self.predicates) + ")"
+
+    def fields(self):
+        return tuple(field for predicate in self.predicates for field in predicate.fields())
+
+
+@dataclass(frozen=True, eq=False)
+class AnyOf(Predicate):
+    predicates: Tuple[Predicate, ...]
+
+    def source(self, namespace):
+        return "(" + " or ".join(predicate.source(namespace) for predicate in self.predicates) + ")"
+
+    def fields(self):
+        return tuple(field for predicate in self.predicates for field in predicate.fields())
+
+
+@dataclass(frozen=True, eq=False)
+class Not(Predicate):
+    predicate: Predicate
+
+    def source(self, namespace):
+        return f"(not {self.predicate.source(namespace)})"
+
+    def fields(self):
+        return self.predicate.fields()
+
+
+def truthy(field: str, default: Any = None) -> Predicate:
+    return Truthy(field, default)
+
+
+def present(field: str) -> Predicate:
+    return Present(field)
+
+
+def is_true(field: str) -> Predicate:
+    return Is(field, True)
+
+
+def is_false(field: str) -> Predicate:
+    return Is(field, False)
+
+
+def is_none(field: str) -> Predicate:
+    return Is(field, None)
+
+
+def one_of(field: str, values: Sequence) -> Predicate:
+    return OneOf(field, values=tuple(values))
+
+
+def test(field: str, check: Callable[[Any], Any], default: Any = REQUIRED) -> Predicate:
+    return FieldTest(field, check, default)
+
+
+def at_least(field: str, bound, default: Any = REQUIRED) -> Predicate:
+    return Compare(field, default=default, check=operator.ge, bound=bound)
+
+
+def at_most(field: str, bound, default: Any = REQUIRED) -> Predicate:
+    return Compare(field, default=default, check=operator.le, bound=bound)
+
+
+def greater_than(field: str, bound, default: Any = REQUIRED) -> Predicate:
+    return Compare(field, default=default, check=operator.gt, bound=bound)
+
+
+def _is_date(value) -> bool:
+    try:
+        datetime.datetime.strptime(value, "%Y-%m-%d")
+        return True
+    except Exception:
+        return False
+
+
+def _is_time(value) -> bool:
+    return isinstance(value, str) and ":" in value
+
+
+def _is_hh_mm(value) -> bool:
+    return isinstance(value, str) and value.count(":") == 1
+
+
+def _is_nonblank(value) -> bool:
+    return bool(value.strip())
+
+
+def valid_date(field: str) -> Predicate:
+    """YYYY-MM-DD; missing or malformed values fail"""
+    return FieldTest(field, _is_date, default=None)
+
+
+def valid_time(field: str, single_colon: bool = False) -> Predicate:
+    """A string containing ":" (exactly one with `single_colon`); only meaningful where the field is present"""
+    return FieldTest(field, _is_hh_mm if single_colon else _is_time)
+
+
+def nonblank(field: str, default: Any = REQUIRED) -> Predicate:
+    """`value.strip()` is non-empty; non-string values raise like str.strip would"""
+    return FieldTest(field, _is_nonblank, default)
+
+
+def all_of(*predicates: Predicate) -> Predicate:
+    return AllOf(predicates)
+
+
+def any_of(*predicates: Predicate) -> Predicate:
+    return AnyOf(predicates)
+
+
+# -- flags -----------------------------------------------------------------------------
+
+_CONVERSIONS = {
+    None: lambda value: value,
+    "s": str,
+    "r": repr,
+    "a": ascii,
+    "h": lambda value: value.replace("_", " "),
+    "t": lambda value: value.strip(),
+    "l": lambda value: value.lower(),
+}
+
+
+class Flag:
+    """
+    One outcome and its reason template, e.g. Flag("approved", "Fire damage extent: {fire_damage_extent}.").
+    Templates are str.format strings whose fields name claim fields, with three extra
+    conversions: !h (underscores to spaces), !t (strip) and !l (lower). `defaults`
+    stands in for fields the claim may lack.
+    """
+
+    __slots__ = ("outcome", "template", "defaults", "bit", "prefix", "fields", "text", "_format", "_lookups")
+
+    def __init__(self, outcome: str, template: str, defaults: Optional[Mapping[str, Any]] = None):
+        if outcome not in OUTCOME_BITS:
+            raise ValueError(f"Unknown outcome: {outcome}")
+        self.outcome = outcome
+        self.template = template
+        self.defaults = dict(defaults or {})
+        self.bit = OUTCOME_BITS[outcome]
+        self.prefix = f"{outcome.upper()}: "
+
+        # rewritten as a positional str.format string; _lookups supplies its arguments
+        pieces, self._lookups = [self.prefix], []
+        for literal, name, spec, conversion in string.Formatter().parse(template):
+            pieces.append(literal.replace("{", "{{").replace("}", "}}"))
+            if name is None:
+                continue
+            if conversion not in _CONVERSIONS:
+                raise ValueError(f"Unknown conversion !{conversion} in {template!r}")
+            pieces.append(f"{{{len(self._lookups)}:{spec}}}" if spec else f"{{{len(self._lookups)}}}")
+            self._lookups.append((name, _CONVERSIONS[conversion]))
+        self._format = "".join(pieces).format
+        self.fields = tuple(dict.fromkeys(name for name, _ in self._lookups))
+        self.text = self.prefix + template if not self._lookups else None
+
+    def render(self, claim: Mapping) -> str:
+        if self.text is not None:
+            return self.text
+        defaults = self.defaults
+        return self._format(*[convert(claim[name] if name in claim else defaults[name])
+                              for name, convert in self._lookups])
+
+    def __repr__(self):
+        return f"Flag({self.outcome!r}, {self.template!r})"
+
+
+def approved(template: str, **defaults) -> Flag:
+    return Flag("approved", template, defaults)
+
+
+def pending(template: str, **defaults) -> Flag:
+    return Flag("pending", template, defaults)
+
+
+def rejected(template: str, **defaults) -> Flag:
+    return Flag("rejected", template, defaults)
+
+
+class _ItemFlag:
+    """A flag raised for one item of a ForEach list; renders against the item."""
+
+    __slots__ = ("flag", "item")
+
+    def __init__(self, flag: Flag, item: Mapping):
+        self.flag = flag
+        self.item = item
+
+    @property
+    def outcome(self) -> str:
+        return self.flag.outcome
+
+    def render(self, claim: Mapping) -> str:
+        return self.flag.render(self.item)
+
+
+# -- rules -----------------------------------------------------------------------------
+
+Node = Union[Flag, "Rule", "ForEach", Sequence]
+
+
+@dataclass(frozen=True, eq=False)
+class Rule:
+    """`if when: then else: otherwise`, where each branch is a Flag, a Rule, a ForEach, a list of them or None."""
+    when: Predicate
+    then: Optional[Node] = None
+    otherwise: Optional[Node] = None
+
+
+@dataclass(frozen=True, eq=False)
+class ForEach:
+    """Apply `rules` to every item of the list `claim[field]`."""
+    field: str
+    rules: Sequence[Node]
+
+
+def walk(node: Optional[Node]) -> Iterator[Union[Flag, Rule, ForEach, Predicate]]:
+    """Every rule, flag and predicate under `node`, depth first in evaluation order."""
+    if node is None:
+        return
+    if isinstance(node, (Flag, ForEach, Rule)):
+        yield node
+        if isinstance(node, Rule):
+            yield from _walk_predicate(node.when)
+            yield from walk(node.then)
+            yield from walk(node.otherwise)
+        elif isinstance(node, ForEach):
+            yield from walk(list(node.rules))
+        return
+    for child in node:
+        yield from walk(child)
+
+
+def _walk_predicate(predicate: Predicate) -> Iterator[Predicate]:
+    yield predicate
+    if isinstance(predicate, (AllOf, AnyOf)):
+        for child in predicate.predicates:
+            yield from _walk_predicate(child)
+    elif isinstance(predicate, Not):
+        yield from _walk_predicate(predicate.predicate)
+
+
+class _Compiler:
+    """
+    Turns a rule table into the source of one function,
+    `name(claim, hits, short_circuit) -> outcome bits`, that appends raised flags to `hits`.
+    """
+
+    def __init__(self, namespace: _Namespace):
+        self.namespace = namespace
+        self.functions: List[str] = []
+
+    def function(self, name: str, rules: Sequence[Node]) -> str:
+        lines = [f"def {name}(claim, hits, short_circuit):", "    seen = 0"]
+        for rule in rules:
+            self.node(rule, lines, 1)
+            if any(isinstance(node, Flag) and node.bit == REJECTED for node in walk(rule)):
+                lines.append(f"    if short_circuit and seen & {REJECTED}:")
+                lines.append("        return seen")
+        lines.append("    return seen")
+        self.functions.append("\n".join(lines))
+        return name
+
+    def node(self, node: Optional[Node], lines: List[str], depth: int):
+        indent = "    " * depth
+        if node is None:
+            lines.append(f"{indent}pass")
+        elif isinstance(node, Flag):
+            lines.append(f"{indent}hits.append({self.namespace.bind(node)})")
+            lines.append(f"{indent}seen |= {node.bit}")
+        elif isinstance(node, Rule):
+            lines.append(f"{indent}if {node.when.source(self.namespace)}:")
+            self.node(node.then, lines, depth + 1)
+            if node.otherwise is not None:
+                lines.append(f"{indent}else:")
+                self.node(node.otherwise, lines, depth + 1)
+        elif isinstance(node, ForEach):
+            item_rules = self.function(f"_item_rules_{len(self.functions)}", list(node.rules))
+            item_flag = self.namespace.bind(_ItemFlag)
+            lines.append(f"{indent}for item in claim[{node.field!r}]:")
+            lines.append(f"{indent}    item_hits = []")
+            lines.append(f"{indent}    seen |= {item_rules}(item, item_hits, False)")
+            lines.append(f"{indent}    hits.extend([{item_flag}(flag, item) for flag in item_hits])")
+        else:
+            if not node:
+                lines.append(f"{indent}pass")
+            for child in node:
+                self.node(child, lines, depth)
+
+
+# -- engines ---------------------------------------------------------------------------
+
+class Decision:
+    """An engine's verdict on one claim. The reason string is rendered on first access."""
+
+    __slots__ = ("decision", "flags", "claim", "fallback", "_reason")
+
+    def __init__(self, decision: str, flags: List, claim: Mapping, fallback: Optional[str]):
+        self.decision = decision
+        self.flags = flags
+        self.claim = claim
+        self.fallback = fallback
+        self._reason: Optional[str] = None
+
+    @property
+    def reason(self) -> str:
+        if self._reason is None:
+            if self.flags:
+                self._reason = " | ".join([flag.render(self.claim) for flag in self.flags])
+            else:
+                self._reason = self.fallback or ""
+        return self._reason
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"decision": self.decision, "reason": self.reason}
+
+    def __repr__(self):
+        return f"Decision({self.decision!r}, {len(self.flags)} flags)"
+
+
+class DecisionEngine:
+    """
+    A rule table compiled into an evaluator. Calling the engine behaves like the
+    hand-written evaluators it replaces: claim dict in, {"decision", "reason"} out.
+    evaluate() defers building the reason and decide() returns the decision alone,
+    stopping at the first rejection.
+
+    With no flag raised a claim is pending with the `fallback` reason, or approved
+    with an empty reason when there is no fallback.
+    """
+
+    def __init__(self, name: str, rules: Sequence[Node], fallback: Optional[str] = None):
+        self.__name__ = name
+        self.rules = list(rules)
+        self.fallback = fallback
+
+        namespace = _Namespace()
+        compiler = _Compiler(namespace)
+        compiler.function("evaluate", self.rules)
+        self.source = "\n\n".join(compiler.functions)
+        exec(compile(self.source, f"<rules {name}>", "exec"), namespace.values)
+        self._evaluate = namespace.values["evaluate"]
+
+        # decision for every combination of outcome bits seen
+        self._decisions = [
+            "rejected" if seen & REJECTED else "pending" if seen & PENDING
+            else "approved" if seen & APPROVED or fallback is None else "pending"
+            for seen in range(8)
+        ]
+
+    def decide(self, claim: Dict, short_circuit: bool = True) -> str:
+        """The decision alone; with `short_circuit`, rules after the first rejection are skipped."""
+        return self._decisions[self._evaluate(claim, [], short_circuit)]
+
+    def evaluate(self, claim: Dict) -> Decision:
+        hits: List = []
+        seen = self._evaluate(claim, hits, False)
+        return Decision(self._decisions[seen], hits, claim, None if seen else self.fallback)
+
+    def __call__(self, claim: Dict) -> Dict[str, str]:
+        return self.evaluate(claim).to_dict()
+
+    def flags(self) -> List[Flag]:
+        return [node for node in walk(self.rules) if isinstance(node, Flag)]
+
+    def predicates(self) -> List[Predicate]:
+        return [node for node in walk(self.rules) if isinstance(node, Predicate)]
+
+    def __repr__(self):
+        return f"DecisionEngine({self.__name__!r}, {len(self.rules)} rules)"
@@ -0,0 +1,166 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", 4))
+DISPATCH_QUEUE_SIZE = int(os.getenv("DISPATCH_QUEUE_SIZE", 100))
+LATENCY_WINDOW = 1000  # recent samples kept for percentile metrics
+
+
+def _percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+class ClaimDispatcher:
+    """
+    Bounded work queue feeding a pool of worker threads.
+
+    Jobs are submitted with a key (the sender's thread id). Jobs sharing a key run
+    one at a time in submission order; jobs with different keys run in parallel.
+    When the queue holds `max_queue` jobs, `submit` blocks, pushing backpressure
+    back onto the IMAP listener.
+    """
+
+    def __init__(self, handler: Callable[[Any], None], workers: int = DISPATCH_WORKERS,
+                 max_queue: int = DISPATCH_QUEUE_SIZE):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+
+        self._cond = threading.Condition()
+        self._pending: Dict[Hashable, Deque] = {}   # key -> queued (item, enqueued_at)
+        self._ready: Deque[Hashable] = deque()      # keys with pending jobs and no job in flight
+        self._active = set()                        # keys with a job in flight
+        self._size = 0
+        self._stopping = False
+        self._threads = []
+
+        # Metrics
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._max_depth = 0
+        self._blocked_submits = 0
+        self._blocked_seconds = 0.0
+        self._wait_times: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._service_times: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def start(self):
+        """Start the worker threads."""
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"claim-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        logger.info(f"Dispatcher started with {self.workers} workers, queue size {self.max_queue}")
+        return self
+
+    def submit(self, key: Hashable, item: Any, timeout: Optional[float] = None) -> bool:
+        """
+        Queue a job for `key`. Blocks while the queue is full.
+
+        Returns False if `timeout` elapsed before space became available.
+        """
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("Dispatcher is stopped")
+            if self._size >= self.max_queue:
+                self._blocked_submits += 1
+                started = time.monotonic()
+                has_space = self._cond.wait_for(
+                    lambda: self._size < self.max_queue or self._stopping, timeout=timeout
+                )
+                self._blocked_seconds += time.monotonic() - started
+                if not has_space or self._stopping:
+                    return False
+
+            queue = self._pending.setdefault(key, deque())
+            queue.append((item, time.monotonic()))
+            if key not in self._active and len(queue) == 1:
+                self._ready.append(key)
+            self._size += 1
+            self._submitted += 1
+            self._max_depth = max(self._max_depth, self._size)
+            self._cond.notify_all()
+            return True
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._ready or self._stopping)
+                if not self._ready:
+                    return
+                key = self._ready.popleft()
+                item, enqueued_at = self._pending[key].popleft()
+                self._active.add(key)
+                self._size -= 1
+                self._wait_times.append(time.monotonic() - enqueued_at)
+                self._cond.notify_all()
+
+            started = time.monotonic()
+            ok = True
+            try:
+                self.handler(item)
+            except Exception as e:
+                ok = False
+                logger.error(f"Dispatcher job for {key} failed: {e}")
+
+            with self._cond:
+                self._service_times.append(time.monotonic() - started)
+                if ok:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                self._active.discard(key)
+                if self._pending[key]:
+                    self._ready.append(key)
+                else:
+                    del self._pending[key]
+                self._cond.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued and in-flight job has finished."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._size and not self._active, timeout=timeout)
+
+    def stop(self, wait: bool = True):
+        """Stop the workers, optionally draining the queue first."""
+        if wait:
+            self.join()
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of queue and worker metrics for sizing the pool."""
+        with self._cond:
+            waits = list(self._wait_times)
+            services = list(self._service_times)
+            return {
+                "workers": self.workers,
+                "busy_workers": len(self._active),
+                "queue_depth": self._size,
+                "max_queue_depth": self._max_depth,
+                "queue_capacity": self.max_queue,
+                "senders_ready": len(self._ready),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "blocked_submits": self._blocked_submits,
+                "blocked_seconds": round(self._blocked_seconds, 3),
+                "queue_wait_p50": round(_percentile(waits, 50), 3),
+                "queue_wait_p95": round(_percentile(waits, 95), 3),
+                "service_time_p50": round(_percentile(services, 50), 3),
+                "service_time_p95": round(_percentile(services, 95), 3),
+            }
@@ -6,9 +6,14 @@ import pytesseract
 import time
 import argparse
 from typing import Dict, List, Tuple, Any
-from PIL import Image
-from pdf2image import convert_from_path
-import hashlib
+from PIL import Image, ImageOps, ImageSequence
+from functools import lru_cache
+
+from utils import load_json, save_json, json_exists, session_path
+from ocr_executor import get_ocr_executor, OCRExecutor
+from content_cache import ContentCache, file_digest
+from page_renderer import pdf_page_count, render_pages, store_vision_pages
+import tracing
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -41,6 +46,21 @@ VALIDATION_PATTERNS = {
 SUPPORTED_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tif', '.tiff'}
 PDF_EXT = '.pdf'
 
+OCR_DPI = int(os.getenv("OCR_DPI", 300))
+OCR_PAGE_WINDOW = int(os.getenv("OCR_PAGE_WINDOW", 1))  # pages rasterized at a time
+OCR_PAGE_ATTEMPTS = 4
+OCR_TOOL_TIMEOUT = int(os.getenv("OCR_TOOL_TIMEOUT", 120))  # seconds per poppler/tesseract call
+IMAGE_OCR_PASSES = {"output_a": 3, "output_b": 12}  # result key -> tesseract page segmentation mode
+# An image counts as a document photo (sent as OCR text, not pixels) above these thresholds
+OCR_TEXT_MIN_WORDS = int(os.getenv("OCR_TEXT_MIN_WORDS", 15))
+OCR_TEXT_MIN_CONFIDENCE = float(os.getenv("OCR_TEXT_MIN_CONFIDENCE", 60))
+OCR_WORD_MIN_CONFIDENCE = 40  # words tesseract is less sure of are treated as noise
+OCR_MIN_IMAGE_WIDTH = int(os.getenv("OCR_MIN_IMAGE_WIDTH", 1200))  # narrower images are upscaled (max 3x)
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# OCR results shared across sessions, keyed by file content and OCR parameters
+ocr_cache = ContentCache("ocr", OCR_CACHE_MAX_BYTES)
+
 class ProcessingResult:
     def __init__(self):
         self.extracted_fields: Dict[str, str] = {}
@@ -58,47 +78,188 @@ class ProcessingResult:
         }
 
 
-def process_image(image_path: str) -> dict:
-    img = Image.open(image_path)
-    import tempfile
-    temp_pdf = None
+def prepare_image_for_ocr(frame: Image.Image) -> Image.Image:
+    """Upright, tesseract-friendly copy of one image frame: EXIF orientation, flattened alpha, L/RGB mode."""
+    img = ImageOps.exif_transpose(frame)
+    if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        img = Image.new("RGB", rgba.size, "white")
+        img.paste(rgba, mask=rgba.getchannel("A"))
+    elif img.mode not in ("1", "L", "RGB"):
+        img = img.convert("RGB")
+    if img.width < OCR_MIN_IMAGE_WIDTH:
+        scale = min(3.0, OCR_MIN_IMAGE_WIDTH / img.width)
+        img = img.resize((round(img.width * scale), round(img.height * scale)), Image.LANCZOS)
+    return img
+
+def load_image_frames(image_path: str) -> List[Image.Image]:
+    """Decode every frame of an image (multi-page TIFFs included), ready for OCR."""
+    with Image.open(image_path) as img:
+        # exif_transpose returns a detached copy, so frames outlive the open file
+        return [prepare_image_for_ocr(frame) for frame in ImageSequence.Iterator(img)]
+
+def ocr_image_pass(image_path: str, psm: int) -> str:
+    """One tesseract pass over every frame of an image; runs in an OCR worker."""
+    frames = load_image_frames(image_path)
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            temp_pdf = tmp.name
-            img.save(temp_pdf, format='PDF')
-        pdf_images = convert_from_path(temp_pdf)
-        if not pdf_images:
-            raise RuntimeError("Failed to convert PDF back to image for OCR.")
-        img = pdf_images[0]
-        output_a = pytesseract.image_to_string(img, config='--oem 3 --psm 3')
-        output_b = pytesseract.image_to_string(img, config='--oem 3 --psm 12')
-        return {"output_a": output_a, "output_b": output_b}
+        return "\n".join(
+            pytesseract.image_to_string(frame, config=f'--oem 3 --psm {psm}', timeout=OCR_TOOL_TIMEOUT)
+            for frame in frames
+        )
     finally:
-        if temp_pdf and os.path.exists(temp_pdf):
-            os.remove(temp_pdf)
+        for frame in frames:
+            frame.close()
 
-def extract_text_from_file(file_path: str):
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext in SUPPORTED_IMAGE_EXTENSIONS:
-        return process_image(file_path)
-    elif ext == PDF_EXT:
-        for attempt in range(4):
+def ocr_image_with_density(image_path: str, psm: int) -> dict:
+    """
+    One tesseract pass that also measures how much confident text the image holds;
+    runs in an OCR worker. Text is rebuilt line by line from image_to_data.
+    """
+    frames = load_image_frames(image_path)
+    lines: Dict[tuple, List[str]] = {}
+    confidences = []
+    text_area = 0
+    image_area = 0
+    try:
+        for number, frame in enumerate(frames):
+            data = pytesseract.image_to_data(frame, config=f'--oem 3 --psm {psm}',
+                                             output_type=pytesseract.Output.DICT, timeout=OCR_TOOL_TIMEOUT)
+            image_area += frame.width * frame.height
+            for i, word in enumerate(data["text"]):
+                word = word.strip()
+                if not word:
+                    continue
+                line = (number, data["block_num"][i], data["par_num"][i], data["line_num"][i])
+                lines.setdefault(line, []).append(word)
+                confidence = float(data["conf"][i])
+                if confidence >= OCR_WORD_MIN_CONFIDENCE and len(word) > 1:
+                    confidences.append(confidence)
+                    text_area += data["width"][i] * data["height"][i]
+    finally:
+        for frame in frames:
+            frame.close()
+    return {
+        "text": "\n".join(" ".join(words) for _, words in sorted(lines.items())),
+        "words": len(confidences),
+        "confidence": round(sum(confidences) / len(confidences), 1) if confidences else 0.0,
+        "coverage": round(text_area / image_area, 4) if image_area else 0.0,
+    }
+
+def is_text_heavy(density: dict) -> bool:
+    return density["words"] >= OCR_TEXT_MIN_WORDS and density["confidence"] >= OCR_TEXT_MIN_CONFIDENCE
+
+def image_ocr_result(density: dict, second_pass: str = None) -> dict:
+    """
+    parsed_docs entry for an image. Document photos carry output_a/output_b so they
+    are described from text; scene photos keep their (noisy) OCR text aside and are
+    sent to the vision model.
+    """
+    heavy = is_text_heavy(density)
+    result = {
+        "text_heavy": heavy,
+        "text_density": {k: density[k] for k in ("words", "confidence", "coverage")},
+        "success": True,
+    }
+    if heavy:
+        result["output_a"] = density["text"]
+        result["output_b"] = second_pass or ""
+    else:
+        result["ocr_text"] = density["text"]
+    return result
+
+def process_image(image_path: str, executor: OCRExecutor = None) -> dict:
+    executor = executor or get_ocr_executor()
+    density = executor.run(ocr_image_with_density, image_path, IMAGE_OCR_PASSES["output_a"])
+    second_pass = None
+    if is_text_heavy(density):
+        second_pass = executor.run(ocr_image_pass, image_path, IMAGE_OCR_PASSES["output_b"])
+    return image_ocr_result(density, second_pass)
+
+def _with_retries(fn, label: str):
+    for attempt in range(OCR_PAGE_ATTEMPTS):
+        try:
+            return fn()
+        except Exception as e:
+            logger.error(f"{label} failed on attempt {attempt}: {e}")
+            if attempt < OCR_PAGE_ATTEMPTS - 1:
+                time.sleep(1)
+                continue
+            raise
+
+def ocr_pdf_pages(file_path: str, first: int, last: int, dpi: int = OCR_DPI, digest: str = None) -> List[str]:
+    """
+    Rasterize and OCR pages first..last (1-based, inclusive), retrying only this window.
+    With the document's `digest`, the same render also fills the vision page cache.
+    """
+    pages = _with_retries(
+        lambda: render_pages(file_path, first, last, dpi),
+        f"Rendering pages {first}-{last} of {file_path}"
+    )
+    try:
+        if digest:
             try:
-                logger.info(f"OCR attempt{attempt} for {file_path}")
-                text_pages = []
-                pages = convert_from_path(file_path, dpi=300)
-                for page in pages:
-                    text_pages.append(pytesseract.image_to_string(page))
-                return "\n".join(text_pages)
+                store_vision_pages(digest, first, pages, dpi)
             except Exception as e:
-                logger.error(f"OCR failed on attempt {attempt}: {e}")
-                if attempt < 3:
-                    time.sleep(1)
-                    continue
-                else:
-                    raise
+                logger.warning(f"Could not cache vision pages {first}-{last} of {file_path}: {e}")
+        return [
+            _with_retries(lambda: pytesseract.image_to_string(page, timeout=OCR_TOOL_TIMEOUT),
+                          f"OCR of page {number} of {file_path}")
+            for number, page in enumerate(pages, first)
+        ]
+    finally:
+        for page in pages:
+            page.close()
+
+def submit_pdf_ocr(executor: OCRExecutor, file_path: str, dpi: int = OCR_DPI, window: int = OCR_PAGE_WINDOW,
+                   digest: str = None):
+    """
+    Queue a PDF on the OCR pool as page windows; workers rasterize their own pages,
+    so peak memory per worker is bounded by `window` pages, not the document.
+    """
+    total = _with_retries(lambda: pdf_page_count(file_path), f"Reading page count of {file_path}")
+    logger.info(f"OCR of {file_path}: {total} pages at {dpi} dpi, {window} at a time")
+    return [
+        executor.submit(ocr_pdf_pages, file_path, first, min(first + window - 1, total), dpi, digest)
+        for first in range(1, total + 1, window)
+    ]
+
+def collect_pdf_ocr(executor: OCRExecutor, file_path: str, futures) -> str:
+    windows = executor.gather(futures, f"OCR of {file_path}")
+    return "\n".join(text for window in windows for text in window)
+
+def extract_pdf_text(file_path: str, dpi: int = OCR_DPI, window: int = OCR_PAGE_WINDOW,
+                     executor: OCRExecutor = None, digest: str = None) -> str:
+    executor = executor or get_ocr_executor()
+    return collect_pdf_ocr(executor, file_path, submit_pdf_ocr(executor, file_path, dpi, window, digest))
+
+@lru_cache(maxsize=1)
+def tesseract_version() -> str:
+    return str(pytesseract.get_tesseract_version())
+
+def ocr_cache_key(file_path: str, digest: str = None) -> str:
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == PDF_EXT:
+        params = {"kind": "pdf", "dpi": OCR_DPI}
     else:
+        params = {"kind": "image", "psm": IMAGE_OCR_PASSES, "min_width": OCR_MIN_IMAGE_WIDTH,
+                  "text_thresholds": [OCR_TEXT_MIN_WORDS, OCR_TEXT_MIN_CONFIDENCE, OCR_WORD_MIN_CONFIDENCE]}
+    return ocr_cache.key(digest or file_digest(file_path), tesseract=tesseract_version(), **params)
+
+def extract_text_from_file(file_path: str):
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext not in SUPPORTED_IMAGE_EXTENSIONS and ext != PDF_EXT:
         raise ValueError(f'Unsupported extension: {ext}')
+    digest = file_digest(file_path)
+    key = ocr_cache_key(file_path, digest)
+    cached = ocr_cache.get(key)
+    if cached is not None:
+        return cached
+    if ext in SUPPORTED_IMAGE_EXTENSIONS:
+        result = process_image(file_path)
+    else:
+        result = extract_pdf_text(file_path, digest=digest)
+    ocr_cache.put(key, result)
+    return result
 
 def extract_multi_line_value(lines: List[str], start_idx:int, field_name: str) -> str:
     pattern = re.escape(field_name) + r"\s*[:\-]?\s*(.+)"
@@ -124,6 +285,11 @@ def parse_fnol_text(text: str) -> ProcessingResult:
     res.success = bool(text.strip())
     return res
 
+def parse_pdf_text(text: str) -> dict:
+    if not text.strip():
+        return {'error': 'No text', 'success': False}
+    return parse_fnol_text(text).to_dict()
+
 def retry_read_json(path:str) -> Any:
     for attempt in range(1,4):
         try:
@@ -134,40 +300,74 @@ def retry_read_json(path:str) -> Any:
             time.sleep(1)
     raise
 
-def generate_thread_id(sender_email):
-    return hashlib.md5(sender_email.lower().encode('utf-8')).hexdigest()[:12]
-
+@tracing.traced("ocr")
 def process_and_update_claim_session(sender: str) -> dict:
-    thread_id = generate_thread_id(sender)
-    base = 'sessions'
-    tf = os.path.join(base, f"thread_{thread_id}", 'attachments')
+    folder = session_path(sender)
+    tf = os.path.join(folder, 'attachments')
     if not os.path.isdir(tf):
         raise FileNotFoundError(tf)
-    parsed_file = os.path.join(base, f"thread_{thread_id}", 'parsed_docs.json')
-    parsed = {} if not os.path.exists(parsed_file) else json.load(open(parsed_file))
+    parsed_file = os.path.join(folder, 'parsed_docs.json')
+    parsed = load_json(parsed_file) if json_exists(parsed_file) else {}
 
+    # Queue every new attachment first so pages and images of all attachments share the OCR pool
+    executor = get_ocr_executor()
+    pdfs = {}
+    images = {}
     for fname in os.listdir(tf):
         if fname in parsed:
             continue
         try:
             file_path = os.path.join(tf, fname)
             ext = os.path.splitext(fname)[1].lower()
-            if ext in SUPPORTED_IMAGE_EXTENSIONS:
+            if ext not in SUPPORTED_IMAGE_EXTENSIONS and ext != PDF_EXT:
+                parsed[fname] = {'error': 'Unsupported file type', 'success': False}
                 continue
-            elif ext == PDF_EXT:
-                text = extract_text_from_file(file_path)
-                if not text.strip():
-                    parsed[fname] = {'error': 'No text', 'success': False}
-                    continue
-                res = parse_fnol_text(text)
-                parsed[fname] = res.to_dict()
+            digest = file_digest(file_path)
+            key = ocr_cache_key(file_path, digest)
+            cached = ocr_cache.get(key)
+            if ext == PDF_EXT:
+                if cached is not None:
+                    parsed[fname] = parse_pdf_text(cached)
+                else:
+                    pdfs[fname] = (key, submit_pdf_ocr(executor, file_path, digest=digest))
+            elif cached is not None:
+                parsed[fname] = cached
             else:
-                parsed[fname] = {'error': 'Unsupported file type', 'success': False}
+                images[fname] = (key, executor.submit(ocr_image_with_density, file_path, IMAGE_OCR_PASSES["output_a"]))
+        except Exception as e:
+            parsed[fname] = {'error': str(e), 'success': False}
+
+    # Only document photos get the second (sparse text) pass
+    second_passes = {}
+    for fname, (key, future) in images.items():
+        try:
+            density = executor.gather([future], f"OCR of {fname}")[0]
+            if is_text_heavy(density):
+                future = executor.submit(ocr_image_pass, os.path.join(tf, fname), IMAGE_OCR_PASSES["output_b"])
+                second_passes[fname] = (key, density, future)
+            else:
+                parsed[fname] = image_ocr_result(density)
+                ocr_cache.put(key, parsed[fname])
+        except Exception as e:
+            parsed[fname] = {'error': str(e), 'success': False}
+
+    for fname, (key, futures) in pdfs.items():
+        try:
+            text = collect_pdf_ocr(executor, os.path.join(tf, fname), futures)
+            ocr_cache.put(key, text)
+            parsed[fname] = parse_pdf_text(text)
+        except Exception as e:
+            parsed[fname] = {'error': str(e), 'success': False}
+
+    for fname, (key, density, future) in second_passes.items():
+        try:
+            parsed[fname] = image_ocr_result(density, executor.gather([future], f"OCR of {fname}")[0])
+            ocr_cache.put(key, parsed[fname])
         except Exception as e:
             parsed[fname] = {'error': str(e), 'success': False}
+    logger.info(f"OCR cache: {ocr_cache.metrics()}")
 
-    with open(parsed_file, 'w') as f:
-        json.dump(parsed, f, indent=2)
+    save_json(parsed_file, parsed)
     return parsed
 
 if __name__ == '__main__':
@@ -1,14 +1,15 @@
 import os
 import json
 import time
+import logging
 from typing import Dict
-from openai import OpenAI
-from dotenv import load_dotenv
 
-from utils import get_session_folder, load_json, save_json
+from utils import get_session_folder, save_json, remove_json
+from claim_store import get_claim_store
+from openai_client import get_client
+import tracing
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger(__name__)
 
 FOLLOW_UP_SCHEMA = {
   "type": "object",
@@ -82,24 +83,24 @@ Do not return anything outside of this JSON. No markdown, no prose explanations,
 - Output must be professional, readable, and ready to send as an HTML email body.
 """
 
+@tracing.traced("follow_up")
 def run_follow_up_agent(email: str) -> Dict:
     folder = get_session_folder(email)
-    follow_up_input_path = os.path.join(folder, "follow_up.json")
+    store = get_claim_store()
 
     # Load previously aggregated assistant data
-    if not os.path.exists(follow_up_input_path):
-        raise FileNotFoundError("follow_up.json not found.")
+    if not store.has_follow_ups(email):
+        raise FileNotFoundError("No follow-up responses recorded.")
 
-    follow_up_data = load_json(follow_up_input_path)
-    specialist_outputs = follow_up_data.get("responses", {})
+    specialist_outputs = store.list_follow_ups(email)
 
     if not specialist_outputs:
-        raise ValueError("No specialist_outputs found in follow_up.json.")
+        raise ValueError("No specialist_outputs found in follow-up responses.")
 
-    print(f"[follow_up] Loaded specialist_outputs from follow_up.json ({len(specialist_outputs)} agents).")
+    logger.debug(f"Loaded specialist_outputs from follow-up responses ({len(specialist_outputs)} agents).")
 
     # Call the OpenAI Responses API
-    response = client.responses.create(
+    response = get_client().responses.create(
         model="gpt-4.1",
         input=[
             {"role": "system", "content": FOLLOW_UP_INSTRUCTION},
@@ -116,26 +117,22 @@ def run_follow_up_agent(email: str) -> Dict:
     )
 
     result = json.loads(response.output_text)
-    print("[follow_up] Parsed response from assistant.")
+    logger.debug("Parsed response from assistant.")
 
     # Save email output
     follow_up_email_path = os.path.join(folder, "follow_up_email.json")
     save_json(follow_up_email_path, result)
-    print("[follow_up] Saved follow-up email HTML.")
+    logger.debug("Saved follow-up email HTML.")
 
-    # Send the email
-    from advanced_imap_listener import send_email
+    # Queue the email; the outbox delivers and retries it in the background
+    from mail_outbox import enqueue_email
     subject = "Further information required to process your claim"
-    send_email(to=email, subject=subject, html=result["email_html"])
-    print("[follow_up] Follow-up email sent.")
-
-    # Reset follow_up.json
-        # Reset follow_up.json
-    if os.path.exists(follow_up_input_path):
-        os.remove(follow_up_input_path)
-    if os.path.exists(follow_up_email_path):
-        os.remove(follow_up_email_path)
-    print("[follow_up] follow_up.json has been removed.")
-    print("[follow_up] follow_up.json has been reset.")
+    enqueue_email(to=email, subject=subject, html=result["email_html"])
+    logger.info("Follow-up email queued.")
+
+    # Reset the follow-up responses
+    store.clear_follow_ups(email)
+    remove_json(follow_up_email_path)
+    logger.debug("Follow-up responses have been reset.")
 
     return result
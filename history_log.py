@@ -0,0 +1,313 @@
+import os
+import glob
+import json
+import struct
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, List
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_MAX_BYTES = int(os.getenv("HISTORY_SEGMENT_MAX_BYTES", 1024 * 1024))
+COMPACT_SEGMENTS = int(os.getenv("HISTORY_COMPACT_SEGMENTS", 8))
+OPEN_LOGS_CACHE_SIZE = 1024
+
+_OFFSET = struct.Struct("<Q")  # index entries: end offset of each record in the segment
+
+
+class Segment:
+    """One JSONL data file plus its index of record end offsets."""
+
+    def __init__(self, data_path: str):
+        self.data_path = data_path
+        self.index_path = data_path[:-len(".jsonl")] + ".idx"
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.data_path)
+        except FileNotFoundError:
+            return 0
+
+    def count(self) -> int:
+        try:
+            return os.path.getsize(self.index_path) // _OFFSET.size
+        except FileNotFoundError:
+            return 0
+
+    def offsets(self, start: int = 0) -> List[int]:
+        """End offsets of records from `start` onwards."""
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, "rb") as f:
+            f.seek(start * _OFFSET.size)
+            raw = f.read()
+        return [o for (o,) in _OFFSET.iter_unpack(raw[:len(raw) - len(raw) % _OFFSET.size])]
+
+    def repair(self):
+        """Make the index agree with the data file after an interrupted append."""
+        offsets = self.offsets()
+        size = self.size()
+        if (offsets[-1] if offsets else 0) == size:
+            return
+        logger.warning(f"Rebuilding history index for {self.data_path}")
+        offsets = []
+        pos = 0
+        if size:
+            with open(self.data_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn final record
+                    pos += len(line)
+                    offsets.append(pos)
+        if pos != size:
+            with open(self.data_path, "r+b") as f:
+                f.truncate(pos)
+        with open(self.index_path + ".tmp", "wb") as f:
+            f.write(b"".join(_OFFSET.pack(o) for o in offsets))
+        os.replace(self.index_path + ".tmp", self.index_path)
+
+    def append(self, line: bytes):
+        with open(self.data_path, "ab") as f:
+            f.write(line)
+            end = f.tell()
+        with open(self.index_path, "ab") as f:
+            f.write(_OFFSET.pack(end))
+
+    def read(self, start: int = 0) -> List[Any]:
+        """Decode records from record number `start` onwards, reading only the bytes needed."""
+        if start <= 0:
+            begin = 0
+        else:
+            prev = self.offsets(start - 1)
+            if not prev:
+                return []
+            begin = prev[0]
+        if not os.path.exists(self.data_path):
+            return []
+        with open(self.data_path, "rb") as f:
+            f.seek(begin)
+            raw = f.read()
+        return [json.loads(line) for line in raw.splitlines() if line.strip()]
+
+    def rename(self, data_path: str):
+        os.replace(self.data_path, data_path)
+        moved = Segment(data_path)
+        if os.path.exists(self.index_path):
+            os.replace(self.index_path, moved.index_path)
+        return moved
+
+    def remove(self):
+        for path in (self.data_path, self.index_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class HistoryLog:
+    """
+    Append-only history stored as JSONL segments.
+
+    `<base>.jsonl` is the active segment. When it grows past SEGMENT_MAX_BYTES it is
+    sealed as `<base>.<n>.jsonl`; once more than COMPACT_SEGMENTS sealed segments
+    exist they are merged into one. Each segment has an `.idx` file of record end
+    offsets so `tail(n)` only reads the last n records. A legacy `<base>.json`
+    array (or {"responses": [...]} document) is imported on first use.
+    """
+
+    def __init__(self, base: str):
+        self.base = base
+        self.active = Segment(f"{base}.jsonl")
+        self.lock = threading.RLock()
+        self._checked = False
+
+    # -- segment bookkeeping -------------------------------------------------
+
+    def _sealed(self) -> List[Segment]:
+        paths = glob.glob(glob.escape(self.base) + ".[0-9][0-9][0-9][0-9][0-9][0-9].jsonl")
+        return [Segment(p) for p in sorted(paths)]
+
+    def _segment_path(self, number: int) -> str:
+        return f"{self.base}.{number:06d}.jsonl"
+
+    def _segment_number(self, segment: Segment) -> int:
+        return int(segment.data_path[len(self.base) + 1:-len(".jsonl")])
+
+    def _check(self):
+        """Recover from interrupted writes and import legacy JSON, once per process."""
+        if self._checked:
+            return
+        self._recover_compaction()
+        for segment in self._sealed() + [self.active]:
+            segment.repair()
+        self._import_legacy()
+        self._checked = True
+
+    def _import_legacy(self):
+        """
+        Copy a legacy JSON history into the active segment, then remove it. Nothing is
+        appended before the import finishes, so records already in the log are the
+        start of an interrupted import and it resumes after them.
+        """
+        legacy_path = f"{self.base}.json"
+        if not os.path.exists(legacy_path):
+            return
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+        entries = legacy.get("responses", []) if isinstance(legacy, dict) else legacy
+        written = sum(segment.count() for segment in self._sealed() + [self.active])
+        for entry in entries[written:]:
+            self.active.append(self._encode(entry))
+        os.remove(legacy_path)
+        imported = max(0, len(entries) - written)
+        if written:
+            logger.info(f"Imported {imported} legacy entries into {self.active.data_path} "
+                        f"({min(written, len(entries))} already imported)")
+        else:
+            logger.info(f"Imported {imported} legacy entries into {self.active.data_path}")
+
+    @staticmethod
+    def _encode(entry: Any) -> bytes:
+        return (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+    def _seal_if_full(self):
+        if self.active.size() < SEGMENT_MAX_BYTES:
+            return
+        sealed = self._sealed()
+        number = self._segment_number(sealed[-1]) + 1 if sealed else 1
+        self.active.rename(self._segment_path(number))
+        sealed = self._sealed()
+        if len(sealed) > COMPACT_SEGMENTS:
+            self._compact(sealed)
+
+    def _compact(self, sealed: List[Segment]):
+        """Merge sealed segments into the newest one; a marker file makes this crash-safe."""
+        marker = f"{self.base}.compact"
+        target = sealed[-1]
+        tmp = Segment(target.data_path + ".tmp.jsonl")
+        with open(marker, "w") as f:
+            f.write(str(self._segment_number(sealed[0])))
+            f.flush()
+            os.fsync(f.fileno())
+        offsets = []
+        pos = 0
+        with open(tmp.data_path, "wb") as out:
+            for segment in sealed:
+                with open(segment.data_path, "rb") as f:
+                    for line in f:
+                        out.write(line)
+                        pos += len(line)
+                        offsets.append(pos)
+            out.flush()
+            os.fsync(out.fileno())
+        with open(tmp.index_path, "wb") as f:
+            f.write(b"".join(_OFFSET.pack(o) for o in offsets))
+        # Index first: if we crash before the data swap, the leftover temp data marks the merge as unfinished
+        os.replace(tmp.index_path, target.index_path)
+        os.replace(tmp.data_path, target.data_path)
+        for segment in sealed[:-1]:
+            segment.remove()
+        os.remove(marker)
+        logger.info(f"Compacted {len(sealed)} segments of {self.base} ({pos} bytes)")
+
+    def _recover_compaction(self):
+        marker = f"{self.base}.compact"
+        if not os.path.exists(marker):
+            return
+        sealed = self._sealed()
+        tmp_paths = glob.glob(glob.escape(self.base) + ".*.tmp.*")
+        if tmp_paths:
+            # Crashed before the merged segment replaced the newest one: originals are intact
+            for path in tmp_paths:
+                os.remove(path)
+        else:
+            # Merged segment is in place: drop the segments it already contains
+            with open(marker) as f:
+                first = int(f.read().strip() or 0)
+            for segment in sealed[:-1]:
+                if self._segment_number(segment) >= first:
+                    segment.remove()
+        os.remove(marker)
+
+    # -- public API ----------------------------------------------------------
+
+    def append(self, entry: Any):
+        line = self._encode(entry)
+        with self.lock:
+            self._check()
+            self.active.append(line)
+            self._seal_if_full()
+
+    def tail(self, n: int) -> List[Any]:
+        """Last `n` entries, oldest first, without reading the rest of the history."""
+        if n <= 0:
+            return []
+        with self.lock:
+            self._check()
+            entries: List[Any] = []
+            for segment in [self.active] + self._sealed()[::-1]:
+                missing = n - len(entries)
+                count = segment.count()
+                entries = segment.read(max(0, count - missing)) + entries
+                if len(entries) >= n:
+                    break
+            return entries[-n:]
+
+    def read_all(self) -> List[Any]:
+        with self.lock:
+            self._check()
+            entries: List[Any] = []
+            for segment in self._sealed() + [self.active]:
+                entries.extend(segment.read())
+            return entries
+
+    def exists(self) -> bool:
+        with self.lock:
+            self._check()
+            return self.active.count() > 0 or bool(self._sealed())
+
+    def clear(self):
+        with self.lock:
+            self._check()
+            for segment in self._sealed() + [self.active]:
+                segment.remove()
+
+
+def read_history(base: str) -> List[Any]:
+    """Read a history without repairing or migrating anything on disk (for offline tools)."""
+    log = HistoryLog(base)
+    segments = log._sealed() + [log.active]
+    entries: List[Any] = []
+    for segment in segments:
+        if not os.path.exists(segment.data_path):
+            continue
+        with open(segment.data_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn final record
+                if line.strip():
+                    entries.append(json.loads(line))
+    legacy_path = f"{base}.json"
+    if os.path.exists(legacy_path):
+        # Not yet (or only partly) imported: segment records are a prefix of the legacy entries
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+        legacy = legacy.get("responses", []) if isinstance(legacy, dict) else legacy
+        entries = legacy + entries[len(legacy):]
+    return entries
+
+
+_open_logs: "OrderedDict[str, HistoryLog]" = OrderedDict()
+_open_logs_guard = threading.Lock()
+
+
+def open_history_log(base: str) -> HistoryLog:
+    """Shared HistoryLog instance for `base`, so appends from concurrent agents are serialised."""
+    key = os.path.normpath(base)
+    with _open_logs_guard:
+        log = _open_logs.get(key)
+        if log is None:
+            log = _open_logs[key] = HistoryLog(key)
+        _open_logs.move_to_end(key)
+        while len(_open_logs) > OPEN_LOGS_CACHE_SIZE:
+            _open_logs.popitem(last=False)
+        return log
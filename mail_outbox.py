@@ -0,0 +1,382 @@
+import os
+import ssl
+import time
+import uuid
+import logging
+import smtplib
+import threading
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Tuple
+
+from openai_client import load_env
+from session_store import write_json_atomic, read_json
+from history_log import open_history_log
+import tracing
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+SMTP_HOST     = os.getenv('SMTP_HOST')
+SMTP_PORT     = int(os.getenv('SMTP_PORT', 587))
+SMTP_USER     = os.getenv('IMAP_USERNAME')
+SMTP_PASSWORD = os.getenv('IMAP_PASSWORD')
+
+OUTBOX_DIR          = os.getenv('OUTBOX_DIR', 'outbox')
+OUTBOX_BATCH_SIZE   = int(os.getenv('OUTBOX_BATCH_SIZE', 20))     # messages sent per connection checkout
+OUTBOX_SENDERS      = int(os.getenv('OUTBOX_SENDERS', 1))         # background sender threads / pooled connections
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 8))
+OUTBOX_RETRY_MAX    = 15 * 60                                     # cap on the per-message backoff, seconds
+SMTP_IDLE_TIMEOUT   = float(os.getenv('SMTP_IDLE_TIMEOUT', 60))   # close pooled connections idle this long
+SMTP_TIMEOUT        = float(os.getenv('SMTP_TIMEOUT', 30))
+
+# Tried in order, starting with whichever last worked
+CONNECTION_METHODS = [
+    {"name": "STARTTLS", "port": SMTP_PORT, "use_ssl": False, "use_starttls": True},
+    {"name": "SSL", "port": 465, "use_ssl": True, "use_starttls": False},
+    {"name": "STARTTLS_ALT_PORT", "port": 587, "use_ssl": False, "use_starttls": True},
+    {"name": "NO_ENCRYPTION", "port": 25, "use_ssl": False, "use_starttls": False},
+]
+
+
+class PermanentSendError(Exception):
+    """The server rejected the message itself; retrying will not help."""
+
+
+def build_message(to: str, subject: str, html: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = SMTP_USER
+    msg["To"] = to
+    msg["Subject"] = subject if subject.startswith("Re:") else f"Re: {subject}"
+    msg.set_content("Please view in an HTML-capable email client.")
+    msg.add_alternative(html, subtype="html")
+    return msg
+
+
+class SMTPPool:
+    """
+    Authenticated SMTP connections kept open between sends.
+
+    The connection method (port / SSL / STARTTLS) that last worked is remembered,
+    on disk too, so new connections go straight to it instead of walking the list.
+    """
+
+    def __init__(self, size: int = OUTBOX_SENDERS, method_file: Optional[str] = None):
+        self.size = max(1, size)
+        self.method_file = method_file
+        self.lock = threading.Lock()
+        self.idle: List[tuple] = []  # (server, method, last_used)
+        self.method: Optional[str] = None
+        if method_file and os.path.exists(method_file):
+            try:
+                self.method = read_json(method_file).get("method")
+            except (OSError, ValueError):
+                pass
+
+    def _methods(self) -> List[Dict]:
+        return sorted(CONNECTION_METHODS, key=lambda m: m["name"] != self.method)
+
+    def _connect(self, method: Dict):
+        if method["use_ssl"]:
+            server = smtplib.SMTP_SSL(SMTP_HOST, method["port"], timeout=SMTP_TIMEOUT,
+                                      context=ssl.create_default_context())
+        else:
+            server = smtplib.SMTP(SMTP_HOST, method["port"], timeout=SMTP_TIMEOUT)
+            server.ehlo()
+            if method["use_starttls"]:
+                if not server.has_extn('STARTTLS'):
+                    server.close()
+                    raise smtplib.SMTPException(f"STARTTLS not supported on port {method['port']}")
+                server.starttls(context=ssl.create_default_context())
+                server.ehlo()
+        try:
+            server.login(SMTP_USER, SMTP_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _open(self):
+        errors = []
+        for method in self._methods():
+            try:
+                server = self._connect(method)
+            except (smtplib.SMTPException, ssl.SSLError, OSError) as e:
+                logger.warning(f"SMTP {method['name']} connection failed: {e}")
+                errors.append(f"{method['name']}: {e}")
+                continue
+            if method["name"] != self.method:
+                self.method = method["name"]
+                if self.method_file:
+                    write_json_atomic(self.method_file, {"method": self.method})
+            logger.info(f"Opened SMTP connection using {method['name']}")
+            return server, method
+        raise ConnectionError("All SMTP connection methods failed: " + "; ".join(errors))
+
+    def acquire(self):
+        """A live, logged-in connection: an idle pooled one if it still answers NOOP, else a new one."""
+        now = time.monotonic()
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                server, method, last_used = self.idle.pop()
+            if now - last_used > SMTP_IDLE_TIMEOUT:
+                self._close(server)
+                continue
+            try:
+                if server.noop()[0] == 250:
+                    return server, method
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close(server)
+        return self._open()
+
+    def release(self, server, method):
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append((server, method, time.monotonic()))
+                return
+        self._close(server)
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def close_idle(self, max_idle: float = SMTP_IDLE_TIMEOUT):
+        now = time.monotonic()
+        with self.lock:
+            stale = [entry for entry in self.idle if now - entry[2] > max_idle]
+            self.idle = [entry for entry in self.idle if now - entry[2] <= max_idle]
+        for server, _, _ in stale:
+            self._close(server)
+
+    def close(self):
+        self.close_idle(max_idle=-1)
+
+
+class MailOutbox:
+    """
+    Durable queue of outgoing mail with background senders.
+
+    `enqueue` writes the message to `<OUTBOX_DIR>/pending/` and returns at once;
+    sender threads deliver due messages in batches over pooled SMTP connections.
+    Failed deliveries are retried with exponential backoff, and messages left in
+    pending/ by a crash are sent after restart. Delivered messages are recorded
+    in the `sent` history log; ones that exhaust OUTBOX_MAX_ATTEMPTS or are
+    rejected outright move to failed/.
+    """
+
+    def __init__(self, folder: str = OUTBOX_DIR, senders: int = OUTBOX_SENDERS,
+                 batch_size: int = OUTBOX_BATCH_SIZE):
+        self.folder = folder
+        self.pending_dir = os.path.join(folder, "pending")
+        self.failed_dir = os.path.join(folder, "failed")
+        os.makedirs(self.pending_dir, exist_ok=True)
+        os.makedirs(self.failed_dir, exist_ok=True)
+        self.senders = max(1, senders)
+        self.batch_size = batch_size
+        self.pool = SMTPPool(self.senders, os.path.join(folder, "smtp_method.json"))
+        self.sent_log = open_history_log(os.path.join(folder, "sent"))
+        self.cond = threading.Condition()
+        self.claimed = set()
+        self.threads: List[threading.Thread] = []
+        self.stopping = False
+
+    # -- queue -----------------------------------------------------------------
+
+    def enqueue(self, to: str, subject: str, html: str) -> str:
+        message_id = f"{time.time():.6f}-{uuid.uuid4().hex[:8]}"
+        record = {"id": message_id, "to": to, "subject": subject, "html": html,
+                  "created": time.time(), "attempts": 0, "next_attempt": 0, "last_error": None,
+                  "trace": tracing.current_context()}
+        write_json_atomic(os.path.join(self.pending_dir, f"{message_id}.json"), record)
+        logger.info(f"Queued email {message_id} to {to}")
+        with self.cond:
+            self.cond.notify()
+        return message_id
+
+    def pending(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.pending_dir) if name.endswith(".json"))
+
+    def _claim_batch(self) -> Tuple[List[Dict], Optional[float]]:
+        """Up to batch_size due messages, plus how long until the next one is due."""
+        now = time.time()
+        batch = []
+        wait = None
+        with self.cond:
+            for name in self.pending():
+                if len(batch) >= self.batch_size:
+                    break
+                if name in self.claimed:
+                    continue
+                try:
+                    record = read_json(os.path.join(self.pending_dir, name))
+                except (OSError, ValueError):
+                    continue
+                if record.get("next_attempt", 0) > now:
+                    due_in = record["next_attempt"] - now
+                    wait = due_in if wait is None else min(wait, due_in)
+                    continue
+                self.claimed.add(name)
+                batch.append(record)
+        return batch, wait
+
+    def _finish(self, record: Dict, error: Optional[Exception] = None, permanent: bool = False):
+        name = f"{record['id']}.json"
+        path = os.path.join(self.pending_dir, name)
+        try:
+            if error is None:
+                self.sent_log.append({"id": record["id"], "to": record["to"], "subject": record["subject"],
+                                      "sent_at": time.time(), "attempts": record["attempts"] + 1,
+                                      "method": self.pool.method})
+                os.remove(path)
+                return
+            record["attempts"] += 1
+            record["last_error"] = str(error)
+            if permanent or record["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+                logger.error(f"Giving up on email {record['id']} to {record['to']}: {error}")
+                write_json_atomic(os.path.join(self.failed_dir, name), record)
+                os.remove(path)
+            else:
+                record["next_attempt"] = time.time() + min(OUTBOX_RETRY_MAX, 2 ** record["attempts"])
+                write_json_atomic(path, record)
+                logger.warning(f"Email {record['id']} attempt {record['attempts']} failed, will retry: {error}")
+        finally:
+            with self.cond:
+                self.claimed.discard(name)
+
+    # -- delivery --------------------------------------------------------------
+
+    def _deliver(self, server, record: Dict):
+        # Joins the trace of the email that queued the message
+        with tracing.use(record.get("trace")), tracing.span("smtp.send", attempt=record["attempts"] + 1):
+            try:
+                server.send_message(build_message(record["to"], record["subject"], record["html"]))
+            except smtplib.SMTPRecipientsRefused as e:
+                raise PermanentSendError(f"Recipient refused: {e}") from e
+            except (smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                if 500 <= e.smtp_code < 600:
+                    raise PermanentSendError(f"Message rejected: {e}") from e
+                raise
+
+    def send_batch(self, batch: List[Dict]) -> int:
+        """Send `batch` over one pooled connection; returns the number delivered."""
+        try:
+            server, method = self.pool.acquire()
+        except Exception as e:
+            for record in batch:
+                self._finish(record, e)
+            return 0
+        delivered = 0
+        healthy = True
+        for record in batch:
+            if not healthy:
+                self._finish(record, ConnectionError("connection lost earlier in batch"))
+                continue
+            try:
+                self._deliver(server, record)
+            except PermanentSendError as e:
+                self._finish(record, e, permanent=True)
+                continue
+            except (smtplib.SMTPException, OSError) as e:
+                # SMTPException is an OSError too: only a disconnect or a socket/TLS error ends the connection
+                healthy = not isinstance(e, smtplib.SMTPServerDisconnected) and isinstance(e, smtplib.SMTPException)
+                self._finish(record, e)
+                continue
+            except Exception as e:
+                # e.g. build_message rejecting a header; the message will never send as it is
+                logger.exception(f"Could not send email {record['id']}")
+                self._finish(record, e, permanent=True)
+                continue
+            self._finish(record)
+            delivered += 1
+        if healthy:
+            self.pool.release(server, method)
+        else:
+            self.pool._close(server)
+        logger.info(f"Sent {delivered}/{len(batch)} queued emails via {method['name']}")
+        return delivered
+
+    def _run(self):
+        while True:
+            batch, wait = self._claim_batch()
+            if batch:
+                try:
+                    self.send_batch(batch)
+                except Exception:
+                    # Keep the sender alive; unfinished messages stay pending and are retried
+                    logger.exception("Mail outbox sender failed on a batch")
+                    with self.cond:
+                        self.claimed.difference_update(f"{record['id']}.json" for record in batch)
+                        self.cond.wait(timeout=1)
+                continue
+            with self.cond:
+                if self.stopping:
+                    return
+                self.cond.wait(timeout=min(wait if wait is not None else SMTP_IDLE_TIMEOUT, SMTP_IDLE_TIMEOUT))
+            self.pool.close_idle()
+
+    def start(self) -> "MailOutbox":
+        with self.cond:
+            if self.threads:
+                return self
+            self.stopping = False
+            for i in range(self.senders):
+                thread = threading.Thread(target=self._run, name=f"mail-outbox-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+        logger.info(f"Mail outbox started with {self.senders} senders, {len(self.pending())} pending")
+        return self
+
+    def stop(self, wait: bool = True):
+        """Stop the senders once nothing is due; unsent messages stay on disk for the next start."""
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        if wait:
+            for thread in self.threads:
+                thread.join()
+        self.threads = []
+        self.pool.close()
+
+    def send_now(self, to: str, subject: str, html: str) -> Optional[Dict]:
+        """Synchronous send over the pool, bypassing the queue. Returns success info or None."""
+        try:
+            server, method = self.pool.acquire()
+        except ConnectionError as e:
+            logger.error(f"Could not send email to {to}: {e}")
+            return None
+        try:
+            with tracing.span("smtp.send"):
+                server.send_message(build_message(to, subject, html))
+        except (smtplib.SMTPException, ssl.SSLError, OSError) as e:
+            logger.error(f"Could not send email to {to}: {e}")
+            self.pool._close(server)
+            return None
+        self.pool.release(server, method)
+        return {"method": method["name"], "port": method["port"], "ssl": method["use_ssl"],
+                "starttls": method["use_starttls"], "recipient": to}
+
+
+_outbox: Optional[MailOutbox] = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> MailOutbox:
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = MailOutbox()
+        return _outbox
+
+
+def enqueue_email(to: str, subject: str, html: str) -> str:
+    """Queue an email for background delivery and return its outbox id immediately."""
+    return get_outbox().start().enqueue(to, subject, html)
@@ -0,0 +1,109 @@
+"""
+Import the sessions/thread_<hash>/ tree into the SQLite claim store.
+
+    python migrate_sessions.py --sessions sessions --db claims.db
+    python migrate_sessions.py --db claims.db --stage FOLLOWUP_REQUESTED
+
+Session folders are only read; nothing under sessions/ is modified. Claims that
+already exist in the database are skipped unless --overwrite is given.
+"""
+import os
+import re
+import json
+import argparse
+import logging
+from typing import Dict
+
+from claim_store import SQLiteClaimStore, CLAIM_DB_PATH, CLAIM_FILE, CONTEXT_FILE
+from history_log import read_history
+from utils import SESSIONS_DIR
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+AGENT_HISTORY_PATTERN = re.compile(r"^(?P<agent>.+_assistant)_(?P<kind>messages|data)\.jsonl?$")
+
+
+def _read_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def migrate_session(store: SQLiteClaimStore, folder: str, thread_id: str, overwrite: bool = False) -> Dict[str, int]:
+    """Copy one session folder into the store. Returns row counts per table."""
+    counts = {"claims": 0, "context_messages": 0, "agent_messages": 0, "agent_data": 0,
+              "decisions": 0, "follow_ups": 0}
+    exists = store.has_claim(thread_id)
+    if exists and not overwrite:
+        return counts
+    if exists:
+        store.delete_thread(thread_id)
+
+    claim_path = os.path.join(folder, CLAIM_FILE)
+    claim = _read_json(claim_path) if os.path.exists(claim_path) else {"stage": "NEW"}
+    store.save_claim_by_thread(thread_id, claim)
+    counts["claims"] = 1
+
+    context_path = os.path.join(folder, CONTEXT_FILE)
+    if os.path.exists(context_path):
+        context = _read_json(context_path)
+        history = context.get("conversation_history", [])
+        store.append_context_messages_by_thread(thread_id, history, context.get("attachment_details") or None)
+        if context.get("last_updated"):
+            store.touch_context(thread_id, context["last_updated"])
+        counts["context_messages"] = len(history)
+
+    decisions = read_history(os.path.join(folder, "decisions"))
+    store.append_decisions_by_thread(thread_id, decisions)
+    counts["decisions"] = len(decisions)
+
+    follow_ups = read_history(os.path.join(folder, "follow_up"))
+    store.append_follow_ups_by_thread(thread_id, follow_ups)
+    counts["follow_ups"] = len(follow_ups)
+
+    seen = set()
+    for name in sorted(os.listdir(folder)):
+        match = AGENT_HISTORY_PATTERN.match(name)
+        if not match or (match["agent"], match["kind"]) in seen:
+            continue
+        seen.add((match["agent"], match["kind"]))
+        entries = read_history(os.path.join(folder, f"{match['agent']}_{match['kind']}"))
+        if match["kind"] == "messages":
+            store.append_agent_messages_by_thread(thread_id, match["agent"], entries)
+            counts["agent_messages"] += len(entries)
+        else:
+            store.append_agent_data_by_thread(thread_id, match["agent"], entries)
+            counts["agent_data"] += len(entries)
+    return counts
+
+
+def migrate_sessions(sessions_dir: str, db_path: str, overwrite: bool = False) -> Dict[str, int]:
+    store = SQLiteClaimStore(db_path)
+    totals: Dict[str, int] = {}
+    for name in sorted(os.listdir(sessions_dir)):
+        folder = os.path.join(sessions_dir, name)
+        if not name.startswith("thread_") or not os.path.isdir(folder):
+            continue
+        try:
+            counts = migrate_session(store, folder, name[len("thread_"):], overwrite=overwrite)
+        except Exception as e:
+            logger.error(f"Failed to migrate {folder}: {e}")
+            continue
+        for key, value in counts.items():
+            totals[key] = totals.get(key, 0) + value
+    logger.info(f"Migration complete: {totals}")
+    return totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import session folders into the SQLite claim store")
+    parser.add_argument('--sessions', default=SESSIONS_DIR, help="sessions directory to import")
+    parser.add_argument('--db', default=CLAIM_DB_PATH, help="SQLite database path")
+    parser.add_argument('--overwrite', action='store_true', help="replace claims already in the database")
+    parser.add_argument('--stage', help="list thread ids of claims in this stage instead of migrating")
+    args = parser.parse_args()
+
+    if args.stage:
+        print("\n".join(SQLiteClaimStore(args.db).claims_in_stage(args.stage)))
+    else:
+        print(json.dumps(migrate_sessions(args.sessions, args.db, overwrite=args.overwrite), indent=2))
@@ -0,0 +1,88 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 2))
+OCR_JOB_TIMEOUT = float(os.getenv("OCR_JOB_TIMEOUT", 300))  # seconds a single job may run
+OCR_WAIT_TICK = 0.5
+
+
+class OCRTimeout(TimeoutError):
+    pass
+
+
+class OCRExecutor:
+    """
+    Process pool for CPU-bound OCR work.
+
+    Callers submit module-level functions (page windows, PSM passes) and collect
+    them with `gather`, which enforces OCR_JOB_TIMEOUT per job, measured from when
+    the job starts running rather than when it was queued. Workers are spawned
+    rather than forked because the listener process is multi-threaded.
+    """
+
+    def __init__(self, workers: int = OCR_WORKERS, timeout: float = OCR_JOB_TIMEOUT):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"OCR pool started with {self.workers} workers")
+            return self._pool
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        return self._get_pool().submit(fn, *args, **kwargs)
+
+    def gather(self, futures: List[Future], label: str = "OCR job") -> List[Any]:
+        """Results of `futures` in order; cancels the rest if any job fails or overruns."""
+        started = {}
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=OCR_WAIT_TICK, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()  # surface the first failure immediately
+                now = time.monotonic()
+                for future in pending:
+                    if future.running():
+                        started.setdefault(future, now)
+                        if now - started[future] > self.timeout:
+                            raise OCRTimeout(f"{label} exceeded {self.timeout:g}s")
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+        return [future.result() for future in futures]
+
+    def run(self, fn: Callable, *args, **kwargs) -> Any:
+        return self.gather([self.submit(fn, *args, **kwargs)], getattr(fn, "__name__", "OCR job"))[0]
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=True)
+                self._pool = None
+
+
+_executor: Optional[OCRExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_ocr_executor() -> OCRExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = OCRExecutor()
+        return _executor
@@ -0,0 +1,73 @@
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_env_loaded = False
+
+
+def load_env():
+    """Load .env once per process; modules that read settings at import call this first."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+load_env()
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 32))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", 16))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", 120))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", 10))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 300))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 2))
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Process-wide OpenAI client, created on first use.
+
+    Every agent shares one HTTP connection pool, so concurrent runs reuse
+    kept-alive TLS connections instead of each module opening its own. The
+    openai package itself is only imported here, keeping it off the import path
+    of modules that never make a call.
+    """
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            import openai
+            from openai import OpenAI, DefaultHttpxClient
+
+            # Build pool settings from the HTTP library the installed openai package is built on
+            limits_type = type(openai.DEFAULT_CONNECTION_LIMITS)
+            http_client = DefaultHttpxClient(
+                limits=limits_type(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                    keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+                ),
+            )
+            _client = OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=http_client,
+                timeout=openai.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+                max_retries=OPENAI_MAX_RETRIES,
+            )
+            logger.info(f"OpenAI client ready (pool {OPENAI_MAX_CONNECTIONS}, keep-alive {OPENAI_MAX_KEEPALIVE})")
+    return _client
+
+
+def close_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -1,39 +1,34 @@
 import os
 import json
 import time
-from typing import Dict, List
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 from dataclasses import dataclass
-from openai import OpenAI
-from dotenv import load_dotenv
 
 from triage_agent import run_triage
-from attachment_details import generate_attachment_details
 from clarification_call import run_clarifying_question
-from utils import load_json, save_json, get_session_folder, load_claim_state, save_claim_state
+from utils import load_json, json_exists, get_session_folder, session_lock
+from claim_store import get_claim_store
 from followup_agent import run_follow_up_agent
-from accidental_and_glass import evaluate_accidental_damage_glass_claim
-from ancilliary import evaluate_ancillary_property_claim
-from fire import evaluate_fire_incident_claim
-from general_exceptions import evaluate_general_exceptions_claim
-from general_administrative import evaluate_admin_and_underwriting_claim
-from personal_belongings import evaluate_personal_belongings_claim
-from personal_convenience import evaluate_mobility_and_continuation_services_claim
-from personal_injury import evaluate_injury_and_medical_assault_claim
-from theft import evaluate_theft_incident_claim
-from third_party_injury import evaluate_bodily_injury_fatality_claim
-from third_party_legal import evaluate_legal_costs_and_statutory_payments_claim
-from third_party_liability import evaluate_special_liability_situations_claim
-from third_party_property import evaluate_third_party_property_damage_claim
-from Vehicle_security import evaluate_security_and_condition_compliance_claim
-from Vehicle_usage import evaluate_territorial_and_usage_claim
-
-load_dotenv()
+from run_waiter import RunWaiter
+import tracing
+from openai_client import get_client, load_env
+from decision_engines import DECISION_ENGINE
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
 SESSIONS_DIR = "sessions"
-CLAIM_FILE = "claim.json"
-CONTEXT_FILE = "context.json"
-FOLLOW_UP_FILE = "follow_up.json"
 ATTACHMENT_DATA_FILE = "attachment_data.json"
-DECISIONS_FILE ="decisions.json"
+
+# Specialist assistants run concurrently: at most AGENT_CONCURRENCY_PER_CLAIM per claim,
+# and at most AGENT_CONCURRENCY_GLOBAL across every claim handled by this process
+AGENT_CONCURRENCY_PER_CLAIM = int(os.getenv("AGENT_CONCURRENCY_PER_CLAIM", 4))
+AGENT_CONCURRENCY_GLOBAL = int(os.getenv("AGENT_CONCURRENCY_GLOBAL", 8))
+_agent_slots = threading.BoundedSemaphore(AGENT_CONCURRENCY_GLOBAL)
 
 # FIXED: Corrected typo in administrative assistant naming
 INCIDENT_TYPE_TO_AGENT = {
@@ -87,24 +82,6 @@ ASSISTANT_IDS = {
     "administrative_assistant": os.getenv("ADMINISTRATIVE_ASSISTANT_ID"),  # FIXED: Corrected typo
 }
 
-DECISION_ENGINE = {
-    "third_party_injury_assistant": evaluate_bodily_injury_fatality_claim,
-    "accidental_and_glass_assistant": evaluate_accidental_damage_glass_claim,
-    "ancillary_assistant": evaluate_ancillary_property_claim,
-    "fire_assistant": evaluate_fire_incident_claim,
-    "theft_assistant": evaluate_theft_incident_claim,
-    "third_party_property_assistant": evaluate_third_party_property_damage_claim,
-    "special_liability_assistant": evaluate_special_liability_situations_claim,
-    "legal_and_statutory_assistant": evaluate_legal_costs_and_statutory_payments_claim,
-    "personal_injury_assistant": evaluate_injury_and_medical_assault_claim,
-    "personal_convenience_assistant": evaluate_mobility_and_continuation_services_claim,
-    "personal_property_assistant": evaluate_personal_belongings_claim,
-    "territorial_and_usage_assistant": evaluate_territorial_and_usage_claim,
-    "general_exceptions_assistant": evaluate_general_exceptions_claim,
-    "vehicle_security_assistant": evaluate_security_and_condition_compliance_claim,
-    "administrative_assistant": evaluate_admin_and_underwriting_claim,  # FIXED: Corrected typo
-}
-
 # ADDED: State machine for proper claim stage transitions
 class ClaimStage:
     NEW = "NEW"
@@ -132,48 +109,40 @@ class Orchestrator:
         self.sessions_dir = SESSIONS_DIR
         self.incident_type_to_agent = INCIDENT_TYPE_TO_AGENT
         self.assistant_ids = ASSISTANT_IDS
-        self.client = OpenAI()  # Initialize OpenAI client
+        self.store = get_claim_store()  # Claim state backend (CLAIM_STORE=files|sqlite)
+        self._run_waiter: Optional[RunWaiter] = None
+
+    @property
+    def client(self):
+        """Shared OpenAI client, created on first use."""
+        return get_client()
+
+    @property
+    def run_waiter(self) -> RunWaiter:
+        if self._run_waiter is None:
+            self._run_waiter = RunWaiter(self.client)
+        return self._run_waiter
         
     def init_context(self, email: str):
         """Initialize conversation context"""
-        folder = get_session_folder(email)
-        context_path = os.path.join(folder, CONTEXT_FILE)
-        
-        if not os.path.exists(context_path):
-            default_context = {
-                "conversation_history": [],
-                "attachment_details": {},
-                "last_updated": time.time()
-            }
-            save_json(context_path, default_context)
+        self.store.ensure_context(email)
 
     def load_attachment_data(self, email: str) -> Dict:
         """Load attachment data from attachment_data.json"""
         folder = get_session_folder(email)
         attachment_path = os.path.join(folder, ATTACHMENT_DATA_FILE)
         
-        if os.path.exists(attachment_path):
+        if json_exists(attachment_path):
             return load_json(attachment_path)
         return {}
 
     def update_context(self, email: str, user_message: str, attachments: List[str] = None):
         """Update conversation context with new user message and attachment details"""
-        folder = get_session_folder(email)
-        context_path = os.path.join(folder, CONTEXT_FILE)
-        
-        # Load existing context
-        if os.path.exists(context_path):
-            context = load_json(context_path)
-        else:
-            context = {
-                "conversation_history": [],
-                "attachment_details": {},
-                "last_updated": time.time()
-            }
+        new_messages = []
         
         # Add user message to conversation history
         if user_message.strip():
-            context["conversation_history"].append({
+            new_messages.append({
                 "role": "user",
                 "content": user_message,
                 "timestamp": time.time()
@@ -181,7 +150,7 @@ class Orchestrator:
         
         # Handle attachments
         if attachments:
-            context["conversation_history"].append({
+            new_messages.append({
                 "role": "user",
                 "content": f"[User uploaded {len(attachments)} attachment(s)]",
                 "timestamp": time.time(),
@@ -190,53 +159,25 @@ class Orchestrator:
         
         # Load and merge attachment details
         attachment_data = self.load_attachment_data(email)
-        if attachment_data:
-            context["attachment_details"] = attachment_data
-        
-        context["last_updated"] = time.time()
-        save_json(context_path, context)
+        self.store.append_context_messages(email, new_messages, attachment_data or None)
 
     def get_conversation_context(self, email: str) -> Dict:
         """Get comprehensive conversation context"""
-        folder = get_session_folder(email)
-        context_path = os.path.join(folder, CONTEXT_FILE)
-        
-        if os.path.exists(context_path):
-            return load_json(context_path)
-        return {
-            "conversation_history": [],
-            "attachment_details": {},
-            "last_updated": time.time()
-        }
+        return self.store.load_context(email)
 
     def save_agent_message(self, email: str, agent_name: str, message: str, role: str = "assistant"):
-        """Save agent message to agent-specific messages file"""
-        folder = get_session_folder(email)
-        agent_messages_path = os.path.join(folder, f"{agent_name}_messages.json")
-        
-        if os.path.exists(agent_messages_path):
-            messages = load_json(agent_messages_path)
-        else:
-            messages = []
-        
+        """Append agent message to the agent-specific message history"""
         msg_entry = {
             "role": role,
             "content": message,
             "timestamp": time.time()
         }
-        messages.append(msg_entry)
-        save_json(agent_messages_path, messages)
+        self.store.append_agent_message(email, agent_name, msg_entry)
 
     def get_agent_conversation_context(self, email: str, agent_name: str) -> List[Dict]:
         """Get conversation context specific to an agent"""
-        folder = get_session_folder(email)
-        agent_messages_path = os.path.join(folder, f"{agent_name}_messages.json")
-        
-        if os.path.exists(agent_messages_path):
-            messages = load_json(agent_messages_path)
-            # Return last 5 messages for context
-            return messages[-5:] if len(messages) > 5 else messages
-        return []
+        # Return last 5 messages for context, read from the end of the history
+        return self.store.agent_messages_tail(email, agent_name, 5)
 
     def add_user_message_to_agents(self, email: str, user_message: str, agents_to_run: List[str]):
         """Add user message to each agent's conversation context"""
@@ -296,96 +237,74 @@ class Orchestrator:
         return context_message
 
     def save_follow_up(self, email: str, agent_name: str, response: str):
-        """Save agent response to follow_up.json if it's not JSON schema"""
-        folder = get_session_folder(email)
-        follow_up_path = os.path.join(folder, FOLLOW_UP_FILE)
-        
-        if os.path.exists(follow_up_path):
-            follow_up_data = load_json(follow_up_path)
-        else:
-            follow_up_data = {
-                "responses": [],
-                "last_updated": time.time()
-            }
-        
+        """Append agent response to the follow-up history if it's not JSON schema"""
         follow_up_entry = {
             "agent": agent_name,
             "response": response,
             "timestamp": time.time()
         }
-        
-        follow_up_data["responses"].append(follow_up_entry)
-        follow_up_data["last_updated"] = time.time()
-        save_json(follow_up_path, follow_up_data)
+        self.store.append_follow_up(email, follow_up_entry)
     
     # FIXED: Changed from static method to instance method
-    def save_decision(self, email: str, agent_name: str, decision: Dict):
-        """Save agent decision to decisions.json"""
-        folder = get_session_folder(email)
-        path = os.path.join(folder, DECISIONS_FILE)
-        if os.path.exists(path):
-            all_decisions = load_json(path)
-        else:
-            all_decisions = []
-        all_decisions.append({
+    def save_decision(self, email: str, agent_name: str, decision: Dict, function: Optional[str] = None,
+                      arguments: Optional[Dict] = None):
+        """Append agent decision to the decisions history, with the tool call it was made from"""
+        entry = {
             "agent": agent_name,
             "timestamp": time.time(),
             "decision": decision
-        })
-        save_json(path, all_decisions)
+        }
+        if function is not None:
+            entry["function"] = function
+        if arguments is not None:
+            # Kept so replay_decisions.py can re-score the exact payload the engine saw
+            entry["arguments"] = arguments
+        self.store.append_decision(email, entry)
 
     # ADDED: Method to check if agent has completed and returned a decision
     def is_agent_complete(self, email: str, agent_name: str) -> bool:
         """Check if agent has completed by returning a decision"""
-        folder = get_session_folder(email)
-        decisions_path = os.path.join(folder, DECISIONS_FILE)
-        
-        if os.path.exists(decisions_path):
-            decisions = load_json(decisions_path)
-            # Agent is complete if it has a decision recorded
-            return any(d.get("agent") == agent_name for d in decisions)
-        
-        return False
+        # Agent is complete if it has a decision recorded
+        return agent_name in self.store.agents_with_decisions(email)
 
     # ADDED: Method to clean up thread after agent completion
     def cleanup_agent_thread(self, email: str, agent_name: str):
         """Clean up OpenAI thread after agent completion"""
         try:
-            claim = self.get_claim(email)
-            agent_threads = claim.get("agent_threads", {})
-            
-            if agent_name in agent_threads:
-                thread_id = agent_threads[agent_name]
-                # Note: OpenAI doesn't provide thread deletion, but we can remove from our tracking
-                del agent_threads[agent_name]
-                claim["agent_threads"] = agent_threads
-                save_claim_state(email, claim)
-                print(f"[orchestration] Cleaned up thread tracking for {agent_name}")
+            with session_lock(email):
+                claim = self.get_claim(email)
+                agent_threads = claim.get("agent_threads", {})
+                
+                if agent_name in agent_threads:
+                    thread_id = agent_threads[agent_name]
+                    # Note: OpenAI doesn't provide thread deletion, but we can remove from our tracking
+                    del agent_threads[agent_name]
+                    claim["agent_threads"] = agent_threads
+                    self.store.save_claim(email, claim)
+                    logger.debug(f"Cleaned up thread tracking for {agent_name}")
         except Exception as e:
-            print(f"[orchestration] Error cleaning up thread for {agent_name}: {e}")
+            logger.error(f"Error cleaning up thread for {agent_name}: {e}")
 
     # ADDED: Method to handle claim stage transitions safely
     def transition_claim_stage(self, email: str, new_stage: str) -> bool:
         """Safely transition claim stage with validation"""
-        claim = self.get_claim(email)
-        current_stage = claim.get("stage", ClaimStage.NEW)
-        
-        # Check if transition is valid
-        if new_stage in ClaimStage.VALID_TRANSITIONS.get(current_stage, []):
-            claim["stage"] = new_stage
-            save_claim_state(email, claim)
-            print(f"[orchestration] Stage transition: {current_stage} -> {new_stage}")
-            return True
-        else:
-            print(f"[orchestration] Invalid stage transition: {current_stage} -> {new_stage}")
-            return False
+        with session_lock(email):
+            claim = self.get_claim(email)
+            current_stage = claim.get("stage", ClaimStage.NEW)
+            
+            # Check if transition is valid
+            if new_stage in ClaimStage.VALID_TRANSITIONS.get(current_stage, []):
+                claim["stage"] = new_stage
+                self.store.save_claim(email, claim)
+                logger.info(f"Stage transition: {current_stage} -> {new_stage}")
+                return True
+            else:
+                logger.warning(f"Invalid stage transition: {current_stage} -> {new_stage}")
+                return False
 
     def init_claim_state(self, email: str):
         """Initialize claim state"""
-        folder = get_session_folder(email)
-        claim_path = os.path.join(folder, CLAIM_FILE)
-        
-        if not os.path.exists(claim_path):
+        if not self.store.claim_exists(email):
             default_claim = {
                 "stage": ClaimStage.NEW,  # Use constant instead of string
                 "incident_types": {},
@@ -394,30 +313,19 @@ class Orchestrator:
                 "agent_threads": {},  # Store thread IDs for each agent
                 "completed_agents": []  # ADDED: Track agents that have completed with decisions
             }
-            save_json(claim_path, default_claim)
+            self.store.save_claim(email, default_claim)
 
     def get_claim(self, email: str) -> Dict:
         """Get current claim state"""
-        folder = get_session_folder(email)
-        claim_path = os.path.join(folder, CLAIM_FILE)
-        return load_json(claim_path) if os.path.exists(claim_path) else {}
+        return self.store.load_claim(email)
 
     def save_agent_data(self, email: str, agent_name: str, data: Dict):
-        """Save agent structured data to agent-specific data file"""
-        folder = get_session_folder(email)
-        agent_data_path = os.path.join(folder, f"{agent_name}_data.json")
-        
-        if os.path.exists(agent_data_path):
-            existing_data = load_json(agent_data_path)
-        else:
-            existing_data = []
-        
+        """Append agent structured data to the agent-specific data history"""
         data_entry = {
             "timestamp": time.time(),
             "data": data
         }
-        existing_data.append(data_entry)
-        save_json(agent_data_path, existing_data)
+        self.store.append_agent_data(email, agent_name, data_entry)
 
     def is_json_response(self, response: str) -> bool:
         """Check if response is valid JSON"""
@@ -435,34 +343,78 @@ class Orchestrator:
         if agent_name in agent_threads:
             return agent_threads[agent_name]
         
-        # Create new thread
+        # Create new thread outside the session lock so sibling agents are not serialised on the API call
         thread = self.client.beta.threads.create()
-        agent_threads[agent_name] = thread.id
         
-        # Update claim with new thread ID
-        claim["agent_threads"] = agent_threads
-        save_claim_state(email, claim)
+        # Update claim with new thread ID, re-reading so concurrent agents' threads are kept
+        with session_lock(email):
+            claim = self.get_claim(email)
+            agent_threads = claim.get("agent_threads", {})
+            agent_threads[agent_name] = thread.id
+            claim["agent_threads"] = agent_threads
+            self.store.save_claim(email, claim)
         
         return thread.id
     # Add these methods to your Orchestrator class
 
     def mark_agent_complete(self, email: str, agent_name: str):
         """Mark an agent as completed with a decision"""
-        claim = self.get_claim(email)
-        completed_agents = claim.get("completed_agents", [])
-        
-        if agent_name not in completed_agents:
-            completed_agents.append(agent_name)
-            claim["completed_agents"] = completed_agents
-            save_claim_state(email, claim)
-            print(f"[orchestration] Marked {agent_name} as complete")
+        with session_lock(email):
+            claim = self.get_claim(email)
+            completed_agents = claim.get("completed_agents", [])
+            
+            if agent_name not in completed_agents:
+                completed_agents.append(agent_name)
+                claim["completed_agents"] = completed_agents
+                self.store.save_claim(email, claim)
+                logger.debug(f"Marked {agent_name} as complete")
 
 
     
+    def handle_decision_tool_calls(self, email: str, agent_name: str, run) -> Optional[List[Dict]]:
+        """Route a run's decision tool calls to the local decision engine and return the tool outputs"""
+        logger.debug(f"{agent_name} making decision - extracting payload")
+        
+        # Get the required action details
+        required_action = run.required_action
+        if not required_action or required_action.type != "submit_tool_outputs":
+            logger.warning(f"Unexpected required_action type for {agent_name}")
+            return None
+        
+        tool_outputs = []
+        for tool_call in required_action.submit_tool_outputs.tool_calls:
+            func_name = tool_call.function.name
+            args = json.loads(tool_call.function.arguments)
+            
+            logger.debug(f"Decision function called: {func_name} with args: {args}")
+            
+            # Route to the local decision engine
+            if agent_name in DECISION_ENGINE:
+                with tracing.span("decision_engine", agent=agent_name, function=func_name) as decision_span:
+                    decision = DECISION_ENGINE[agent_name](args)
+                    decision_span.set("decision", decision.get("decision"))
+                logger.info(f"{agent_name} decision: {decision}")
+                self.save_decision(email, agent_name, decision, function=func_name, arguments=args)
+                
+                # Mark agent as completed
+                self.mark_agent_complete(email, agent_name)
+                self.cleanup_agent_thread(email, agent_name)
+                
+            else:
+                logger.warning(f"No DECISION_ENGINE handler for {agent_name}")
+                decision = {"decision": "pending", "reason": "No engine configured"}
+            
+            # Prepare tool output
+            tool_outputs.append({
+                "tool_call_id": tool_call.id,
+                "output": json.dumps(decision)
+            })
+        return tool_outputs
+
     def run_assistant_agent(self, email: str, agent_name: str) -> bool:
         """Run assistant agent - they can either ask questions OR make decisions"""
         if agent_name not in self.assistant_ids:
-            print(f"[orchestration] No assistant ID found for agent: {agent_name}")
+            logger.warning(f"No assistant ID found for agent: {agent_name}")
             return False
         
         try:
@@ -482,73 +434,15 @@ class Orchestrator:
                 content=context_message
             )
             
-            # Run the assistant
-            run = self.client.beta.threads.runs.create(
-                thread_id=thread_id,
-                assistant_id=assistant_id
+            # Run the assistant; decision tool calls are answered by the local decision engine
+            run, timing = self.run_waiter.run(
+                thread_id,
+                assistant_id,
+                tool_handler=lambda pending_run: self.handle_decision_tool_calls(email, agent_name, pending_run)
             )
+            logger.info(f"{agent_name} run {run.status} in {timing.total:.2f}s "
+                        f"(first event after {timing.first_event_text()}, {timing.tool_rounds} tool round(s))")
             
-            # Wait for completion and handle different statuses
-            while run.status in ['queued', 'in_progress', 'cancelling']:
-                time.sleep(1)
-                run = self.client.beta.threads.runs.retrieve(
-                    thread_id=thread_id,
-                    run_id=run.id
-                )
-            
-            # Handle requires_action status (when assistant makes a decision)
-            if run.status == "requires_action":
-                print(f"[orchestration] {agent_name} making decision - extracting payload")
-                
-                # Get the required action details
-                required_action = run.required_action
-                if required_action and required_action.type == "submit_tool_outputs":
-                    tool_calls = required_action.submit_tool_outputs.tool_calls
-                    
-                    tool_outputs = []
-                    for tool_call in tool_calls:
-                        func_name = tool_call.function.name
-                        args = json.loads(tool_call.function.arguments)
-                        
-                        print(f"[orchestration] Decision function called: {func_name} with args: {args}")
-                        
-                        # Route to the local decision engine
-                        if agent_name in DECISION_ENGINE:
-                            decision = DECISION_ENGINE[agent_name](args)
-                            print(f"[orchestration] {agent_name} decision: {decision}")
-                            self.save_decision(email, agent_name, decision)
-                            
-                            # Mark agent as completed
-                            self.mark_agent_complete(email, agent_name)
-                            self.cleanup_agent_thread(email, agent_name)
-                            
-                        else:
-                            print(f"[orchestration] No DECISION_ENGINE handler for {agent_name}")
-                            decision = {"decision": "pending", "reason": "No engine configured"}
-                        
-                        # Prepare tool output
-                        tool_outputs.append({
-                            "tool_call_id": tool_call.id,
-                            "output": json.dumps(decision)
-                        })
-                    
-                    # Submit tool outputs
-                    run = self.client.beta.threads.runs.submit_tool_outputs(
-                        thread_id=thread_id,
-                        run_id=run.id,
-                        tool_outputs=tool_outputs
-                    )
-                    
-                    # Wait for completion
-                    while run.status in ("queued", "in_progress"):
-                        time.sleep(1)
-                        run = self.client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
-                
-                else:
-                    print(f"[orchestration] Unexpected required_action type for {agent_name}")
-                    self.client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
-                    return False
-                        
             if run.status == 'completed':
                 # Get the response
                 messages = self.client.beta.threads.messages.list(
@@ -569,26 +463,26 @@ class Orchestrator:
                         try:
                             json_data = json.loads(response_content)
                             self.save_agent_data(email, agent_name, json_data)
-                            print(f"[orchestration] {agent_name} returned structured data")
+                            logger.debug(f"{agent_name} returned structured data")
                         except json.JSONDecodeError:
                             # Fallback to follow-up storage
                             self.save_follow_up(email, agent_name, response_content)
-                            print(f"[orchestration] {agent_name} returned message (JSON parse failed)")
+                            logger.warning(f"{agent_name} returned message (JSON parse failed)")
                     else:
                         # Save as follow-up message (could be questions)
                         self.save_follow_up(email, agent_name, response_content)
-                        print(f"[orchestration] {agent_name} returned conversational message (possibly questions)")
+                        logger.debug(f"{agent_name} returned conversational message (possibly questions)")
                     
                     return True
                 else:
-                    print(f"[orchestration] No response from {agent_name}")
+                    logger.warning(f"No response from {agent_name}")
                     return False
             else:
-                print(f"[orchestration] Assistant run failed with status: {run.status}")
+                logger.error(f"Assistant run failed with status: {run.status}")
                 return False
                 
         except Exception as e:
-            print(f"[orchestration] Error running assistant agent {agent_name}: {e}")
+            logger.error(f"Error running assistant agent {agent_name}: {e}")
             return False
 
 
@@ -613,7 +507,7 @@ class Orchestrator:
 
     def run_agent(self, email: str, agent_name: str) -> bool:
         """Run a specific agent with comprehensive context"""
-        print(f"[orchestration] Running agent: {agent_name}")
+        logger.debug(f"Running agent: {agent_name}")
         
         try:
             # Special handling for triage agent
@@ -627,29 +521,50 @@ class Orchestrator:
                     claim["incident_types"] = triage_result.get("incident_types", {})
                     # Use proper stage transition
                     self.transition_claim_stage(email, ClaimStage.TRIAGED)
-                    print(f"[orchestration] Triage complete. Incident types: {claim['incident_types']}")
+                    logger.info(f"Triage complete. Incident types: {claim['incident_types']}")
                     return True
                 return False
             
             # Run assistant agent for all other agents
             else:
-                success = self.run_assistant_agent(email, agent_name)
+                with tracing.span("agent.run", agent=agent_name) as agent_span:
+                    success = self.run_assistant_agent(email, agent_name)
+                    agent_span.set("success", success)
                 
                 if success:
                     # Mark agent as run (keep existing functionality)
-                    claim = self.get_claim(email)
-                    agents_run = claim.get("agents_run", [])
-                    if agent_name not in agents_run:
-                        agents_run.append(agent_name)
-                        claim["agents_run"] = agents_run
-                        save_claim_state(email, claim)
+                    with session_lock(email):
+                        claim = self.get_claim(email)
+                        agents_run = claim.get("agents_run", [])
+                        if agent_name not in agents_run:
+                            agents_run.append(agent_name)
+                            claim["agents_run"] = agents_run
+                            self.store.save_claim(email, claim)
                 
                 return success
                 
         except Exception as e:
-            print(f"[orchestration] Error running agent {agent_name}: {e}")
+            logger.error(f"Error running agent {agent_name}: {e}")
             return False
 
+    def _run_agent_with_slot(self, email: str, agent_name: str) -> bool:
+        """Run an agent once a global concurrency slot is free"""
+        with _agent_slots:
+            return self.run_agent(email, agent_name)
+
+    def run_agents(self, email: str, agents: List[str]) -> Dict[str, bool]:
+        """Run specialist agents concurrently, bounded per claim and globally"""
+        if not agents:
+            return {}
+        workers = min(AGENT_CONCURRENCY_PER_CLAIM, len(agents))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agent") as pool:
+            futures = {agent: pool.submit(tracing.wrap(self._run_agent_with_slot), email, agent) for agent in agents}
+            results = {agent: future.result() for agent, future in futures.items()}
+        for agent, success in results.items():
+            if not success:
+                logger.warning(f"Agent {agent} failed")
+        return results
+
     # IMPROVED: Better logic for checking if all agents are complete
     def all_agents_complete(self, email: str) -> bool:
         """Check if all required agents have completed with decisions (not just asked questions)"""
@@ -663,20 +578,20 @@ class Orchestrator:
                 required_agents.append(self.incident_type_to_agent[incident_type])
         
         # Check if all required agents have decisions recorded
-        folder = get_session_folder(email)
-        decisions_path = os.path.join(folder, DECISIONS_FILE)
-        
-        if not os.path.exists(decisions_path):
+        agents_with_decisions = self.store.agents_with_decisions(email)
+        if not agents_with_decisions:
             return False
-            
-        decisions = load_json(decisions_path)
-        agents_with_decisions = [d.get("agent") for d in decisions]
         
         # All required agents must have decisions
         return all(agent in agents_with_decisions for agent in required_agents)
 
     def orchestrate(self, email: str, user_message: str, attachments: List[str]):
-        print(f"\n[orchestrate] New message from {email}")
+        # Session documents are cached for the whole turn and flushed once at the end
+        with tracing.span("orchestrate"), self.store.turn(email):
+            self._orchestrate_turn(email, user_message, attachments)
+
+    def _orchestrate_turn(self, email: str, user_message: str, attachments: List[str]):
+        logger.info(f"New message from {email}")
         self.init_claim_state(email)
         self.init_context(email)
 
@@ -685,25 +600,28 @@ class Orchestrator:
 
         # Handle attachments
         if attachments:
-            print("[orchestrate] Running attachment details agent...")
+            logger.debug("Running attachment details agent...")
+            # Imported on first use so OCR and imaging libraries stay off the startup path
+            from attachment_details import generate_attachment_details
             generate_attachment_details(email, attachments)
             # Update context again to include attachment details
             self.update_context(email, "", [])  # Empty message, no new attachments
 
         claim = self.get_claim(email)
         stage = claim.get("stage", ClaimStage.NEW)
-        print(f"[orchestrate] Current claim stage: {stage}")
+        tracing.current_span().set("stage", stage)
+        logger.info(f"Current claim stage: {stage}")
 
         # Stage-specific handling with proper transitions
         if stage == ClaimStage.NEW:
-            print("[orchestrate] First message - running clarifying question agent...")
+            logger.debug("First message - running clarifying question agent...")
             prelim = run_clarifying_question(email, user_message)
             
             # Use proper stage transition
             self.transition_claim_stage(email, ClaimStage.QUESTIONED)
 
         elif stage == ClaimStage.QUESTIONED:
-            print("[orchestrate] Running triage on new message...")
+            logger.debug("Running triage on new message...")
             triage_success = self.run_agent(email, "triage")
 
             if triage_success:
@@ -712,45 +630,41 @@ class Orchestrator:
                 
                 agents_to_run = self.get_agents_to_run(email)
                 if agents_to_run:
-                    print(f"[orchestrate] Running agents: {agents_to_run}")
+                    logger.info(f"Running agents: {agents_to_run}")
                     
-                    # Run each agent (they will ask questions first, not make decisions yet)
-                    for agent in agents_to_run:
-                        print(f"[orchestrate] Running agent: {agent}")
-                        success = self.run_agent(email, agent)
-                        if not success:
-                            print(f"[orchestrate] Warning: Agent {agent} failed")
+                    # Run agents concurrently (they will ask questions first, not make decisions yet)
+                    self.run_agents(email, agents_to_run)
                     # right before you enter the existence check:
                     follow_up_result = False
 
-                    if os.path.exists(os.path.join(get_session_folder(email), FOLLOW_UP_FILE)):
+                    if self.store.has_follow_ups(email):
                         try:
                             follow_up_result = run_follow_up_agent(email)
-                            print("[orchestrate] Follow-up agent completed")
+                            logger.debug("Follow-up agent completed")
                         except Exception as e:
-                            print(f"[orchestrate] Follow-up agent failed: {e}")
+                            logger.error(f"Follow-up agent failed: {e}")
                             follow_up_result = False
                     else:
-                        print("[orchestrate] No follow_up.json found; skipping follow‑up")
+                        logger.info("No follow-up responses recorded; skipping follow‑up")
 
                     if follow_up_result:
                         self.transition_claim_stage(email, ClaimStage.FOLLOWUP_REQUESTED)
                     else:
-                        print("[orchestrate] No follow-up needed - checking for agent completion…")
+                        logger.debug("No follow-up needed - checking for agent completion…")
                         if self.all_agents_complete(email):
                             self.transition_claim_stage(email, ClaimStage.AGENTS_COMPLETE)
                         # otherwise stay in AGENTS_RUNNING
 
                 else:
-                    print("[orchestrate] No agents to run based on triage")
+                    logger.info("No agents to run based on triage")
                     self.transition_claim_stage(email, ClaimStage.COMPLETE)
 
         elif stage == ClaimStage.AGENTS_RUNNING:
-            print("[orchestrate] Agents currently running...")
+            logger.debug("Agents currently running...")
             
             # Check if user provided new information that might answer pending questions
             if user_message.strip():
-                print("[orchestrate] New user message - updating agent contexts...")
+                logger.debug("New user message - updating agent contexts...")
                 
                 # Get agents that are still running (not completed)
                 agents_to_run = self.get_agents_to_run(email)
@@ -759,14 +673,11 @@ class Orchestrator:
                     self.add_user_message_to_agents(email, user_message, agents_to_run)
                     
                     # Re-run agents with updated context
-                    for agent in agents_to_run:
-                        print(f"[orchestrate] Re-running agent with new context: {agent}")
-                        success = self.run_agent(email, agent)
-                        if not success:
-                            print(f"[orchestrate] Warning: Agent {agent} failed")
+                    logger.info(f"Re-running agents with new context: {agents_to_run}")
+                    self.run_agents(email, agents_to_run)
                 
                 # After agents process new info, run follow-up to see if more questions needed
-                print("[orchestrate] Running follow-up agent to check for additional questions...")
+                logger.debug("Running follow-up agent to check for additional questions...")
                 follow_up_result = run_follow_up_agent(email)
                 if follow_up_result:
                     self.transition_claim_stage(email, ClaimStage.FOLLOWUP_REQUESTED)
@@ -777,15 +688,15 @@ class Orchestrator:
             else:
                 # No new message, just check completion status
                 if self.all_agents_complete(email):
-                    print("[orchestrate] All agents complete")
+                    logger.info("All agents complete")
                     self.transition_claim_stage(email, ClaimStage.AGENTS_COMPLETE)
 
         elif stage == ClaimStage.AGENTS_COMPLETE:
-            print("[orchestrate] All agents have completed - claim processing finished")
+            logger.info("All agents have completed - claim processing finished")
             self.transition_claim_stage(email, ClaimStage.COMPLETE)
 
         elif stage == ClaimStage.FOLLOWUP_REQUESTED:
-            print("[orchestrate] Follow-up questions were asked - processing user response...")
+            logger.debug("Follow-up questions were asked - processing user response...")
             
             if user_message.strip():
                 # User provided response to questions
@@ -796,31 +707,28 @@ class Orchestrator:
                     self.add_user_message_to_agents(email, user_message, agents_to_run)
                     
                     # Re-run agents with user's answers
-                    for agent in agents_to_run:
-                        print(f"[orchestrate] Re-running agent with user response: {agent}")
-                        success = self.run_agent(email, agent)
-                        if not success:
-                            print(f"[orchestrate] Warning: Agent {agent} failed")
+                    logger.info(f"Re-running agents with user response: {agents_to_run}")
+                    self.run_agents(email, agents_to_run)
                 
                 # After processing user response, check if more questions needed
-                print("[orchestrate] Running follow-up agent to check for additional questions...")
+                logger.debug("Running follow-up agent to check for additional questions...")
                 follow_up_result = run_follow_up_agent(email)
                 if follow_up_result:
                     # More questions needed - stay in FOLLOWUP_REQUESTED
-                    print("[orchestrate] Additional questions needed - staying in follow-up stage")
+                    logger.info("Additional questions needed - staying in follow-up stage")
                 else:
                     # No more questions - transition back to agents running to check completion
-                    print("[orchestrate] No more questions - checking agent completion...")
+                    logger.debug("No more questions - checking agent completion...")
                     if self.all_agents_complete(email):
                         self.transition_claim_stage(email, ClaimStage.AGENTS_COMPLETE)
                     else:
                         self.transition_claim_stage(email, ClaimStage.AGENTS_RUNNING)
             else:
                 # No user response yet - stay in FOLLOWUP_REQUESTED
-                print("[orchestrate] Waiting for user response to follow-up questions")
+                logger.info("Waiting for user response to follow-up questions")
 
         elif stage == ClaimStage.COMPLETE:
-            print("[orchestrate] Claim complete - checking for reopening...")
+            logger.debug("Claim complete - checking for reopening...")
             
             # Re-run triage to see if claim should be reopened
             triage_success = self.run_agent(email, "triage")
@@ -828,31 +736,27 @@ class Orchestrator:
             if triage_success:
                 agents_to_run = self.get_agents_to_run(email)
                 if agents_to_run:
-                    print(f"[orchestrate] Reopening claim - running agents: {agents_to_run}")
+                    logger.info(f"Reopening claim - running agents: {agents_to_run}")
                     # Transition back to agents running
                     self.transition_claim_stage(email, ClaimStage.AGENTS_RUNNING)
                     
-                    # Run each agent
-                    for agent in agents_to_run:
-                        print(f"[orchestrate] Running agent: {agent}")
-                        success = self.run_agent(email, agent)
-                        if not success:
-                            print(f"[orchestrate] Warning: Agent {agent} failed")
+                    # Run agents concurrently
+                    self.run_agents(email, agents_to_run)
                     
                     # Run follow-up after agents have run
-                    print("[orchestrate] Running follow-up agent for reopened claim...")
+                    logger.debug("Running follow-up agent for reopened claim...")
                     follow_up_result = run_follow_up_agent(email)
                     if follow_up_result:
                         self.transition_claim_stage(email, ClaimStage.FOLLOWUP_REQUESTED)
                 else:
-                    print("[orchestrate] No new incidents - claim remains complete")
+                    logger.info("No new incidents - claim remains complete")
 
         else:
-            print(f"[orchestrate] Unknown stage: {stage}")
+            logger.warning(f"Unknown stage: {stage}")
             # Reset to NEW stage if unknown
             self.transition_claim_stage(email, ClaimStage.NEW)
 
-        print(f"[orchestrate] Orchestration complete for {email}")
+        logger.info(f"Orchestration complete for {email}")
 
 
 orchestrator = Orchestrator()
@@ -0,0 +1,84 @@
+import io
+import os
+import logging
+from typing import List, Optional
+
+from PIL import Image
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from content_cache import ContentCache, file_digest
+
+logger = logging.getLogger(__name__)
+
+VISION_DPI = int(os.getenv("VISION_DPI", 200))
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", 75))
+RENDER_TIMEOUT = int(os.getenv("OCR_TOOL_TIMEOUT", 120))
+RENDER_WINDOW = int(os.getenv("OCR_PAGE_WINDOW", 1))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Vision-ready JPEGs of PDF pages, keyed by document content hash and page number
+page_cache = ContentCache("pages", PAGE_CACHE_MAX_BYTES)
+
+
+def pdf_page_count(file_path: str) -> int:
+    return int(pdfinfo_from_path(file_path)["Pages"])
+
+
+def render_pages(file_path: str, first: int, last: int, dpi: int) -> List[Image.Image]:
+    """Rasterize pages first..last (1-based, inclusive) in memory."""
+    return convert_from_path(file_path, dpi=dpi, first_page=first, last_page=last, timeout=RENDER_TIMEOUT)
+
+
+def page_key(digest: str, page: int) -> str:
+    return page_cache.key(digest, page=page, dpi=VISION_DPI, format="jpeg", quality=VISION_JPEG_QUALITY)
+
+
+def encode_jpeg(img: Image.Image, quality: int = VISION_JPEG_QUALITY) -> bytes:
+    buffer = io.BytesIO()
+    img.convert("RGB").save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def vision_jpeg(page: Image.Image, dpi: int) -> bytes:
+    """JPEG of a page rendered at `dpi`, scaled to VISION_DPI."""
+    if dpi != VISION_DPI:
+        scale = VISION_DPI / dpi
+        page = page.resize((round(page.width * scale), round(page.height * scale)), Image.LANCZOS)
+    return encode_jpeg(page)
+
+
+def store_vision_pages(digest: str, first: int, pages: List[Image.Image], dpi: int):
+    """Derive and cache vision JPEGs from pages already rendered for another consumer (OCR)."""
+    for number, page in enumerate(pages, first):
+        key = page_key(digest, number)
+        if not os.path.exists(page_cache._path(key, ".bin")):
+            page_cache.put_bytes(key, vision_jpeg(page, dpi))
+
+
+def vision_pages(file_path: str, digest: Optional[str] = None, first: int = 1,
+                 last: Optional[int] = None) -> List[bytes]:
+    """
+    Vision JPEGs for pages first..last (default: every page) of a PDF. Pages the OCR
+    pass already rendered come from the cache; missing ones are rendered at VISION_DPI
+    and cached.
+    """
+    digest = digest or file_digest(file_path)
+    last = last or pdf_page_count(file_path)
+    jpegs: List[Optional[bytes]] = [page_cache.get_bytes(page_key(digest, n)) for n in range(first, last + 1)]
+    missing = [n for n, jpeg in enumerate(jpegs, first) if jpeg is None]
+    if missing:
+        logger.info(f"Rendering {len(missing)} of pages {first}-{last} of {file_path} for vision input")
+    for number in missing:
+        if jpegs[number - first] is not None:
+            continue  # rendered as part of an earlier window
+        window_last = min(number + RENDER_WINDOW - 1, last)
+        pages = render_pages(file_path, number, window_last, VISION_DPI)
+        try:
+            for offset, page in enumerate(pages):
+                jpeg = encode_jpeg(page)
+                page_cache.put_bytes(page_key(digest, number + offset), jpeg)
+                jpegs[number + offset - first] = jpeg
+        finally:
+            for page in pages:
+                page.close()
+    return jpegs
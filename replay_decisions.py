@@ -0,0 +1,255 @@
+"""
+Re-score the decisions stored for every claim with the current decision engines.
+
+    python replay_decisions.py --sessions sessions --report replay_report.jsonl
+    python replay_decisions.py --store sqlite --db claims.db --workers 16
+    python replay_decisions.py --agent fire_assistant --decisions-only
+
+Every recorded decision is re-evaluated with decision_engines.DECISION_ENGINE from
+the tool-call arguments saved with it. Older entries were saved without
+arguments; for those the agent's latest structured data entry (`<agent>_data`)
+at or before the decision stands in as the payload. Each changed decision is
+written to the report as one JSON line and a summary is printed.
+
+Claims are read from the store CLAIM_STORE selects (or --store): the
+sessions/thread_* folders, or the SQLite database. Nothing is modified.
+Claims are split into chunks and replayed in a process pool; within a chunk
+the payloads for each engine are scored together with
+decision_batch.evaluate_batch.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import functools
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from claim_store import DECISIONS_LOG, AGENT_DATA_LOG, CLAIM_STORE, CLAIM_DB_PATH, SQLiteClaimStore
+from decision_batch import evaluate_batch, resolve_engine
+from history_log import read_history
+from utils import SESSIONS_DIR
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+REPLAY_CHUNK_SIZE = int(os.getenv("REPLAY_CHUNK_SIZE", 200))
+
+
+def session_folders(sessions_dir: str) -> Iterator[str]:
+    """thread_* folders under `sessions_dir`, in name order."""
+    with os.scandir(sessions_dir) as entries:
+        names = sorted(e.name for e in entries if e.name.startswith("thread_") and e.is_dir())
+    for name in names:
+        yield os.path.join(sessions_dir, name)
+
+
+def _chunks(folders: Iterator[str], size: int) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    for folder in folders:
+        chunk.append(folder)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _recorded(entry: Dict) -> Tuple[Optional[str], Optional[str]]:
+    decision = entry.get("decision")
+    if isinstance(decision, dict):
+        return decision.get("decision"), decision.get("reason")
+    return decision, None
+
+
+def _payload_from_data(data_entries: List[Dict], timestamp: Optional[float]) -> Optional[Dict]:
+    """The agent's last structured data entry written at or before `timestamp`."""
+    payload = None
+    for entry in data_entries:
+        if timestamp is not None and (entry.get("timestamp") or 0) > timestamp:
+            break
+        if isinstance(entry.get("data"), dict):
+            payload = entry["data"]
+    return payload
+
+
+def _calls(thread_id: str, decisions: List[Dict], agent_data: Callable[[str], List[Dict]],
+           agents: Optional[Sequence[str]]) -> List[Dict]:
+    """The decisions of one claim, each with the payload to replay (or None)."""
+    data_by_agent: Dict[str, List[Dict]] = {}
+    calls = []
+    for index, entry in enumerate(decisions):
+        agent = entry.get("agent")
+        if agents and agent not in agents:
+            continue
+        payload, source = entry.get("arguments"), "arguments"
+        if not isinstance(payload, dict):
+            if agent not in data_by_agent:
+                data_by_agent[agent] = agent_data(agent)
+            payload, source = _payload_from_data(data_by_agent[agent], entry.get("timestamp")), "agent_data"
+        decision, reason = _recorded(entry)
+        calls.append({
+            "thread_id": thread_id, "index": index, "agent": agent, "timestamp": entry.get("timestamp"),
+            "source": source if payload is not None else None, "payload": payload,
+            "decision": decision, "reason": reason,
+        })
+    return calls
+
+
+def extract_calls(folder: str, agents: Optional[Sequence[str]] = None) -> List[Dict]:
+    """The decisions recorded in one session folder, read without repairing anything on disk."""
+    return _calls(
+        os.path.basename(folder)[len("thread_"):],
+        read_history(os.path.join(folder, DECISIONS_LOG)),
+        lambda agent: read_history(os.path.join(folder, AGENT_DATA_LOG.format(agent=agent))),
+        agents,
+    )
+
+
+def extract_thread_calls(store: SQLiteClaimStore, thread_id: str,
+                         agents: Optional[Sequence[str]] = None) -> List[Dict]:
+    """The decisions recorded for one claim in the SQLite store."""
+    return _calls(thread_id, store.list_decisions_by_thread(thread_id),
+                  lambda agent: store.list_agent_data_by_thread(thread_id, agent), agents)
+
+
+_worker_stores: Dict[str, SQLiteClaimStore] = {}
+
+
+def _worker_store(db_path: str) -> SQLiteClaimStore:
+    """One store per worker process, so no SQLite connection crosses a fork."""
+    store = _worker_stores.get(db_path)
+    if store is None:
+        store = _worker_stores[db_path] = SQLiteClaimStore(db_path)
+    return store
+
+
+def replay_chunk(claims: List[str], db_path: Optional[str] = None, agents: Optional[Sequence[str]] = None,
+                 decisions_only: bool = False) -> Tuple[List[Dict], Counter]:
+    """
+    Replay the decisions of a chunk of claims: session folders, or thread ids in the
+    SQLite database at `db_path`. Returns the changed decisions and counters.
+    """
+    stats: Counter = Counter()
+    by_agent: Dict[str, List[Dict]] = defaultdict(list)
+    for claim in claims:
+        stats["sessions"] += 1
+        try:
+            if db_path:
+                calls = extract_thread_calls(_worker_store(db_path), claim, agents)
+            else:
+                calls = extract_calls(claim, agents)
+        except Exception as e:
+            logger.warning(f"Could not read {claim}: {e}")
+            stats["unreadable_sessions"] += 1
+            continue
+        for call in calls:
+            stats["decisions"] += 1
+            if call["payload"] is None:
+                stats["no_payload"] += 1
+            else:
+                by_agent[call["agent"]].append(call)
+
+    changes = []
+    for agent, calls in by_agent.items():
+        try:
+            engine = resolve_engine(agent)
+        except ValueError:
+            stats["no_engine"] += len(calls)
+            continue
+        result = evaluate_batch(engine, [call["payload"] for call in calls], reasons=not decisions_only)
+        for row, call in enumerate(calls):
+            stats["replayed"] += 1
+            stats[f"from_{call['source']}"] += 1
+            if row in result.errors:
+                stats["errors"] += 1
+                change = "error"
+            elif result.decisions[row] != call["decision"]:
+                stats["decision_changed"] += 1
+                change = "decision"
+            elif not decisions_only and result.reasons[row] != call["reason"]:
+                stats["reason_changed"] += 1
+                change = "reason"
+            else:
+                stats["unchanged"] += 1
+                continue
+            changes.append({
+                "thread_id": call["thread_id"], "index": call["index"], "agent": agent,
+                "timestamp": call["timestamp"], "source": call["source"], "change": change,
+                "recorded": {"decision": call["decision"], "reason": call["reason"]},
+                "replayed": ({"error": result.errors[row]} if change == "error" else
+                             {"decision": result.decisions[row],
+                              "reason": None if decisions_only else result.reasons[row]}),
+            })
+    return changes, stats
+
+
+def replay_sessions(sessions_dir: str, report_path: str, workers: Optional[int] = None,
+                    agents: Optional[Sequence[str]] = None, decisions_only: bool = False,
+                    chunk_size: int = REPLAY_CHUNK_SIZE, db_path: Optional[str] = None) -> Dict:
+    """
+    Replay every claim, writing changed decisions to `report_path`. Claims are the
+    session folders under `sessions_dir`, or those in the SQLite database at `db_path`.
+    """
+    started = time.perf_counter()
+    totals: Counter = Counter()
+    transitions: Counter = Counter()
+    replay = functools.partial(replay_chunk, db_path=db_path, agents=agents, decisions_only=decisions_only)
+    claims = SQLiteClaimStore(db_path).threads_with_decisions() if db_path else session_folders(sessions_dir)
+    chunks = _chunks(iter(claims), chunk_size)
+    with open(report_path, "w", encoding="utf-8") as report, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        # Workers return only changed decisions and counters, so little crosses the process boundary
+        for done, (changes, stats) in enumerate(pool.map(replay, chunks), 1):
+            totals.update(stats)
+            for change in changes:
+                report.write(json.dumps(change, ensure_ascii=False) + "\n")
+                if change["change"] == "decision":
+                    transitions[(change["agent"], change["recorded"]["decision"],
+                                 change["replayed"]["decision"])] += 1
+            if done % 50 == 0:
+                logger.info(f"Replayed {totals['sessions']} sessions")
+    summary = {
+        "sessions": totals["sessions"],
+        "seconds": round(time.perf_counter() - started, 1),
+        "counts": dict(sorted(totals.items())),
+        "decision_changes": [
+            {"agent": agent, "from": old, "to": new, "count": count}
+            for (agent, old, new), count in transitions.most_common()
+        ],
+        "report": report_path,
+    }
+    logger.info(f"Replay complete: {totals['decision_changed']} decisions changed, "
+                f"{totals['reason_changed']} reasons changed, {totals['errors']} errors "
+                f"across {totals['sessions']} sessions")
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-run the decision engines over stored claim decisions")
+    parser.add_argument('--store', choices=("files", "sqlite"), default=CLAIM_STORE,
+                        help="where claims are stored (default: CLAIM_STORE)")
+    parser.add_argument('--sessions', default=SESSIONS_DIR, help="sessions directory to replay (files store)")
+    parser.add_argument('--db', default=CLAIM_DB_PATH, help="SQLite database path (sqlite store)")
+    parser.add_argument('--report', default="replay_report.jsonl", help="JSONL file for changed decisions")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    parser.add_argument('--agent', action='append', help="only replay this assistant's decisions (repeatable)")
+    parser.add_argument('--decisions-only', action='store_true', help="ignore changes that only alter the reason")
+    parser.add_argument('--chunk-size', type=int, default=REPLAY_CHUNK_SIZE, help="claims per task")
+    args = parser.parse_args()
+
+    if args.store == "sqlite":
+        if not os.path.isfile(args.db):
+            sys.exit(f"No claim database at {args.db}")
+    elif args.store == "files":
+        if not os.path.isdir(args.sessions):
+            sys.exit(f"No sessions directory at {args.sessions}")
+    else:
+        sys.exit(f"Unknown claim store: {args.store}")
+    summary = replay_sessions(args.sessions, args.report, workers=args.workers, agents=args.agent,
+                              decisions_only=args.decisions_only, chunk_size=args.chunk_size,
+                              db_path=args.db if args.store == "sqlite" else None)
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,179 @@
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RUN_USE_STREAMING = os.getenv("RUN_USE_STREAMING", "true").lower() == "true"
+RUN_POLL_INITIAL = float(os.getenv("RUN_POLL_INITIAL", 0.2))
+RUN_POLL_MAX = float(os.getenv("RUN_POLL_MAX", 2.0))
+RUN_POLL_FACTOR = 1.5
+RUN_DEADLINE = float(os.getenv("RUN_DEADLINE", 600))
+
+# Statuses in which a run is still progressing server-side
+PENDING_STATUSES = ("queued", "in_progress", "cancelling")
+
+# Returns tool outputs for a run in `requires_action`, or None to cancel the run
+ToolHandler = Callable[[Any], Optional[List[dict]]]
+
+
+@dataclass
+class RunTiming:
+    first_event: Optional[float] = None  # seconds until the first stream event / status change
+    total: float = 0.0                   # seconds until the run reached a final state
+    polls: int = 0                       # runs.retrieve calls made
+    tool_rounds: int = 0                 # submit_tool_outputs round trips
+    streamed: bool = False
+    timed_out: bool = False
+
+    def first_event_text(self) -> str:
+        """`first_event` for log lines ("n/a" when the run never changed state)."""
+        return "n/a" if self.first_event is None else f"{self.first_event:.3f}s"
+
+
+class RunWaiter:
+    """
+    Drives an Assistants API run to completion.
+
+    Uses streamed run events when available so the caller wakes as soon as the run
+    finishes or needs tool outputs. Falls back to polling `runs.retrieve` with
+    exponential backoff (RUN_POLL_INITIAL up to RUN_POLL_MAX). Either way a run
+    still going after the deadline is cancelled.
+    """
+
+    def __init__(self, client, stream: bool = RUN_USE_STREAMING, poll_initial: float = RUN_POLL_INITIAL,
+                 poll_max: float = RUN_POLL_MAX, deadline: float = RUN_DEADLINE):
+        self.client = client
+        self.stream = stream
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.deadline = deadline
+
+    def run(self, thread_id: str, assistant_id: str,
+            tool_handler: Optional[ToolHandler] = None) -> Tuple[Any, RunTiming]:
+        """
+        Start a run on `thread_id` and wait for it to finish.
+
+        While the run is in `requires_action`, `tool_handler` is called and its outputs
+        submitted. Without a handler the run is returned in `requires_action`.
+        Returns the final run object and its timings.
+        """
+        timing = RunTiming()
+        started = time.monotonic()
+        deadline = started + self.deadline
+
+        run = None
+        if self.stream:
+            try:
+                run = self._stream(
+                    lambda: self.client.beta.threads.runs.stream(thread_id=thread_id, assistant_id=assistant_id),
+                    thread_id, None, timing, started, deadline
+                )
+                timing.streamed = True
+            except AttributeError as e:
+                # Client library predates run streaming; poll from now on
+                logger.warning(f"Run streaming unavailable, falling back to polling: {e}")
+                self.stream = False
+        if run is None:
+            run = self.client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id)
+            run = self._poll(thread_id, run, timing, started, deadline)
+
+        while run.status == "requires_action" and tool_handler and not timing.timed_out:
+            tool_outputs = tool_handler(run)
+            if tool_outputs is None:
+                self.client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+                break
+            timing.tool_rounds += 1
+            if timing.streamed:
+                run = self._stream(
+                    lambda: self.client.beta.threads.runs.submit_tool_outputs_stream(
+                        thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs
+                    ),
+                    thread_id, run, timing, started, deadline
+                )
+            else:
+                run = self.client.beta.threads.runs.submit_tool_outputs(
+                    thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs
+                )
+                run = self._poll(thread_id, run, timing, started, deadline)
+
+        timing.total = time.monotonic() - started
+        logger.info(
+            f"Run {run.id} finished with status {run.status} in {timing.total:.2f}s "
+            f"(first event {timing.first_event_text()}, {timing.polls} polls, {timing.tool_rounds} tool rounds, "
+            f"streamed={timing.streamed})"
+        )
+        return run, timing
+
+    def _stream(self, open_stream, thread_id: str, run, timing: RunTiming, started: float, deadline: float):
+        """
+        Consume a run event stream until it ends and return the run it left behind.
+
+        Events are read on a helper thread so a stream that stops sending them cannot
+        hold the caller past the deadline; the run is then cancelled, which ends the
+        stream server-side and lets the reader finish.
+        """
+        seen = {"run": run}
+        stop = threading.Event()
+
+        def consume():
+            try:
+                with open_stream() as stream:
+                    for event in stream:
+                        if timing.first_event is None:
+                            timing.first_event = time.monotonic() - started
+                        if getattr(event.data, "object", None) == "thread.run":
+                            seen["run"] = event.data
+                        if stop.is_set():
+                            return
+                    seen["final"] = stream.get_final_run()
+            except BaseException as e:
+                seen["error"] = e
+
+        reader = threading.Thread(target=consume, name="run-stream", daemon=True)
+        reader.start()
+        reader.join(max(0.0, deadline - time.monotonic()))
+        if reader.is_alive():
+            stop.set()
+            return self._cancel(thread_id, seen["run"], timing)
+        if "error" in seen:
+            raise seen["error"]
+        return seen["final"]
+
+    def _poll(self, thread_id: str, run, timing: RunTiming, started: float, deadline: float):
+        """Poll a run with exponential backoff until it leaves the pending statuses or the deadline passes."""
+        delay = self.poll_initial
+        initial_status = run.status
+        while run.status in PENDING_STATUSES:
+            now = time.monotonic()
+            if now >= deadline:
+                return self._cancel(thread_id, run, timing)
+            time.sleep(min(delay, deadline - now))
+            delay = min(delay * RUN_POLL_FACTOR, self.poll_max)
+            run = self.client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+            timing.polls += 1
+            if timing.first_event is None and run.status != initial_status:
+                timing.first_event = time.monotonic() - started
+        return run
+
+    def _cancel(self, thread_id: str, run, timing: RunTiming):
+        """Cancel a run that outlived the deadline; returns the run as last seen."""
+        timing.timed_out = True
+        if run is None:
+            # The stream stalled before announcing the run: it is the thread's newest one
+            try:
+                runs = self.client.beta.threads.runs.list(thread_id=thread_id, order="desc", limit=1)
+                run = runs.data[0] if runs.data else None
+            except Exception as e:
+                logger.warning(f"Failed to look up the run on thread {thread_id}: {e}")
+            if run is None:
+                raise TimeoutError(f"Run on thread {thread_id} exceeded {self.deadline}s deadline")
+        logger.error(f"Run {run.id} exceeded {self.deadline}s deadline, cancelling")
+        try:
+            run = self.client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+        except Exception as e:
+            logger.warning(f"Failed to cancel run {run.id}: {e}")
+        return run
@@ -0,0 +1,155 @@
+import os
+import copy
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def write_json_atomic(path: str, data: Any):
+    """Write JSON to a sibling temp file and swap it in, so readers never see a partial file."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def read_json(path: str) -> Any:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class SessionCache:
+    """Cached JSON documents of one session folder for the duration of a turn."""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.depth = 0
+        self.lock = threading.RLock()
+        self.docs: Dict[str, Any] = {}
+        self.dirty: Set[str] = set()
+        self.deleted: Set[str] = set()
+        self.reads = 0
+        self.writes = 0
+
+    def load(self, path: str) -> Any:
+        with self.lock:
+            if path in self.deleted:
+                raise FileNotFoundError(path)
+            if path not in self.docs:
+                self.docs[path] = read_json(path)
+                self.reads += 1
+            # Hand out copies so callers mutating a result cannot change the cached document
+            return copy.deepcopy(self.docs[path])
+
+    def save(self, path: str, data: Any):
+        with self.lock:
+            self.docs[path] = copy.deepcopy(data)
+            self.dirty.add(path)
+            self.deleted.discard(path)
+
+    def exists(self, path: str) -> bool:
+        with self.lock:
+            if path in self.docs:
+                return True
+            return path not in self.deleted and os.path.exists(path)
+
+    def remove(self, path: str):
+        with self.lock:
+            self.docs.pop(path, None)
+            self.dirty.discard(path)
+            self.deleted.add(path)
+
+    def flush(self):
+        """Write every dirty document once and apply pending deletes."""
+        with self.lock:
+            for path in sorted(self.dirty):
+                write_json_atomic(path, self.docs[path])
+                self.writes += 1
+            for path in self.deleted:
+                if os.path.exists(path):
+                    os.remove(path)
+            logger.debug(
+                f"Flushed session {self.folder}: {len(self.dirty)} written, {len(self.deleted)} removed, "
+                f"{self.reads} read from disk"
+            )
+            self.dirty.clear()
+            self.deleted.clear()
+
+
+class SessionStore:
+    """
+    Write-behind cache for the JSON documents in sessions/thread_* folders.
+
+    Inside `turn(folder)` every load/save of a document directly in that folder is
+    served from memory; dirty documents are written once, atomically, when the
+    outermost turn for the folder ends. Outside a turn reads and writes go straight
+    to disk. Threads working on the same session (e.g. concurrent agents) share
+    the turn's cache.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, SessionCache] = {}
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def turn(self, folder: str):
+        key = os.path.normpath(folder)
+        with self._guard:
+            cache = self._sessions.get(key)
+            if cache is None:
+                cache = self._sessions[key] = SessionCache(key)
+            cache.depth += 1
+        try:
+            yield cache
+        finally:
+            with self._guard:
+                cache.depth -= 1
+                last = cache.depth == 0
+            if last:
+                try:
+                    cache.flush()
+                finally:
+                    with self._guard:
+                        # A new turn may have joined while flushing; it keeps the cache alive
+                        if cache.depth == 0 and self._sessions.get(key) is cache:
+                            del self._sessions[key]
+
+    def _cache_for(self, path: str) -> Optional[SessionCache]:
+        if not self._sessions:
+            return None
+        with self._guard:
+            return self._sessions.get(os.path.dirname(os.path.normpath(path)))
+
+    def load(self, path: str) -> Any:
+        cache = self._cache_for(path)
+        if cache is None:
+            return read_json(path)
+        return cache.load(os.path.normpath(path))
+
+    def save(self, path: str, data: Any):
+        cache = self._cache_for(path)
+        if cache is None:
+            write_json_atomic(path, data)
+        else:
+            cache.save(os.path.normpath(path), data)
+
+    def exists(self, path: str) -> bool:
+        cache = self._cache_for(path)
+        if cache is None:
+            return os.path.exists(path)
+        return cache.exists(os.path.normpath(path))
+
+    def remove(self, path: str):
+        cache = self._cache_for(path)
+        if cache is None:
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            cache.remove(os.path.normpath(path))
+
+
+session_store = SessionStore()
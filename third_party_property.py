@@ -1,62 +1,39 @@
-import datetime
+from decision_rules import (
+    DecisionEngine, Rule, approved, pending, rejected,
+    valid_date, valid_time, present, truthy, is_true, is_none, at_most, nonblank,
+)
 
-def evaluate_third_party_property_damage_claim(claim):
-    decision_flags = {"approved": False, "rejected": False, "pending": False}
-    reasons = []
-
-    def flag(decision_type, reason):
-        decision_flags[decision_type] = True
-        reasons.append(f"{decision_type.upper()}: {reason}")
+PROPERTY_DAMAGE_LIMIT = 20_000_000
 
+THIRD_PARTY_PROPERTY_RULES = [
     # --- Incident Date & Time ---
-    try:
-        datetime.datetime.strptime(claim["incident_date"], "%Y-%m-%d")
-        flag("approved", "Incident date is valid.")
-    except:
-        flag("pending", "Invalid or missing incident date.")
-
-    if "incident_time" in claim:
-        if isinstance(claim["incident_time"], str) and ":" in claim["incident_time"]:
-            flag("approved", "Incident time format appears valid.")
-        else:
-            flag("pending", "Incident time format is invalid.")
+    Rule(valid_date("incident_date"),
+         approved("Incident date is valid."),
+         pending("Invalid or missing incident date.")),
+    Rule(present("incident_time"),
+         Rule(valid_time("incident_time"),
+              approved("Incident time format appears valid."),
+              pending("Incident time format is invalid."))),
 
     # --- Property Damage Evaluation ---
-    if claim.get("did_property_damage_occur"):
-        flag("approved", "Third-party property damage occurred — covered under liability to others.")
-        
-        value = claim.get("estimated_property_damage_value", None)
-        if value is not None:
-            if value <= 20_000_000:
-                flag("approved", f"Estimated damage (£{value}) is within policy limit of £20,000,000.")
-            else:
-                flag("pending", f"Damage value (£{value}) may exceed policy limit — legal review required.")
-        else:
-            flag("pending", "Estimated property damage value not provided.")
-
-        description = claim.get("third_party_property_description", "").strip()
-        if description:
-            flag("approved", f"Property description provided: {description}.")
-        else:
-            flag("pending", "Property damage occurred but description is missing.")
-
-        if claim.get("was_liability_limit_exceeded") is True:
-            flag("pending", "Reported that liability limit was exceeded — subject to legal review.")
-    else:
-        flag("rejected", "No third-party property damage reported — claim not valid under this section.")
-
-    # --- Final Decision Logic ---
-    if decision_flags["rejected"]:
-        final_decision = "rejected"
-    elif decision_flags["pending"]:
-        final_decision = "pending"
-    elif decision_flags["approved"]:
-        final_decision = "approved"
-    else:
-        final_decision = "pending"
-        reasons.append("PENDING: No coverage path matched or claim missing required details.")
-
-    return {
-        "decision": final_decision,
-        "reason": " | ".join(reasons)
-    }
+    Rule(truthy("did_property_damage_occur"),
+         [
+             approved("Third-party property damage occurred — covered under liability to others."),
+             Rule(~is_none("estimated_property_damage_value"),
+                  Rule(at_most("estimated_property_damage_value", PROPERTY_DAMAGE_LIMIT),
+                       approved("Estimated damage (£{estimated_property_damage_value}) is within policy limit of £20,000,000."),
+                       pending("Damage value (£{estimated_property_damage_value}) may exceed policy limit — legal review required.")),
+                  pending("Estimated property damage value not provided.")),
+             Rule(nonblank("third_party_property_description", default=""),
+                  approved("Property description provided: {third_party_property_description!t}."),
+                  pending("Property damage occurred but description is missing.")),
+             Rule(is_true("was_liability_limit_exceeded"),
+                  pending("Reported that liability limit was exceeded — subject to legal review.")),
+         ],
+         rejected("No third-party property damage reported — claim not valid under this section.")),
+]
+
+evaluate_third_party_property_damage_claim = DecisionEngine(
+    "evaluate_third_party_property_damage_claim", THIRD_PARTY_PROPERTY_RULES,
+    fallback="PENDING: No coverage path matched or claim missing required details.",
+)
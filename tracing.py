@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+import functools
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from openai_client import load_env
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+TRACE_EXPORTERS = ("none", "jsonl", "otlp")
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+if TRACE_EXPORTER not in TRACE_EXPORTERS:
+    # Checked once here: span() ends spans in its finally, so raising later would break every traced call
+    logger.error(f"Unknown TRACE_EXPORTER {TRACE_EXPORTER!r} (expected one of {', '.join(TRACE_EXPORTERS)}); "
+                 f"spans will not be exported")
+    TRACE_EXPORTER = "none"
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "claims-pipeline")
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", 256))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", 2.0))
+
+
+class Span:
+    """
+    One timed operation in a trace. Spans are cheap to create; they are only
+    serialised when an exporter is configured.
+    """
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 start_ns: Optional[int] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None, end_ns: Optional[int] = None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        logger.debug(f"span {self.name} {self.duration * 1000:.1f}ms trace={self.trace_id}")
+        exporter = get_exporter()
+        if exporter is not None:
+            exporter.export(self)
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def context(self) -> Dict[str, str]:
+        """Serialisable reference for continuing the trace elsewhere (e.g. a queued email)."""
+        return {"trace_id": self.trace_id, "span_id": self.span_id}
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "start_ns": self.start_ns, "end_ns": self.end_ns,
+            "duration_ms": round(self.duration * 1000, 3), "attributes": self.attributes, "error": self.error,
+        }
+
+
+class _RemoteParent:
+    """Stand-in parent for a trace continued from a serialised context."""
+
+    __slots__ = ("trace_id", "span_id")
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span():
+    return _current.get()
+
+
+def current_context() -> Optional[Dict[str, str]]:
+    span = _current.get()
+    return {"trace_id": span.trace_id, "span_id": span.span_id} if span is not None else None
+
+
+def start_span(name: str, parent=None, new_trace: bool = False, start_ns: Optional[int] = None,
+               **attributes) -> Span:
+    """
+    Start a span without making it current; the caller ends it. Its parent is
+    `parent`, else the current span; with neither (or `new_trace`) it starts a trace.
+    """
+    parent = None if new_trace else (parent if parent is not None else _current.get())
+    if parent is None:
+        return Span(name, os.urandom(16).hex(), None, start_ns, attributes)
+    return Span(name, parent.trace_id, parent.span_id, start_ns, attributes)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the enclosed block as a child of the current span (or as a new trace)."""
+    current = start_span(name, **attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=e)
+        raise
+    finally:
+        _current.reset(token)
+        current.end()
+
+
+@contextmanager
+def use(parent):
+    """
+    Make `parent` current for the enclosed block without ending it: a Span, or a
+    context dict from Span.context() / current_context(). None leaves things as they are.
+    """
+    if isinstance(parent, dict):
+        parent = _RemoteParent(parent["trace_id"], parent["span_id"])
+    if parent is None:
+        yield None
+        return
+    token = _current.set(parent)
+    try:
+        yield parent
+    finally:
+        _current.reset(token)
+
+
+def record_span(name: str, start_ns: int, end_ns: int, parent=None, **attributes) -> Span:
+    """Record an operation that has already finished, e.g. one timed before its trace existed."""
+    finished = start_span(name, parent=parent, start_ns=start_ns, **attributes)
+    finished.end(end_ns=end_ns)
+    return finished
+
+
+def traced(name: str):
+    """Decorator form of span(name)."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def wrap(fn: Callable) -> Callable:
+    """Bind `fn` to the caller's trace context, for handing work to a thread pool."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+# -- exporters -------------------------------------------------------------------
+
+class JSONLExporter:
+    """Appends one JSON object per finished span to a local file."""
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def export(self, finished: Span):
+        line = json.dumps(finished.to_dict(), default=str)
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def shutdown(self):
+        with self.lock:
+            self.file.close()
+
+
+class OTLPExporter:
+    """
+    Batches spans and posts them to an OTLP/HTTP collector as JSON
+    (e.g. http://localhost:4318/v1/traces) from a background thread.
+    """
+
+    def __init__(self, endpoint: str = OTLP_ENDPOINT, batch_size: int = TRACE_BATCH_SIZE,
+                 interval: float = TRACE_EXPORT_INTERVAL):
+        self.endpoint = endpoint
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=batch_size * 16)
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self.thread.start()
+
+    def export(self, finished: Span):
+        try:
+            self.queue.put_nowait(finished)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch: List[Span] = []
+            deadline = time.monotonic() + self.interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                self._post(batch)
+            if stopping:
+                return
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": value if isinstance(value, str) else json.dumps(value)}}
+
+    def payload(self, batch: List[Span]) -> Dict:
+        spans = []
+        for item in batch:
+            otlp = {
+                "traceId": item.trace_id, "spanId": item.span_id, "name": item.name, "kind": 1,
+                "startTimeUnixNano": str(item.start_ns), "endTimeUnixNano": str(item.end_ns),
+                "attributes": [self._attribute(key, value) for key, value in item.attributes.items()],
+                "status": {"code": 2, "message": item.error} if item.error else {"code": 1},
+            }
+            if item.parent_id:
+                otlp["parentSpanId"] = item.parent_id
+            spans.append(otlp)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [self._attribute("service.name", TRACE_SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+        }]}
+
+    def _post(self, batch: List[Span]):
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(self.payload(batch)).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                response.read()
+        except Exception as e:
+            logger.warning(f"Could not export {len(batch)} spans to {self.endpoint}: {e}")
+
+    def shutdown(self):
+        self.queue.put(None)
+        self.thread.join(timeout=10)
+        if self.dropped:
+            logger.warning(f"Dropped {self.dropped} spans while the export queue was full")
+
+
+_exporter = None
+_exporter_ready = False
+_exporter_lock = threading.Lock()
+
+
+def get_exporter():
+    """Exporter selected by TRACE_EXPORTER, created on first use; None when tracing is not exported."""
+    global _exporter, _exporter_ready
+    if _exporter_ready:
+        return _exporter
+    with _exporter_lock:
+        if not _exporter_ready:
+            try:
+                if TRACE_EXPORTER == "jsonl":
+                    _exporter = JSONLExporter(TRACE_FILE)
+                elif TRACE_EXPORTER == "otlp":
+                    _exporter = OTLPExporter(OTLP_ENDPOINT)
+            except Exception as e:
+                logger.error(f"Could not start the {TRACE_EXPORTER} trace exporter, spans will not be exported: {e}")
+                _exporter = None
+            if _exporter is not None:
+                atexit.register(_exporter.shutdown)
+                logger.info(f"Exporting trace spans with {type(_exporter).__name__}")
+            _exporter_ready = True
+    return _exporter
@@ -0,0 +1,131 @@
+import os
+import json
+import logging
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+UID_LEDGER_FILE = os.getenv("UID_LEDGER_FILE", "processed_uids.log")
+UID_LEDGER_FSYNC = os.getenv("UID_LEDGER_FSYNC", "true").lower() == "true"
+UID_LEDGER_RETAIN = int(os.getenv("UID_LEDGER_RETAIN", 100000))   # newest UIDs kept per mailbox on compaction
+UID_LEDGER_COMPACT_SLACK = 10000                                   # dead lines tolerated before compacting
+
+Key = Tuple[str, str]  # (mailbox, uidvalidity)
+
+
+class UIDLedger:
+    """
+    Append-only record of processed message UIDs.
+
+    Each line is `mailbox<TAB>uidvalidity<TAB>uid`. A UID is only meaningful for the
+    UIDVALIDITY it was seen under, so when a mailbox's UIDVALIDITY changes the old
+    entries become dead and are dropped at the next compaction. Lookups are served
+    from an in-memory set; the file is only read once at startup.
+    """
+
+    def __init__(self, path: str = UID_LEDGER_FILE, legacy_path: Optional[str] = None):
+        self.path = path
+        self.lock = threading.Lock()
+        self._uids: Dict[Key, Set[str]] = {}
+        self._current: Dict[str, str] = {}  # mailbox -> latest UIDVALIDITY
+        self._lines = 0
+        self._legacy: Set[str] = set()
+        self._load()
+        if legacy_path and os.path.exists(legacy_path) and not self._lines:
+            with open(legacy_path, "r") as f:
+                self._legacy = {str(uid) for uid in json.load(f)}
+            logger.info(f"Loaded {len(self._legacy)} legacy UIDs from {legacy_path}")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # torn final write
+                parts = raw.decode("utf-8").rstrip("\n").split("\t")
+                valid_bytes += len(raw)
+                if len(parts) != 3:
+                    continue
+                mailbox, uidvalidity, uid = parts
+                self._uids.setdefault((mailbox, uidvalidity), set()).add(uid)
+                self._current[mailbox] = uidvalidity
+                self._lines += 1
+        if valid_bytes != os.path.getsize(self.path):
+            logger.warning(f"Truncating torn record at end of {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_bytes)
+
+    def _append(self, lines: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            if UID_LEDGER_FSYNC:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def set_uidvalidity(self, mailbox: str, uidvalidity: str):
+        """Record the mailbox's UIDVALIDITY for this connection; a change retires older UIDs."""
+        uidvalidity = str(uidvalidity)
+        with self.lock:
+            previous = self._current.get(mailbox)
+            self._current[mailbox] = uidvalidity
+            if self._legacy and previous is None:
+                # processed_emails.json predates per-mailbox tracking; adopt it under the first UIDVALIDITY seen
+                legacy = sorted(self._legacy, key=lambda u: int(u) if u.isdigit() else 0)
+                self._append("".join(f"{mailbox}\t{uidvalidity}\t{uid}\n" for uid in legacy))
+                self._uids.setdefault((mailbox, uidvalidity), set()).update(legacy)
+                self._lines += len(legacy)
+                self._legacy = set()
+            if previous is not None and previous != uidvalidity:
+                logger.warning(f"UIDVALIDITY of {mailbox} changed {previous} -> {uidvalidity}; old UIDs retired")
+                self._compact_locked()
+
+    def contains(self, mailbox: str, uidvalidity: str, uid: str) -> bool:
+        return str(uid) in self._uids.get((mailbox, str(uidvalidity)), ())
+
+    def add(self, mailbox: str, uidvalidity: str, uid: str):
+        key = (mailbox, str(uidvalidity))
+        uid = str(uid)
+        with self.lock:
+            if uid in self._uids.get(key, ()):
+                return
+            self._append(f"{mailbox}\t{key[1]}\t{uid}\n")
+            self._uids.setdefault(key, set()).add(uid)
+            self._current.setdefault(mailbox, key[1])
+            self._lines += 1
+            if self._lines - self._live_count() > UID_LEDGER_COMPACT_SLACK or \
+                    len(self._uids[key]) > UID_LEDGER_RETAIN + UID_LEDGER_COMPACT_SLACK:
+                self._compact_locked()
+
+    def _live_count(self) -> int:
+        return sum(len(self._uids.get((m, v), ())) for m, v in self._current.items())
+
+    def compact(self):
+        with self.lock:
+            self._compact_locked()
+
+    def _compact_locked(self):
+        """Rewrite the ledger with only current-UIDVALIDITY entries, newest UID_LEDGER_RETAIN per mailbox."""
+        live: Dict[Key, Set[str]] = {}
+        for mailbox, uidvalidity in self._current.items():
+            uids = self._uids.get((mailbox, uidvalidity), set())
+            newest = sorted(uids, key=lambda u: int(u) if u.isdigit() else 0)[-UID_LEDGER_RETAIN:]
+            live[(mailbox, uidvalidity)] = set(newest)
+        tmp = f"{self.path}.tmp"
+        count = 0
+        with open(tmp, "w", encoding="utf-8") as f:
+            for (mailbox, uidvalidity), uids in live.items():
+                for uid in sorted(uids, key=lambda u: int(u) if u.isdigit() else 0):
+                    f.write(f"{mailbox}\t{uidvalidity}\t{uid}\n")
+                    count += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        logger.info(f"Compacted UID ledger: {self._lines} -> {count} entries")
+        self._uids = live
+        self._lines = count
+
+    def __len__(self) -> int:
+        return self._live_count() + len(self._legacy)
@@ -1,60 +1,96 @@
 import os
-import json
 import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 from typing import Dict, Any
 
-PROCESSED_FILE = "processed_emails.json" 
+from session_store import session_store
+from history_log import HistoryLog, open_history_log
+
+PROCESSED_FILE = "processed_emails.json"  # legacy; imported into uid_ledger.UIDLedger
 DOCUMENT_EXTS = {".pdf", ".docx", ".jpg", ".png", ".jpeg", ".txt", ".doc", ".tiff", ".tif"}
 SESSIONS_DIR = "sessions"
 MAX_ATTACHMENT_SIZE = 10*1024*1024
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", 1024))
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=SESSION_CACHE_SIZE)
 def generate_thread_id(email: str) -> str:
     thread_id = hashlib.md5(email.lower().encode()).hexdigest()[:12]
-    print(f"[generate_thread_id] Generated thread ID: {thread_id} for email: {email}")
+    logger.debug(f"Generated thread ID: {thread_id} for email: {email}")
     return thread_id
 
+def session_path(email: str) -> str:
+    """Session folder for `email`, without touching the filesystem."""
+    return os.path.join(SESSIONS_DIR, f"thread_{generate_thread_id(email)}")
+
+@lru_cache(maxsize=SESSION_CACHE_SIZE)
 def get_session_folder(email: str) -> str:
-    tid = generate_thread_id(email)
-    folder = os.path.join(SESSIONS_DIR, f"thread_{tid}")
+    """
+    Session folder for `email`, created (with attachments/) on first use.
+
+    Resolved folders are remembered, so the many helper calls made during one
+    turn cost a dict lookup instead of a hash and a makedirs each. Session folders
+    are never removed while the service runs; call get_session_folder.cache_clear()
+    after deleting one by hand.
+    """
+    folder = session_path(email)
     os.makedirs(os.path.join(folder, "attachments"), exist_ok=True)
-    print(f"[get_session_folder] Using session folder: {folder}")
+    logger.debug(f"Using session folder: {folder}")
     return folder
 
+_session_locks: Dict[str, threading.RLock] = {}
+_session_locks_guard = threading.Lock()
+
+def session_lock(email: str) -> threading.RLock:
+    """Per-session lock guarding read-modify-write cycles on the session's JSON files."""
+    key = email.lower()
+    with _session_locks_guard:
+        lock = _session_locks.get(key)
+        if lock is None:
+            lock = _session_locks[key] = threading.RLock()
+        return lock
+
 def get_claim_file(email: str) -> str:
     folder = get_session_folder(email)
     path = os.path.join(folder, "claim.json")
-    if not os.path.exists(path):
+    if not json_exists(path):
         # initialize with empty structure
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump({"stage": "NEW"}, f)
+        save_json(path, {"stage": "NEW"})
     return path
 
+@contextmanager
+def session_turn(email: str):
+    """Serve the session's JSON documents from memory and flush dirty ones once on exit."""
+    with session_store.turn(get_session_folder(email)):
+        yield
+
 def load_json(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return session_store.load(path)
 
 def save_json(path: str, data: Dict[str, Any]):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    # Deferred until the end of the session turn if one is active; always written atomically
+    session_store.save(path, data)
+
+def json_exists(path: str) -> bool:
+    return session_store.exists(path)
+
+def remove_json(path: str):
+    session_store.remove(path)
+
+def get_history_log(email: str, name: str) -> HistoryLog:
+    """Append-only JSONL history `name` (e.g. "decisions", "<agent>_messages") in the session folder."""
+    return open_history_log(os.path.join(get_session_folder(email), name))
 
 def load_claim_state(email: str) -> Dict:
-    with open(get_claim_file(email), "r") as f:
-        return json.load(f)
+    return load_json(get_claim_file(email))
 
 def save_claim_state(email: str, state: Dict):
-    with open(get_claim_file(email), "w") as f:
-        json.dump(state, f, indent=2)
+    save_json(get_claim_file(email), state)
 
 def is_document(att) -> bool:
     ext = os.path.splitext(att.filename or "")[1].lower()
     return ext in DOCUMENT_EXTS
-
-def load_processed() -> set:
-    if os.path.exists(PROCESSED_FILE):
-        return set(json.load(open(PROCESSED_FILE)))
-    return set()
-
-def save_processed(uid: str):
-    s = load_processed()
-    s.add(str(uid))
-    with open(PROCESSED_FILE, "w") as f:
-        json.dump(list(s), f)
\ No newline at end of file
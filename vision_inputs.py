@@ -0,0 +1,125 @@
+import io
+import os
+import base64
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# GPT-4.1 (high detail) fits images within 2048x2048 and then scales the short side to 768,
+# so pixels beyond that are uploaded and paid for but never seen by the model.
+VISION_MAX_LONG_SIDE = int(os.getenv("VISION_MAX_LONG_SIDE", 2048))
+VISION_MAX_SHORT_SIDE = int(os.getenv("VISION_MAX_SHORT_SIDE", 768))
+VISION_PAYLOAD_BUDGET = int(os.getenv("VISION_PAYLOAD_BUDGET", 8 * 1024 * 1024))  # base64 bytes per request
+VISION_JPEG_QUALITY = 85
+VISION_MIN_JPEG_QUALITY = 45
+VISION_MIN_SHORT_SIDE = 384  # budget enforcement never shrinks images below this
+
+
+@dataclass
+class VisionImage:
+    name: str
+    image: Image.Image
+    original_bytes: int
+    data: bytes = b""
+    mime: str = "image/jpeg"
+    quality: int = VISION_JPEG_QUALITY
+
+    @property
+    def payload_bytes(self) -> int:
+        return (len(self.data) + 2) // 3 * 4
+
+    def input_block(self) -> Dict:
+        return {
+            "type": "input_image",
+            "image_url": f"data:{self.mime};base64,{base64.b64encode(self.data).decode('utf-8')}"
+        }
+
+
+def _target_size(width: int, height: int, max_long: int, max_short: int) -> Tuple[int, int]:
+    scale = min(1.0, max_long / max(width, height), max_short / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _decode(data: bytes) -> Image.Image:
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)  # also detaches the pixels from the buffer
+    if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+        return img.convert("RGBA")
+    if img.mode not in ("L", "RGB"):
+        return img.convert("RGB")
+    return img
+
+
+def _encode(item: VisionImage):
+    """Re-encode without metadata; PNG only when it beats JPEG (transparency, flat graphics)."""
+    img = item.image
+    candidates = []
+    if img.mode == "RGBA" or img.getcolors(256) is not None:
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG", optimize=True)
+        candidates.append((buffer.getvalue(), "image/png"))
+    buffer = io.BytesIO()
+    flat = img
+    if img.mode == "RGBA":
+        flat = Image.new("RGB", img.size, "white")
+        flat.paste(img, mask=img.getchannel("A"))
+    flat.save(buffer, format="JPEG", quality=item.quality, optimize=True)
+    candidates.append((buffer.getvalue(), "image/jpeg"))
+    item.data, item.mime = min(candidates, key=lambda candidate: len(candidate[0]))
+
+
+def prepare_image(name: str, data: bytes) -> VisionImage:
+    img = _decode(data)
+    size = _target_size(img.width, img.height, VISION_MAX_LONG_SIDE, VISION_MAX_SHORT_SIDE)
+    if size != img.size:
+        img = img.resize(size, Image.LANCZOS)
+    item = VisionImage(name=name, image=img, original_bytes=len(data))
+    _encode(item)
+    return item
+
+
+def _fit_budget(items: List[VisionImage], budget: int):
+    """Lower JPEG quality, then resolution, of the largest images until the payload fits."""
+    while sum(item.payload_bytes for item in items) > budget:
+        shrinkable = [item for item in items
+                      if item.quality > VISION_MIN_JPEG_QUALITY or min(item.image.size) > VISION_MIN_SHORT_SIDE]
+        if not shrinkable:
+            logger.warning(f"Vision payload still exceeds budget of {budget} bytes at minimum quality and size")
+            return
+        item = max(shrinkable, key=lambda i: i.payload_bytes)
+        if item.quality > VISION_MIN_JPEG_QUALITY:
+            item.quality = max(VISION_MIN_JPEG_QUALITY, item.quality - 10)
+        else:
+            width, height = item.image.size
+            scale = max(0.75, VISION_MIN_SHORT_SIDE / min(width, height))
+            item.image = item.image.resize((round(width * scale), round(height * scale)), Image.LANCZOS)
+        _encode(item)
+
+
+def prepare_vision_images(images: List[Tuple[str, bytes]], budget: Optional[int] = None) -> List[VisionImage]:
+    """
+    Turn raw attachment bytes into images sized for the vision model: upright,
+    metadata stripped, resized to the model's effective resolution, and together
+    no larger than `budget` base64 bytes. Images that fail to decode are dropped.
+    """
+    budget = VISION_PAYLOAD_BUDGET if budget is None else budget
+    items = []
+    for name, data in images:
+        try:
+            items.append(prepare_image(name, data))
+        except Exception as e:
+            logger.error(f"Could not prepare {name} for vision input: {e}")
+    _fit_budget(items, budget)
+
+    original = sum((item.original_bytes + 2) // 3 * 4 for item in items)
+    sent = sum(item.payload_bytes for item in items)
+    if original:
+        logger.info(
+            f"Vision payload: {len(items)} images, {original} -> {sent} bytes "
+            f"({100 * (original - sent) / original:.0f}% saved, budget {budget})"
+        )
+    return items